@@ -0,0 +1,233 @@
+"""Пакетная обработка сообщений брокера в одной транзакции"""
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine, AsyncSession, async_sessionmaker
+from app.cache.redis_client import redis_client
+from app.metrics import metrics
+from app.broker.concurrency import WorkerPool
+
+logger = logging.getLogger(__name__)
+
+# Обработчик одного сообщения в сессии пакета
+MessageHandler = Callable[[AsyncSession, Any], Awaitable[None]]
+
+# Обработчик всех сообщений пакета сразу (например, одним INSERT)
+BatchHandler = Callable[[AsyncSession, List[Any]], Awaitable[None]]
+
+
+class BatchConsumer:
+    """
+    Накопитель сообщений одной очереди
+
+    Обработчики подписчика вызываются конкурентно (по одному на
+    доставленное сообщение, в пределах prefetch канала) и ждут в submit,
+    пока пакет не наберет max_size сообщений или не пройдет max_wait
+    секунд с первого сообщения. Пакет обрабатывается в одной транзакции:
+    каждое сообщение - в своей точке сохранения (SAVEPOINT), поэтому
+    ошибка сообщения откатывает только его изменения, а остальные фиксируются
+    одним COMMIT. Если задан batch_handler, пакет сначала обрабатывается
+    им целиком в одной точке сохранения, а при ошибке - по одному
+    сообщению. Если не удался сам COMMIT, пакет делится пополам
+    и половины обрабатываются заново, пока виновное сообщение не
+    останется одно.
+
+    Записи обработчиков в кэш откладываются (redis_client.defer_writes):
+    затронутые ключи удаляются из Redis и локальных кэшей только после
+    успешного COMMIT пакета, поэтому кэш не видит значений, которые еще
+    могут откатиться.
+
+    Подписчик подтверждает сообщение, когда submit вернул управление,
+    и отклоняет, если submit выбросил исключение.
+    """
+
+    def __init__(
+            self,
+            name: str,
+            handler: MessageHandler,
+            engine: AsyncEngine,
+            max_size: int = 100,
+            max_wait: float = 0.05,
+            batch_handler: Optional[BatchHandler] = None,
+            pool: Optional[WorkerPool] = None
+    ):
+        """
+        Инициализация
+
+        Args:
+            name: Имя очереди (для метрик и логов)
+            handler: Обработчик одного сообщения; фиксирует изменения через session.commit()
+            engine: Движок БД
+            max_size: Максимальное количество сообщений в пакете
+            max_wait: Максимальное время ожидания пакета, секунды
+            batch_handler: Обработчик пакета целиком (необязательно)
+            pool: Пул обработчиков очереди, ограничивающий одновременные пакеты
+        """
+        self.name = name
+        self.handler = handler
+        self.engine = engine
+        self.max_size = max_size
+        self.max_wait = max_wait
+        self.batch_handler = batch_handler
+        self.pool = pool
+        # commit() обработчика освобождает точку сохранения, транзакцию фиксирует пакет
+        self._session_factory = async_sessionmaker(
+            class_=AsyncSession,
+            expire_on_commit=False,
+            join_transaction_mode="create_savepoint"
+        )
+        self._pending: List[Tuple[Any, asyncio.Future]] = []
+        self._timer: Optional[asyncio.Task] = None
+        self._tasks = set()
+
+    async def submit(self, message: Any) -> None:
+        """
+        Добавить сообщение в пакет и дождаться результата его обработки
+
+        Args:
+            message: Сообщение
+
+        Raises:
+            Exception: Ошибка обработки сообщения
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((message, future))
+        if len(self._pending) >= self.max_size:
+            self._start(self._take())
+        elif self._timer is None:
+            self._timer = asyncio.create_task(self._flush_later())
+        await future
+
+    async def flush(self) -> None:
+        """Обработать накопленные сообщения, не дожидаясь max_wait, и дождаться пакетов в работе"""
+        if self._pending:
+            self._start(self._take())
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def stats(self) -> Dict[str, int]:
+        """Сообщения, ожидающие пакета, и пакеты в работе"""
+        return {"pending": len(self._pending), "batches": len(self._tasks)}
+
+    def _take(self) -> List[Tuple[Any, asyncio.Future]]:
+        """Забрать накопленные сообщения"""
+        if self._timer is not None and self._timer is not asyncio.current_task():
+            self._timer.cancel()
+        self._timer = None
+        batch, self._pending = self._pending, []
+        return batch
+
+    def _start(self, batch: List[Tuple[Any, asyncio.Future]]) -> None:
+        """Запустить обработку пакета в отдельной задаче"""
+        task = asyncio.create_task(self._run(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _flush_later(self) -> None:
+        """Обработать пакет по истечении max_wait"""
+        await asyncio.sleep(self.max_wait)
+        self._start(self._take())
+
+    async def _run(self, batch: List[Tuple[Any, asyncio.Future]]) -> None:
+        """Обработать пакет и сообщить результат ожидающим обработчикам"""
+        metrics.increment(f"broker.{self.name}.batches")
+        metrics.increment(f"broker.{self.name}.batch_messages", len(batch))
+        try:
+            if self.pool is None:
+                with metrics.timer(f"broker.{self.name}.batch"):
+                    await self._process(batch)
+            else:
+                async with self.pool:
+                    with metrics.timer(f"broker.{self.name}.batch"):
+                        await self._process(batch)
+        except Exception as e:
+            logger.error(f"Ошибка обработки пакета очереди {self.name}: {e}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+
+    async def _process(self, batch: List[Tuple[Any, asyncio.Future]]) -> None:
+        """
+        Обработать сообщения в одной транзакции
+
+        Ошибки отдельных сообщений откатываются до их точки сохранения;
+        при ошибке COMMIT пакет делится пополам. Ключи кэша, затронутые
+        обработчиками, сбрасываются только после COMMIT.
+        """
+        errors: List[Optional[Exception]] = []
+        commit_error: Optional[Exception] = None
+        with redis_client.defer_writes() as cache_keys:
+            async with self.engine.connect() as connection:
+                await connection.begin()
+                if connection.dialect.name == "sqlite":
+                    # pysqlite откладывает BEGIN до первого DML, и RELEASE первой
+                    # точки сохранения зафиксировал бы транзакцию раньше пакета;
+                    # IMMEDIATE сразу берет блокировку записи, исключая взаимоблокировку пакетов
+                    await connection.exec_driver_sql("BEGIN IMMEDIATE")
+                if self.batch_handler is not None and len(batch) > 1:
+                    error = await self._handle(connection, self.batch_handler, [message for message, _ in batch])
+                    if error is None:
+                        errors = [None] * len(batch)
+                    else:
+                        logger.warning(f"Пакет очереди {self.name} обрабатывается по одному сообщению: {error}")
+                        metrics.increment(f"broker.{self.name}.batch_fallbacks")
+                if not errors:
+                    errors = [await self._handle(connection, self.handler, message) for message, _ in batch]
+                try:
+                    await connection.commit()
+                except Exception as e:
+                    commit_error = e
+
+        if commit_error is None:
+            await self._invalidate_cache(cache_keys)
+        elif len(batch) > 1:
+            logger.warning(f"Пакет очереди {self.name} из {len(batch)} сообщений не зафиксирован: {commit_error}")
+            metrics.increment(f"broker.{self.name}.batch_splits")
+            middle = len(batch) // 2
+            await self._process(batch[:middle])
+            await self._process(batch[middle:])
+            return
+
+        for (_, future), error in zip(batch, errors):
+            error = commit_error or error
+            if error is not None:
+                metrics.increment(f"broker.{self.name}.failed")
+            if future.done():
+                continue
+            if error is None:
+                future.set_result(None)
+            else:
+                future.set_exception(error)
+
+    async def _invalidate_cache(self, keys: Set[str]) -> None:
+        """
+        Сбросить ключи кэша после COMMIT пакета
+
+        Изменения уже зафиксированы, поэтому ошибка Redis не должна
+        приводить к повтору сообщений: она только записывается в лог.
+        """
+        try:
+            await redis_client.delete_many(keys)
+        except Exception as e:
+            logger.warning(f"Не удалось сбросить кэш после пакета очереди {self.name}: {e}")
+            metrics.error(f"broker.{self.name}.cache_invalidation")
+
+    async def _handle(self, connection: AsyncConnection, handler: Callable, payload: Any) -> Optional[Exception]:
+        """
+        Вызвать обработчик в собственной точке сохранения
+
+        Обработчик может фиксировать изменения (commit освобождает точку
+        сохранения сессии), но при ошибке откатываются все его изменения.
+
+        Returns:
+            Исключение обработчика или None
+        """
+        savepoint = await connection.begin_nested()
+        try:
+            async with self._session_factory(bind=connection) as session:
+                await handler(session, payload)
+        except Exception as e:
+            await savepoint.rollback()
+            return e
+        await savepoint.commit()
+        return None
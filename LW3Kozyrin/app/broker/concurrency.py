@@ -0,0 +1,48 @@
+"""Ограничение одновременной обработки сообщений очереди"""
+import asyncio
+import time
+from typing import Any, Dict
+from app.metrics import metrics
+
+
+class WorkerPool:
+    """
+    Ограниченный пул обработчиков очереди
+
+    Не больше limit обработчиков очереди одновременно работают с БД,
+    остальные ждут свободного места. Время ожидания учитывается в метрике
+    broker.<queue>.wait, занятые и ожидающие места доступны через stats().
+    """
+
+    def __init__(self, name: str, limit: int):
+        """
+        Инициализация
+
+        Args:
+            name: Имя очереди (для метрик)
+            limit: Максимальное количество одновременных обработчиков
+        """
+        self.name = name
+        self.limit = limit
+        self.in_flight = 0
+        self.waiting = 0
+        self._semaphore = asyncio.Semaphore(limit)
+
+    async def __aenter__(self) -> "WorkerPool":
+        started = time.perf_counter()
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        metrics.observe(f"broker.{self.name}.wait", time.perf_counter() - started)
+        self.in_flight += 1
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        self.in_flight -= 1
+        self._semaphore.release()
+
+    def stats(self) -> Dict[str, Any]:
+        """Лимит, занятые и ожидающие места"""
+        return {"limit": self.limit, "in_flight": self.in_flight, "waiting": self.waiting}
@@ -0,0 +1,169 @@
+"""Идемпотентная обработка сообщений брокера по ключу message_id"""
+import logging
+from typing import Any, Awaitable, Callable, List, Optional
+from redis.exceptions import RedisError
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.cache.redis_client import redis_client
+from app.metrics import metrics
+from app.repositories.processed_message_repository import ProcessedMessageRepository
+
+logger = logging.getLogger(__name__)
+
+# Значения ключа сообщения в Redis
+PROCESSING = "processing"
+PROCESSED = "done"
+
+# Обработчик одного сообщения и пакета сообщений (см. app.broker.batching)
+MessageHandler = Callable[[AsyncSession, Any], Awaitable[None]]
+BatchHandler = Callable[[AsyncSession, List[Any]], Awaitable[None]]
+
+
+class MessageInProgressError(Exception):
+    """Сообщение с тем же message_id сейчас обрабатывается: повторить позже"""
+
+
+class MessageDeduplicator:
+    """
+    Дедупликация сообщений одной очереди
+
+    Сообщение с message_id сначала захватывается в Redis (SET NX EX)
+    короткоживущей отметкой "обрабатывается". После фиксации транзакции
+    обработчика отметка заменяется ключом "обработано" с долгим сроком
+    жизни, и повторная доставка отбрасывается за одну команду, до сессии
+    БД. Если обработка не удалась или прервана, отметка снимается; если
+    процесс упал, она истекает сама, поэтому сообщение не теряется.
+    Повтор, пришедший во время обработки, не отбрасывается, а
+    откладывается (MessageInProgressError). Надежная запись об обработке -
+    ключ в processed_messages в транзакции обработчика: она защищает,
+    когда ключ в Redis истек или Redis недоступен. Сообщения без
+    message_id не дедуплицируются.
+    """
+
+    def __init__(
+            self,
+            queue: str,
+            ttl: int,
+            processing_ttl: int = 300,
+            repository: Optional[ProcessedMessageRepository] = None
+    ):
+        """
+        Инициализация
+
+        Args:
+            queue: Имя очереди (для ключей и метрик)
+            ttl: Время жизни ключа обработанного сообщения в Redis, секунды
+            processing_ttl: Время жизни отметки "обрабатывается", секунды
+            repository: Репозиторий ключей идемпотентности в БД
+        """
+        self.queue = queue
+        self.ttl = ttl
+        self.processing_ttl = processing_ttl
+        self.repository = repository or ProcessedMessageRepository()
+
+    def key(self, message_id: str) -> str:
+        """Ключ сообщения в Redis"""
+        return f"broker:dedup:{self.queue}:{message_id}"
+
+    async def claim(self, message_id: Optional[str]) -> bool:
+        """
+        Захватить сообщение перед обработкой
+
+        При недоступности Redis сообщение пропускается дальше:
+        повтор отсечет запись ключа в БД.
+
+        Args:
+            message_id: Ключ идемпотентности
+
+        Returns:
+            False если сообщение уже обработано
+
+        Raises:
+            MessageInProgressError: Сообщение сейчас обрабатывается
+        """
+        if message_id is None:
+            return True
+        key = self.key(message_id)
+        try:
+            redis = await redis_client.client()
+            if await redis.set(key, PROCESSING, nx=True, ex=self.processing_ttl):
+                return True
+            state = await redis.get(key)
+        except RedisError as e:
+            logger.warning(f"Дедупликация очереди {self.queue} в Redis недоступна: {e}")
+            metrics.error(f"broker.{self.queue}.dedup")
+            return True
+        if state is None:
+            # Отметка истекла или снята между командами - пусть решит повтор
+            raise MessageInProgressError(f"Сообщение {message_id} очереди {self.queue} освобождено во время захвата")
+        if state.decode() == PROCESSED:
+            self._skip(message_id)
+            return False
+        raise MessageInProgressError(f"Сообщение {message_id} очереди {self.queue} уже обрабатывается")
+
+    async def complete(self, message_id: Optional[str]) -> None:
+        """
+        Отметить сообщение обработанным после фиксации транзакции обработчика
+
+        Args:
+            message_id: Ключ идемпотентности
+        """
+        if message_id is None:
+            return
+        try:
+            redis = await redis_client.client()
+            await redis.set(self.key(message_id), PROCESSED, ex=self.ttl)
+        except RedisError as e:
+            logger.warning(f"Не удалось отметить сообщение {message_id} очереди {self.queue} обработанным: {e}")
+
+    async def release(self, message_id: Optional[str]) -> None:
+        """
+        Снять захват сообщения, обработка которого не удалась или прервана
+
+        Args:
+            message_id: Ключ идемпотентности
+        """
+        if message_id is None:
+            return
+        try:
+            redis = await redis_client.client()
+            await redis.delete(self.key(message_id))
+        except RedisError as e:
+            logger.warning(f"Не удалось снять ключ сообщения {message_id} очереди {self.queue}: {e}")
+
+    async def record(self, session: AsyncSession, message_id: Optional[str]) -> bool:
+        """
+        Записать ключ сообщения в транзакции обработчика
+
+        Args:
+            session: Сессия БД обработчика
+            message_id: Ключ идемпотентности
+
+        Returns:
+            False если сообщение уже обработано
+        """
+        if message_id is None:
+            return True
+        if await self.repository.record(session, self.queue, message_id):
+            return True
+        self._skip(message_id)
+        return False
+
+    def wrap(self, handler: MessageHandler) -> MessageHandler:
+        """Обработчик сообщения, пропускающий уже обработанные сообщения"""
+        async def handle(session: AsyncSession, message: Any) -> None:
+            if await self.record(session, message.message_id):
+                await handler(session, message)
+        return handle
+
+    def wrap_batch(self, handler: BatchHandler) -> BatchHandler:
+        """Обработчик пакета, исключающий из пакета уже обработанные сообщения"""
+        async def handle(session: AsyncSession, messages: List[Any]) -> None:
+            fresh = [message for message in messages if await self.record(session, message.message_id)]
+            if fresh:
+                await handler(session, fresh)
+        return handle
+
+    def _skip(self, message_id: str) -> None:
+        """Учесть отброшенный повтор"""
+        logger.info(f"Повтор сообщения {message_id} очереди {self.queue} пропущен")
+        metrics.increment(f"broker.{self.queue}.duplicates")
@@ -0,0 +1,236 @@
+"""Повторная обработка сообщений с экспоненциальной задержкой и очередь недоставленных (DLQ)"""
+import logging
+from typing import Any, Dict, List, Optional
+from faststream.exceptions import NackMessage
+from faststream.rabbit import RabbitBroker, RabbitQueue
+from pydantic import BaseModel
+from app.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Заголовок с количеством неудачных попыток обработки сообщения
+RETRY_COUNT_HEADER = "x-retry-count"
+
+# Заголовок с текстом последней ошибки обработки
+LAST_ERROR_HEADER = "x-last-error"
+
+# Максимальная длина текста ошибки в заголовке
+LAST_ERROR_MAX_LENGTH = 500
+
+
+class RetryPolicy:
+    """
+    Повторы обработки сообщений одной очереди
+
+    Сообщение, обработка которого не удалась, публикуется заново в
+    очередь задержки <queue>.retry.<мс> без потребителей: по истечении
+    x-message-ttl RabbitMQ возвращает его в исходную очередь
+    (x-dead-letter-routing-key). Задержка растет экспоненциально:
+    base_delay * 2 ** (попытка - 1), но не больше max_delay, поэтому
+    недоступная зависимость не превращается в цикл мгновенных повторов.
+    Количество неудачных попыток передается в заголовке x-retry-count;
+    после max_attempts попыток сообщение уходит в <queue>.dlq. Если
+    публикация не удалась, полученное сообщение возвращается в исходную
+    очередь (NackMessage с requeue).
+    """
+
+    def __init__(self, queue: str, max_attempts: int = 5, base_delay: float = 1.0, max_delay: float = 60.0):
+        """
+        Инициализация
+
+        Args:
+            queue: Имя исходной очереди
+            max_attempts: Максимальное количество попыток обработки (включая первую)
+            base_delay: Задержка перед первым повтором, секунды
+            max_delay: Максимальная задержка перед повтором, секунды
+        """
+        self.queue = queue
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.dead_letter_queue = RabbitQueue(f"{queue}.dlq", durable=True)
+        self.dlq_depth: Optional[int] = None
+        self._dlq = None
+
+    @staticmethod
+    def retry_count(headers: Optional[Dict[str, Any]]) -> int:
+        """Количество неудачных попыток из заголовков сообщения"""
+        try:
+            return int((headers or {}).get(RETRY_COUNT_HEADER, 0))
+        except (TypeError, ValueError):
+            return 0
+
+    def delay(self, retry: int) -> float:
+        """
+        Задержка перед повтором
+
+        Args:
+            retry: Номер повтора (с 1)
+
+        Returns:
+            Задержка в секундах
+        """
+        return min(self.base_delay * 2 ** (retry - 1), self.max_delay)
+
+    def retry_queue(self, retry: int) -> RabbitQueue:
+        """Очередь задержки перед повтором retry"""
+        delay_ms = int(self.delay(retry) * 1000)
+        return RabbitQueue(
+            f"{self.queue}.retry.{delay_ms}",
+            durable=True,
+            arguments={
+                "x-message-ttl": delay_ms,
+                "x-dead-letter-exchange": "",
+                "x-dead-letter-routing-key": self.queue,
+            }
+        )
+
+    def queues(self) -> List[RabbitQueue]:
+        """Очереди задержки всех повторов и очередь недоставленных"""
+        retry_queues = {}
+        # Очередь первого повтора нужна и для отсрочки (postpone)
+        for retry in range(1, max(self.max_attempts, 2)):
+            queue = self.retry_queue(retry)
+            retry_queues[queue.name] = queue
+        return [*retry_queues.values(), self.dead_letter_queue]
+
+    async def declare(self, broker: RabbitBroker) -> None:
+        """
+        Объявить очереди повторов в RabbitMQ
+
+        Args:
+            broker: Подключенный брокер
+        """
+        for queue in self.queues():
+            declared = await broker.declare_queue(queue)
+            if queue is self.dead_letter_queue:
+                self._dlq = declared
+
+    async def refresh_dlq_depth(self) -> Optional[int]:
+        """
+        Обновить количество сообщений в очереди недоставленных
+
+        Returns:
+            Количество сообщений или None, если очередь не объявлена
+        """
+        if self._dlq is not None:
+            self.dlq_depth = (await self._dlq.declare()).message_count
+        return self.dlq_depth
+
+    async def retry(
+            self,
+            broker: RabbitBroker,
+            message: BaseModel,
+            headers: Optional[Dict[str, Any]],
+            error: Exception
+    ) -> None:
+        """
+        Отложить повтор сообщения или отправить его в очередь недоставленных
+
+        Args:
+            broker: Брокер
+            message: Сообщение, обработка которого не удалась
+            headers: Заголовки полученного сообщения
+            error: Ошибка обработки
+
+        Raises:
+            NackMessage: Ошибка публикации (сообщение возвращается в очередь)
+        """
+        retries = self.retry_count(headers) + 1
+        retry_headers = {**self._error_headers(headers, error), RETRY_COUNT_HEADER: retries}
+        body = message.model_dump(mode="json", exclude_unset=True)
+
+        if retries >= self.max_attempts:
+            await self._publish(broker, body, self.dead_letter_queue, retry_headers)
+            metrics.increment(f"broker.{self.queue}.dead_lettered")
+            logger.error(
+                f"Сообщение очереди {self.queue} отправлено в {self.dead_letter_queue.name} "
+                f"после {retries} попыток"
+            )
+            return
+
+        queue = self.retry_queue(retries)
+        await self._publish(broker, body, queue, retry_headers)
+        metrics.increment(f"broker.{self.queue}.retries")
+        logger.warning(f"Повтор {retries} сообщения очереди {self.queue} через {self.delay(retries):g} с")
+
+    async def postpone(
+            self,
+            broker: RabbitBroker,
+            message: BaseModel,
+            headers: Optional[Dict[str, Any]],
+            reason: Exception
+    ) -> None:
+        """
+        Отложить сообщение, не расходуя попытку обработки
+
+        Используется, когда сообщение не обрабатывалось (например, копия
+        с тем же message_id еще обрабатывается): сообщение возвращается
+        в исходную очередь через очередь задержки первого повтора, а
+        счетчик попыток в заголовках не меняется.
+
+        Args:
+            broker: Брокер
+            message: Отложенное сообщение
+            headers: Заголовки полученного сообщения
+            reason: Причина отсрочки
+
+        Raises:
+            NackMessage: Ошибка публикации (сообщение возвращается в очередь)
+        """
+        body = message.model_dump(mode="json", exclude_unset=True)
+        await self._publish(broker, body, self.retry_queue(1), self._error_headers(headers, reason))
+        metrics.increment(f"broker.{self.queue}.postponed")
+        logger.info(f"Сообщение очереди {self.queue} отложено на {self.delay(1):g} с: {reason}")
+
+    async def dead_letter(
+            self,
+            broker: RabbitBroker,
+            body: bytes,
+            headers: Optional[Dict[str, Any]],
+            error: Exception
+    ) -> None:
+        """
+        Отправить в очередь недоставленных сообщение, которое не удалось разобрать
+
+        Повторять такое сообщение бессмысленно, поэтому оно сразу уходит
+        в <queue>.dlq без изменений.
+
+        Args:
+            broker: Брокер
+            body: Тело полученного сообщения
+            headers: Заголовки полученного сообщения
+            error: Ошибка декодирования или валидации
+
+        Raises:
+            NackMessage: Ошибка публикации (сообщение возвращается в очередь)
+        """
+        await self._publish(broker, body, self.dead_letter_queue, self._error_headers(headers, error))
+        metrics.increment(f"broker.{self.queue}.dead_lettered")
+        logger.error(f"Некорректное сообщение очереди {self.queue} отправлено в {self.dead_letter_queue.name}: {error}")
+
+    @staticmethod
+    def _error_headers(headers: Optional[Dict[str, Any]], error: Exception) -> Dict[str, Any]:
+        """Заголовки полученного сообщения с текстом ошибки"""
+        return {
+            **(headers or {}),
+            LAST_ERROR_HEADER: f"{type(error).__name__}: {error}"[:LAST_ERROR_MAX_LENGTH],
+        }
+
+    async def _publish(self, broker: RabbitBroker, body: Any, queue: RabbitQueue, headers: Dict[str, Any]) -> None:
+        """
+        Опубликовать сообщение в очередь повторов или недоставленных
+
+        Raises:
+            NackMessage: Ошибка публикации
+        """
+        try:
+            await broker.publish(body, queue, headers=headers, persist=True)
+        except Exception as e:
+            logger.error(f"Не удалось опубликовать сообщение очереди {self.queue} в {queue.name}: {e}")
+            metrics.error(f"broker.{self.queue}.retry_publish")
+            raise NackMessage(requeue=True) from e
+
+    def stats(self) -> Dict[str, Any]:
+        """Параметры повторов и глубина очереди недоставленных"""
+        return {"max_attempts": self.max_attempts, "dlq_depth": self.dlq_depth}
@@ -1,4 +1,5 @@
 """Модуль для работы с кэшированием"""
 from app.cache.redis_client import redis_client, RedisClient
+from app.cache.local_cache import LocalCache
 
-__all__ = ["redis_client", "RedisClient"]
+__all__ = ["redis_client", "RedisClient", "LocalCache"]
@@ -0,0 +1,144 @@
+"""Кодеки сериализации значений кэша"""
+import json
+from typing import Any, Dict, Optional
+
+# Разделитель между тегом кодека и телом значения: b"o1|<orjson bytes>"
+TAG_SEPARATOR = b"|"
+
+# Маркер отсутствующего объекта (negative caching); loads() возвращает для него None
+TOMBSTONE = b"-" + TAG_SEPARATOR
+
+
+class Codec:
+    """
+    Базовый кодек: преобразует значение в байты и обратно
+
+    Каждый кодек имеет тег (имя + версия формата), который записывается
+    перед телом значения. По тегу читатель определяет, чем декодировать
+    значение, поэтому смена кодека при деплое не портит уже записанный кэш.
+    """
+
+    name: str = ""
+    tag: bytes = b""
+
+    def encode(self, value: Any) -> bytes:
+        """Сериализовать значение в байты"""
+        raise NotImplementedError
+
+    def decode(self, data: bytes) -> Any:
+        """Десериализовать значение из байтов"""
+        raise NotImplementedError
+
+    def dumps(self, value: Any) -> bytes:
+        """Сериализовать значение вместе с тегом кодека"""
+        return self.tag + TAG_SEPARATOR + self.encode(value)
+
+
+class JsonCodec(Codec):
+    """Кодек на стандартном модуле json"""
+
+    name = "json"
+    tag = b"j1"
+
+    def encode(self, value: Any) -> bytes:
+        return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    def decode(self, data: bytes) -> Any:
+        return json.loads(data)
+
+
+class OrjsonCodec(Codec):
+    """Кодек на orjson (требуется пакет orjson)"""
+
+    name = "orjson"
+    tag = b"o1"
+
+    def __init__(self):
+        import orjson
+        self._orjson = orjson
+
+    def encode(self, value: Any) -> bytes:
+        return self._orjson.dumps(value)
+
+    def decode(self, data: bytes) -> Any:
+        return self._orjson.loads(data)
+
+
+class MsgpackCodec(Codec):
+    """Кодек на MessagePack (требуется пакет msgpack)"""
+
+    name = "msgpack"
+    tag = b"m1"
+
+    def __init__(self):
+        import msgpack
+        self._msgpack = msgpack
+
+    def encode(self, value: Any) -> bytes:
+        return self._msgpack.packb(value, use_bin_type=True)
+
+    def decode(self, data: bytes) -> Any:
+        return self._msgpack.unpackb(data, raw=False)
+
+
+CODECS = {
+    JsonCodec.name: JsonCodec,
+    OrjsonCodec.name: OrjsonCodec,
+    MsgpackCodec.name: MsgpackCodec,
+}
+
+_instances: Dict[bytes, Codec] = {}
+
+
+def get_codec(name: str) -> Codec:
+    """
+    Получить кодек по имени
+
+    Args:
+        name: Имя кодека (json, orjson, msgpack)
+
+    Returns:
+        Экземпляр кодека
+
+    Raises:
+        ValueError: Если кодек неизвестен или его пакет не установлен
+    """
+    codec_class = CODECS.get(name)
+    if codec_class is None:
+        raise ValueError(f"Неизвестный кодек кэша: {name}")
+    if codec_class.tag not in _instances:
+        try:
+            _instances[codec_class.tag] = codec_class()
+        except ImportError as e:
+            raise ValueError(f"Кодек кэша {name} недоступен: {e}") from e
+    return _instances[codec_class.tag]
+
+
+def loads(data: bytes) -> Optional[Any]:
+    """
+    Десериализовать значение, определив кодек по тегу
+
+    Значения без тега считаются JSON (формат до появления кодеков).
+
+    Args:
+        data: Байты из Redis
+
+    Returns:
+        Значение или None, если кодек неизвестен, недоступен или данные повреждены
+    """
+    tag, separator, body = data.partition(TAG_SEPARATOR)
+    if not separator or tag[:1] in (b"{", b"["):
+        codec, body = get_codec(JsonCodec.name), data
+    else:
+        codec_class = next((c for c in CODECS.values() if c.tag == tag), None)
+        if codec_class is None:
+            return None
+        try:
+            codec = get_codec(codec_class.name)
+        except ValueError:
+            return None
+
+    try:
+        return codec.decode(body)
+    except Exception:
+        return None
@@ -0,0 +1,123 @@
+"""Локальный (in-process) LRU кэш первого уровня"""
+import time
+from collections import OrderedDict, defaultdict
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+
+class LocalCache:
+    """
+    Ограниченный LRU кэш в памяти процесса с TTL
+
+    Ограничивается одновременно количеством записей и суммарным
+    размером значений в байтах. Для каждого префикса ключа
+    (часть до первого двоеточия) ведутся счетчики попаданий,
+    промахов и вытеснений.
+    """
+
+    def __init__(self, max_items: int = 10000, max_bytes: int = 16 * 1024 * 1024, ttl: float = 30):
+        """
+        Инициализация кэша
+
+        Args:
+            max_items: Максимальное количество записей
+            max_bytes: Максимальный суммарный размер значений в байтах
+            ttl: Время жизни записи по умолчанию в секундах
+        """
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._data: "OrderedDict[str, Tuple[Any, float, int]]" = OrderedDict()
+        self._bytes = 0
+        self._stats: Dict[str, Dict[str, int]] = defaultdict(
+            lambda: {"hits": 0, "misses": 0, "evictions": 0}
+        )
+
+    @staticmethod
+    def prefix(key: str) -> str:
+        """Префикс ключа, по которому группируется статистика"""
+        return key.split(":", 1)[0]
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        Получить значение по ключу
+
+        Args:
+            key: Ключ
+
+        Returns:
+            Значение или None, если ключа нет или его TTL истек
+        """
+        stats = self._stats[self.prefix(key)]
+        entry = self._data.get(key)
+        if entry is None:
+            stats["misses"] += 1
+            return None
+
+        value, expires_at, _ = entry
+        if expires_at <= time.monotonic():
+            self._remove(key)
+            stats["misses"] += 1
+            return None
+
+        self._data.move_to_end(key)
+        stats["hits"] += 1
+        return value
+
+    def set(self, key: str, value: Any, size: int, ttl: Optional[float] = None) -> None:
+        """
+        Сохранить значение
+
+        Args:
+            key: Ключ
+            value: Значение
+            size: Размер значения в байтах (для ограничения по памяти)
+            ttl: Время жизни в секундах (не больше TTL кэша по умолчанию)
+        """
+        if size > self.max_bytes:
+            return
+
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        self._remove(key)
+        self._data[key] = (value, time.monotonic() + ttl, size)
+        self._bytes += size
+
+        while len(self._data) > self.max_items or self._bytes > self.max_bytes:
+            evicted_key, (_, _, evicted_size) = self._data.popitem(last=False)
+            self._bytes -= evicted_size
+            self._stats[self.prefix(evicted_key)]["evictions"] += 1
+
+    def invalidate(self, keys: Iterable[str]) -> None:
+        """Удалить ключи из кэша"""
+        for key in keys:
+            self._remove(key)
+
+    def clear(self) -> None:
+        """Очистить кэш"""
+        self._data.clear()
+        self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Статистика кэша
+
+        Returns:
+            Количество записей, занятый объем и счетчики по префиксам ключей
+        """
+        return {
+            "items": len(self._data),
+            "bytes": self._bytes,
+            "max_items": self.max_items,
+            "max_bytes": self.max_bytes,
+            "prefixes": {prefix: dict(counters) for prefix, counters in self._stats.items()},
+        }
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._data
+
+    def _remove(self, key: str) -> None:
+        entry = self._data.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[2]
@@ -1,9 +1,33 @@
 """Клиент для работы с Redis"""
+import asyncio
 import json
+import logging
+import math
 import os
-from typing import Optional, Any
+import random
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional, Any, Awaitable, Callable, Dict, Iterable, Iterator, List, Set, Tuple, Union
 import redis.asyncio as redis
 from redis.asyncio import Redis
+from redis.asyncio.client import PubSub
+from redis.exceptions import WatchError
+from app.cache.local_cache import LocalCache
+from app.cache.single_flight import SingleFlight
+from app.cache import codecs
+
+logger = logging.getLogger(__name__)
+
+# Канал Redis pub/sub для инвалидации локальных кэшей всех процессов
+INVALIDATION_CHANNEL = "cache:invalidate"
+
+# Максимальное количество ключей в одном pipeline пакетной записи
+PIPELINE_CHUNK_SIZE = 1000
+
+# Ключи, запись которых отложена до фиксации транзакции (см. RedisClient.defer_writes)
+_deferred_keys: ContextVar[Optional[Set[str]]] = ContextVar("deferred_cache_keys", default=None)
 
 
 class RedisClient:
@@ -14,21 +38,209 @@ class RedisClient:
         self._redis: Optional[Redis] = None
         self.redis_url = os.getenv("REDIS_URL", "redis://localhost:6379/0")
 
+        # Кодек сериализации значений (json, orjson, msgpack)
+        self.codec = codecs.get_codec(os.getenv("CACHE_CODEC", "json"))
+
+        # Локальный кэш первого уровня для горячих ключей (product:{id}, user:{id})
+        self.local_cache = LocalCache(
+            max_items=int(os.getenv("L1_CACHE_MAX_ITEMS", "10000")),
+            max_bytes=int(os.getenv("L1_CACHE_MAX_BYTES", str(16 * 1024 * 1024))),
+            ttl=float(os.getenv("L1_CACHE_TTL", "30")),
+        )
+        self.local_prefixes = {
+            prefix.strip()
+            for prefix in os.getenv("L1_CACHE_PREFIXES", "product,user").split(",")
+            if prefix.strip()
+        }
+        self._instance_id = uuid.uuid4().hex
+        self._pubsub: Optional[PubSub] = None
+        self._listener_task: Optional[asyncio.Task] = None
+        self._supervisor_task: Optional[asyncio.Task] = None
+        self.resubscribe_interval = float(os.getenv("L1_CACHE_RESUBSCRIBE_INTERVAL", "5"))
+
+        # Защита от cache stampede: объединение загрузок в процессе и блокировка в Redis
+        self._single_flight = SingleFlight()
+        self._load_times: Dict[str, float] = {}
+        self.lock_timeout = float(os.getenv("CACHE_LOCK_TIMEOUT", "5"))
+        self.lock_poll_interval = float(os.getenv("CACHE_LOCK_POLL_INTERVAL", "0.05"))
+
+        # Количество попаданий в записи об отсутствующих объектах по префиксам
+        self._negative_hits: Dict[str, int] = {}
+
     async def connect(self) -> None:
         """Подключение к Redis"""
         if self._redis is None:
             self._redis = await redis.from_url(
                 self.redis_url,
                 encoding="utf-8",
-                decode_responses=True  # Автоматическая декодировка ответов в строки
+                decode_responses=False  # Значения кэша хранятся как байты, декодирует кодек
             )
 
+    async def client(self) -> Redis:
+        """
+        Получить подключенный клиент redis-py
+
+        Для операций без обертки в RedisClient (списки, хеши, счетчики).
+        Ключи, записанные напрямую, не проходят через кодек и локальный кэш.
+        """
+        if not self._redis:
+            await self.connect()
+        return self._redis
+
     async def disconnect(self) -> None:
         """Отключение от Redis"""
+        if self._supervisor_task:
+            self._supervisor_task.cancel()
+            try:
+                await self._supervisor_task
+            except asyncio.CancelledError:
+                pass
+            self._supervisor_task = None
+        await self.stop_invalidation_listener()
         if self._redis:
             await self._redis.close()
             self._redis = None
 
+    async def start_invalidation_listener(self) -> None:
+        """
+        Подписаться на канал инвалидации и включить локальный кэш
+
+        Локальный кэш используется только пока работает подписка:
+        без нее процесс не узнает об изменениях в других процессах.
+        """
+        if self.local_cache_active:
+            return
+        # Остатки прерванной подписки
+        await self.stop_invalidation_listener()
+        if not self._redis:
+            await self.connect()
+
+        pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+        try:
+            await pubsub.subscribe(INVALIDATION_CHANNEL)
+        except Exception:
+            await pubsub.aclose()
+            raise
+        self._pubsub = pubsub
+        self._listener_task = asyncio.create_task(self._listen_invalidations())
+
+    def keep_invalidation_listener(self) -> None:
+        """
+        Поддерживать подписку на канал инвалидации в фоне
+
+        Если Redis недоступен при запуске или подписка прервалась, она
+        восстанавливается каждые resubscribe_interval секунд; до этого
+        локальный кэш отключен, и значения читаются из Redis.
+        """
+        if self._supervisor_task is None or self._supervisor_task.done():
+            self._supervisor_task = asyncio.create_task(self._supervise_invalidations())
+
+    async def stop_invalidation_listener(self) -> None:
+        """Остановить подписку на канал инвалидации и очистить локальный кэш"""
+        if self._listener_task:
+            self._listener_task.cancel()
+            try:
+                await self._listener_task
+            except asyncio.CancelledError:
+                pass
+            self._listener_task = None
+        if self._pubsub:
+            await self._pubsub.aclose()
+            self._pubsub = None
+        self.local_cache.clear()
+
+    @property
+    def local_cache_active(self) -> bool:
+        """Включен ли локальный кэш (работает ли подписка на инвалидацию)"""
+        return self._listener_task is not None and not self._listener_task.done()
+
+    def local_cache_stats(self) -> Dict[str, Any]:
+        """Статистика локального кэша: попадания, промахи и вытеснения по префиксам"""
+        return {"active": self.local_cache_active, **self.local_cache.stats()}
+
+    def negative_cache_stats(self) -> Dict[str, int]:
+        """Количество попаданий в записи об отсутствующих объектах по префиксам"""
+        return dict(self._negative_hits)
+
+    async def _listen_invalidations(self) -> None:
+        """Обработка сообщений об инвалидации от других процессов"""
+        try:
+            async for message in self._pubsub.listen():
+                if message.get("type") != "message":
+                    continue
+                try:
+                    payload = json.loads(message["data"])
+                except (TypeError, json.JSONDecodeError):
+                    continue
+                if payload.get("origin") == self._instance_id:
+                    continue
+                self.local_cache.invalidate(payload.get("keys", []))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Подписка на инвалидацию кэша прервана, локальный кэш отключен: {e}")
+        finally:
+            self.local_cache.clear()
+
+    async def _supervise_invalidations(self) -> None:
+        """Восстанавливать подписку на канал инвалидации, пока клиент подключен"""
+        while True:
+            if not self.local_cache_active:
+                try:
+                    await self.start_invalidation_listener()
+                    logger.info("Подписка на инвалидацию кэша восстановлена, локальный кэш включен")
+                except Exception as e:
+                    logger.warning(f"Подписка на инвалидацию кэша недоступна, локальный кэш отключен: {e}")
+            await asyncio.sleep(self.resubscribe_interval)
+
+    @contextmanager
+    def defer_writes(self) -> Iterator[Set[str]]:
+        """
+        Отложить запись в кэш до фиксации внешней транзакции
+
+        Внутри блока (в текущей задаче) записи и удаления ключей не
+        выполняются: ключи сбрасываются в локальном кэше и собираются в
+        множество, которое после успешного COMMIT нужно передать в
+        delete_many. Так кэш не получает значения из транзакции, которая
+        еще может откатиться.
+
+        Yields:
+            Множество затронутых ключей
+        """
+        keys: Set[str] = set()
+        token = _deferred_keys.set(keys)
+        try:
+            yield keys
+        finally:
+            _deferred_keys.reset(token)
+
+    def _defer(self, keys: Iterable[str]) -> bool:
+        """Отложить изменение ключей, если запись в кэш отложена (см. defer_writes)"""
+        deferred = _deferred_keys.get()
+        if deferred is None:
+            return False
+        keys = list(keys)
+        deferred.update(keys)
+        self.local_cache.invalidate([key for key in keys if self._is_local_key(key)])
+        return True
+
+    def _is_local_key(self, key: str) -> bool:
+        """Попадает ли ключ в локальный кэш"""
+        return LocalCache.prefix(key) in self.local_prefixes
+
+    def _use_local(self, key: str) -> bool:
+        """Читать ли ключ из локального кэша"""
+        return self.local_cache_active and self._is_local_key(key)
+
+    def _store_local(self, key: str, value: Any, raw: bytes, expire: Optional[int] = None) -> None:
+        """Сохранить значение в локальный кэш"""
+        if self._use_local(key):
+            self.local_cache.set(key, value, size=len(raw), ttl=expire)
+
+    def _invalidation_message(self, keys: List[str]) -> str:
+        """Сообщение для канала инвалидации"""
+        return json.dumps({"origin": self._instance_id, "keys": keys})
+
     async def get(self, key: str) -> Optional[str]:
         """
         Получить значение по ключу
@@ -41,7 +253,8 @@ class RedisClient:
         """
         if not self._redis:
             await self.connect()
-        return await self._redis.get(key)
+        value = await self._redis.get(key)
+        return value.decode("utf-8") if value is not None else None
 
     async def set(
             self,
@@ -52,22 +265,35 @@ class RedisClient:
         """
         Установить значение по ключу с опциональным TTL
 
+        Для ключей локального кэша одновременно публикуется
+        сообщение об инвалидации для других процессов.
+
         Args:
             key: Ключ в Redis
-            value: Значение для сохранения
+            value: Значение для сохранения (строки и байты сохраняются как есть)
             expire: Время жизни ключа в секундах (TTL)
 
         Returns:
             True если успешно установлено
         """
+        if self._defer([key]):
+            return True
         if not self._redis:
             await self.connect()
 
-        # Если значение - словарь или объект, сериализуем в JSON
+        # Если значение - словарь или список, сериализуем текущим кодеком
         if isinstance(value, (dict, list)):
-            value = json.dumps(value)
+            value = self.codec.dumps(value)
+
+        if not self._is_local_key(key):
+            return await self._redis.set(key, value, ex=expire)
 
-        return await self._redis.set(key, value, ex=expire)
+        self.local_cache.invalidate([key])
+        async with self._redis.pipeline(transaction=False) as pipe:
+            pipe.set(key, value, ex=expire)
+            pipe.publish(INVALIDATION_CHANNEL, self._invalidation_message([key]))
+            results = await pipe.execute()
+        return results[0]
 
     async def delete(self, key: str) -> int:
         """
@@ -79,9 +305,35 @@ class RedisClient:
         Returns:
             Количество удаленных ключей (0 или 1)
         """
+        return await self.delete_many([key])
+
+    async def delete_if_equal(self, key: str, value: bytes) -> bool:
+        """
+        Удалить ключ, только если его значение совпадает (WATCH/MULTI)
+
+        Используется для снятия блокировки владельцем: если блокировка
+        истекла и ее захватил другой процесс, она не удаляется.
+
+        Args:
+            key: Ключ
+            value: Ожидаемое значение
+
+        Returns:
+            True если ключ удален
+        """
         if not self._redis:
             await self.connect()
-        return await self._redis.delete(key)
+        async with self._redis.pipeline(transaction=True) as pipe:
+            try:
+                await pipe.watch(key)
+                if await pipe.get(key) != value:
+                    return False
+                pipe.multi()
+                pipe.delete(key)
+                await pipe.execute()
+                return True
+            except WatchError:
+                return False
 
     async def exists(self, key: str) -> bool:
         """
@@ -118,7 +370,7 @@ class RedisClient:
             expire: Optional[int] = None
     ) -> bool:
         """
-        Сохранить JSON объект в Redis
+        Сохранить объект в Redis, сериализовав его текущим кодеком
 
         Args:
             key: Ключ в Redis
@@ -128,12 +380,20 @@ class RedisClient:
         Returns:
             True если успешно
         """
-        json_value = json.dumps(value)
-        return await self.set(key, json_value, expire)
+        if self._defer([key]):
+            return True
+        payload = self.codec.dumps(value)
+        result = await self.set(key, payload, expire)
+        if result:
+            self._store_local(key, value, payload, expire)
+        return result
 
     async def get_json(self, key: str) -> Optional[dict]:
         """
-        Получить JSON объект из Redis
+        Получить объект из Redis
+
+        Сначала проверяется локальный кэш процесса. Кодек значения
+        определяется по его тегу, а не по текущим настройкам.
 
         Args:
             key: Ключ в Redis
@@ -141,14 +401,292 @@ class RedisClient:
         Returns:
             Словарь или None
         """
-        value = await self.get(key)
+        if self._use_local(key):
+            cached = self.local_cache.get(key)
+            if cached is not None:
+                return dict(cached)
+
+        if not self._redis:
+            await self.connect()
+
+        value = await self._redis.get(key)
         if value:
-            try:
-                return json.loads(value)
-            except json.JSONDecodeError:
+            result = codecs.loads(value)
+            if result is None:
                 return None
+            self._store_local(key, result, value)
+            return dict(result) if self._use_local(key) else result
         return None
 
+    async def get_many_json(self, keys: Iterable[str]) -> Dict[str, dict]:
+        """
+        Получить несколько JSON объектов за один запрос (MGET)
+
+        Ключи, найденные в локальном кэше, в Redis не запрашиваются.
+
+        Args:
+            keys: Ключи в Redis
+
+        Returns:
+            Словарь {ключ: значение} только для найденных ключей
+        """
+        keys = list(dict.fromkeys(keys))
+        result = {}
+        remote_keys = []
+        for key in keys:
+            cached = self.local_cache.get(key) if self._use_local(key) else None
+            if cached is not None:
+                result[key] = dict(cached)
+            else:
+                remote_keys.append(key)
+
+        if not remote_keys:
+            return result
+        if not self._redis:
+            await self.connect()
+
+        values = await self._redis.mget(remote_keys)
+        for key, value in zip(remote_keys, values):
+            if not value:
+                continue
+            decoded = codecs.loads(value)
+            if decoded is None:
+                continue
+            self._store_local(key, decoded, value)
+            result[key] = dict(decoded) if self._use_local(key) else decoded
+        return result
+
+    async def set_many_json(
+            self,
+            values: Dict[str, dict],
+            expire: Union[int, Dict[str, int], None] = None
+    ) -> bool:
+        """
+        Сохранить несколько объектов за один запрос (pipeline SET EX)
+
+        Большие наборы отправляются пачками по PIPELINE_CHUNK_SIZE ключей,
+        чтобы не собирать в памяти и не передавать одним пакетом сотни тысяч команд.
+
+        Args:
+            values: Словарь {ключ: значение}
+            expire: Общий TTL в секундах или словарь {ключ: TTL}
+
+        Returns:
+            True если все ключи успешно установлены
+        """
+        if not values or self._defer(values):
+            return True
+        if not self._redis:
+            await self.connect()
+
+        keys = list(values)
+        success = True
+        for start in range(0, len(keys), PIPELINE_CHUNK_SIZE):
+            chunk = keys[start:start + PIPELINE_CHUNK_SIZE]
+            encoded = {key: self.codec.dumps(values[key]) for key in chunk}
+            local_keys = [key for key in chunk if self._is_local_key(key)]
+            self.local_cache.invalidate(local_keys)
+
+            async with self._redis.pipeline(transaction=False) as pipe:
+                for key, payload in encoded.items():
+                    ttl = expire.get(key) if isinstance(expire, dict) else expire
+                    pipe.set(key, payload, ex=ttl)
+                if local_keys:
+                    pipe.publish(INVALIDATION_CHANNEL, self._invalidation_message(local_keys))
+                results = await pipe.execute()
+
+            for key in local_keys:
+                ttl = expire.get(key) if isinstance(expire, dict) else expire
+                self._store_local(key, values[key], encoded[key], ttl)
+            success = success and all(results[:len(encoded)])
+        return success
+
+    async def delete_many(self, keys: Iterable[str]) -> int:
+        """
+        Удалить несколько ключей одной командой DEL
+
+        Args:
+            keys: Ключи для удаления
+
+        Returns:
+            Количество удаленных ключей
+        """
+        keys = list(dict.fromkeys(keys))
+        if not keys or self._defer(keys):
+            return 0
+        if not self._redis:
+            await self.connect()
+
+        local_keys = [key for key in keys if self._is_local_key(key)]
+        self.local_cache.invalidate(local_keys)
+        if not local_keys:
+            return await self._redis.delete(*keys)
+
+        async with self._redis.pipeline(transaction=False) as pipe:
+            pipe.delete(*keys)
+            pipe.publish(INVALIDATION_CHANNEL, self._invalidation_message(local_keys))
+            results = await pipe.execute()
+        return results[0]
+
+    async def get_or_load_json(
+            self,
+            key: str,
+            loader: Callable[[], Awaitable[Optional[dict]]],
+            expire: Optional[int] = None,
+            beta: float = 1.0,
+            negative_expire: Optional[int] = None
+    ) -> Optional[dict]:
+        """
+        Получить объект из кэша или загрузить его с защитой от cache stampede
+
+        - внутри процесса одновременные промахи по ключу объединяются (single-flight);
+        - между процессами загрузку выполняет только получивший короткую
+          блокировку lock:{key}, остальные ждут появления значения в кэше;
+        - незадолго до истечения TTL значение с вероятностью, растущей
+          к концу TTL, обновляется досрочно (probabilistic early expiration);
+        - если задан negative_expire, отсутствие объекта тоже кэшируется
+          (запись-маркер), и повторные запросы не доходят до источника.
+
+        Args:
+            key: Ключ в Redis
+            loader: Функция загрузки значения из источника (None - объекта нет)
+            expire: Время жизни в секундах
+            beta: Коэффициент досрочного обновления (больше - раньше, 0 - выключено)
+            negative_expire: Время жизни записи об отсутствии объекта (None - не кэшировать)
+
+        Returns:
+            Словарь или None
+        """
+        if self._use_local(key):
+            cached = self.local_cache.get(key)
+            if cached is not None:
+                return dict(cached)
+
+        result = await self._single_flight.do(
+            key, lambda: self._fetch_or_load(key, loader, expire, beta, negative_expire)
+        )
+        return dict(result) if result is not None else None
+
+    async def _fetch_or_load(
+            self,
+            key: str,
+            loader: Callable[[], Awaitable[Optional[dict]]],
+            expire: Optional[int],
+            beta: float,
+            negative_expire: Optional[int] = None
+    ) -> Optional[dict]:
+        """Прочитать значение с оставшимся TTL и при необходимости загрузить его"""
+        if not self._redis:
+            await self.connect()
+
+        raw, pttl = await self._get_with_ttl(key)
+        if raw == codecs.TOMBSTONE:
+            self._record_negative_hit(key)
+            return None
+
+        value = codecs.loads(raw) if raw else None
+        lock_key = f"lock:{key}"
+        token = uuid.uuid4().hex
+
+        if value is not None:
+            self._store_local(key, value, raw)
+            if not self._should_refresh_early(key, pttl, beta):
+                return value
+            # Досрочно обновляет только получивший блокировку, остальные отдают текущее значение
+            if not await self._redis.set(lock_key, token, nx=True, px=int(self.lock_timeout * 1000)):
+                return value
+            # Пока блокировку держал другой процесс, значение могло быть уже обновлено (TTL вырос)
+            raw, fresh_pttl = await self._get_with_ttl(key)
+            if raw and raw != codecs.TOMBSTONE and fresh_pttl > pttl:
+                await self.delete_if_equal(lock_key, token.encode())
+                value = codecs.loads(raw)
+                self._store_local(key, value, raw)
+                return value
+            return await self._load_and_store(key, loader, expire, negative_expire, lock_key, token)
+
+        if await self._redis.set(lock_key, token, nx=True, px=int(self.lock_timeout * 1000)):
+            # Блокировку могли освободить сразу после загрузки значения другим процессом
+            raw = await self._redis.get(key)
+            if raw is None:
+                return await self._load_and_store(key, loader, expire, negative_expire, lock_key, token)
+            await self.delete_if_equal(lock_key, token.encode())
+            if raw == codecs.TOMBSTONE:
+                self._record_negative_hit(key)
+                return None
+            value = codecs.loads(raw)
+            self._store_local(key, value, raw)
+            return value
+
+        # Ключ уже загружает другой процесс - ждем появления значения в кэше
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.lock_timeout
+        while loop.time() < deadline:
+            await asyncio.sleep(self.lock_poll_interval)
+            raw = await self._redis.get(key)
+            if raw == codecs.TOMBSTONE:
+                self._record_negative_hit(key)
+                return None
+            value = codecs.loads(raw) if raw else None
+            if value is not None:
+                self._store_local(key, value, raw)
+                return value
+
+        return await self._load_and_store(key, loader, expire, negative_expire)
+
+    async def _get_with_ttl(self, key: str) -> Tuple[Optional[bytes], int]:
+        """Значение ключа и оставшийся TTL в миллисекундах за один запрос"""
+        async with self._redis.pipeline(transaction=False) as pipe:
+            pipe.get(key)
+            pipe.pttl(key)
+            raw, pttl = await pipe.execute()
+        return raw, pttl
+
+    async def _load_and_store(
+            self,
+            key: str,
+            loader: Callable[[], Awaitable[Optional[dict]]],
+            expire: Optional[int],
+            negative_expire: Optional[int] = None,
+            lock_key: Optional[str] = None,
+            token: Optional[str] = None
+    ) -> Optional[dict]:
+        """Загрузить значение, сохранить его в кэш и освободить блокировку"""
+        try:
+            started = time.monotonic()
+            value = await loader()
+            self._record_load_time(key, time.monotonic() - started)
+            if value is not None:
+                await self.set_json(key, value, expire)
+            elif negative_expire and not self._defer([key]):
+                await self._redis.set(key, codecs.TOMBSTONE, ex=negative_expire)
+            return value
+        finally:
+            if lock_key:
+                await self.delete_if_equal(lock_key, token.encode())
+
+    def _record_negative_hit(self, key: str) -> None:
+        """Учесть попадание в запись об отсутствующем объекте"""
+        prefix = LocalCache.prefix(key)
+        self._negative_hits[prefix] = self._negative_hits.get(prefix, 0) + 1
+
+    def _record_load_time(self, key: str, duration: float) -> None:
+        """Скользящее среднее времени загрузки по префиксу ключа"""
+        prefix = LocalCache.prefix(key)
+        previous = self._load_times.get(prefix)
+        self._load_times[prefix] = duration if previous is None else 0.8 * previous + 0.2 * duration
+
+    def _should_refresh_early(self, key: str, pttl: int, beta: float) -> bool:
+        """
+        Решение о досрочном обновлении (алгоритм XFetch)
+
+        Обновляем, если delta * beta * -ln(rand) >= оставшийся TTL,
+        где delta - среднее время загрузки значения.
+        """
+        delta = self._load_times.get(LocalCache.prefix(key))
+        if not delta or beta <= 0 or pttl is None or pttl < 0:
+            return False
+        return delta * beta * -math.log(1.0 - random.random()) * 1000 >= pttl
+
 
 # Глобальный экземпляр клиента Redis
 redis_client = RedisClient()
@@ -0,0 +1,57 @@
+"""Объединение одновременных загрузок одного ключа внутри процесса"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict
+
+
+class SingleFlight:
+    """
+    Single-flight: одновременные вызовы с одним ключом выполняют
+    загрузку один раз, остальные ждут и получают тот же результат
+    """
+
+    def __init__(self):
+        """Инициализация"""
+        self._flights: Dict[str, asyncio.Future] = {}
+
+    async def do(self, key: str, func: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Выполнить загрузку по ключу, объединяя одновременные вызовы
+
+        Args:
+            key: Ключ загрузки
+            func: Функция загрузки
+
+        Returns:
+            Результат func (общий для всех одновременных вызовов)
+        """
+        flight = self._flights.get(key)
+        if flight is not None:
+            try:
+                return await asyncio.shield(flight)
+            except asyncio.CancelledError:
+                # Отменили ведущий вызов, а не текущий - загружаем сами
+                if not flight.cancelled() or asyncio.current_task().cancelling():
+                    raise
+                return await self.do(key, func)
+
+        flight = asyncio.get_running_loop().create_future()
+        self._flights[key] = flight
+        try:
+            result = await func()
+        except asyncio.CancelledError:
+            flight.cancel()
+            raise
+        except Exception as e:
+            flight.set_exception(e)
+            # Исключение получат ожидающие; если их нет - не логируем "never retrieved"
+            flight.exception()
+            raise
+        else:
+            flight.set_result(result)
+            return result
+        finally:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+
+    def __len__(self) -> int:
+        return len(self._flights)
@@ -0,0 +1,20 @@
+from litestar import Controller, get
+from litestar.status_codes import HTTP_200_OK
+from app.metrics import metrics
+
+
+class MetricsController(Controller):
+    """Контроллер метрик процесса"""
+
+    path = "/metrics"
+
+    @get("/", status_code=HTTP_200_OK)
+    async def get_metrics(self) -> dict:
+        """
+        Получить метрики процесса
+
+        Returns:
+            Задержки операций (например, постановки задач TaskIQ в очередь),
+            счетчики и показатели (статистика кэшей)
+        """
+        return metrics.snapshot()
@@ -1,9 +1,11 @@
 """Контроллер для работы с заказами через REST API"""
 from litestar import Controller, get
 from litestar.di import Provide
+from litestar.exceptions import NotFoundException, ValidationException
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.repositories.order_repository import OrderRepository
 from app.schemas.order_schema import OrderResponse, OrderListResponse
+from app.repositories.cursor import next_cursor
 from typing import Optional
 
 
@@ -26,7 +28,6 @@ class OrderController(Controller):
         """
         order = await order_repository.get_by_id(db_session, order_id)
         if not order:
-            from litestar.exceptions import NotFoundException
             raise NotFoundException(f"Заказ с ID {order_id} не найден")
         return OrderResponse.model_validate(order)
 
@@ -39,6 +40,7 @@ class OrderController(Controller):
             page: int = 1,
             user_id: Optional[int] = None,
             status: Optional[str] = None,
+            after: Optional[str] = None,
     ) -> OrderListResponse:
         """
         Получить список заказов с фильтрацией и пагинацией
@@ -48,19 +50,25 @@ class OrderController(Controller):
             page: Номер страницы
             user_id: Фильтр по ID пользователя
             status: Фильтр по статусу
+            after: Курсор из next_cursor предыдущего ответа (keyset-пагинация, page игнорируется)
         """
-        orders = await order_repository.get_by_filter(
-            db_session,
-            count=count,
-            page=page,
-            user_id=user_id,
-            status=status
-        )
+        try:
+            orders = await order_repository.get_by_filter(
+                db_session,
+                count=count,
+                page=page,
+                after=after,
+                user_id=user_id,
+                status=status
+            )
+        except ValueError as e:
+            raise ValidationException(detail=str(e))
         total_count = await order_repository.get_total_count(db_session)
 
         return OrderListResponse(
             orders=[OrderResponse.model_validate(o) for o in orders],
-            total_count=total_count
+            total_count=total_count,
+            next_cursor=next_cursor(orders, count, "id")
         )
 
     @get("/user/{user_id:int}")
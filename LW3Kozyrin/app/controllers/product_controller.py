@@ -1,10 +1,12 @@
 """Контроллер для работы с продуктами через REST API"""
-from litestar import Controller, get
+from litestar import Controller, get, post
 from litestar.di import Provide
+from litestar.exceptions import NotFoundException, ValidationException
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.repositories.product_repository import ProductRepository
-from app.schemas.product_schema import ProductResponse, ProductListResponse
-from typing import Optional
+from app.schemas.product_schema import ProductCreate, ProductResponse, ProductListResponse, ProductBulkResponse
+from app.repositories.cursor import next_cursor
+from typing import Optional, List
 
 
 class ProductController(Controller):
@@ -26,7 +28,6 @@ class ProductController(Controller):
         """
         product = await product_repository.get_by_id(db_session, product_id)
         if not product:
-            from litestar.exceptions import NotFoundException
             raise NotFoundException(f"Продукт с ID {product_id} не найден")
         return ProductResponse.model_validate(product)
 
@@ -40,6 +41,7 @@ class ProductController(Controller):
             name: Optional[str] = None,
             min_price: Optional[float] = None,
             max_price: Optional[float] = None,
+            after: Optional[str] = None,
     ) -> ProductListResponse:
         """
         Получить список продуктов с фильтрацией и пагинацией
@@ -50,18 +52,40 @@ class ProductController(Controller):
             name: Фильтр по названию
             min_price: Минимальная цена
             max_price: Максимальная цена
+            after: Курсор из next_cursor предыдущего ответа (keyset-пагинация, page игнорируется)
         """
-        products = await product_repository.get_by_filter(
-            db_session,
-            count=count,
-            page=page,
-            name=name,
-            min_price=min_price,
-            max_price=max_price
-        )
+        try:
+            products = await product_repository.get_by_filter(
+                db_session,
+                count=count,
+                page=page,
+                after=after,
+                name=name,
+                min_price=min_price,
+                max_price=max_price
+            )
+        except ValueError as e:
+            raise ValidationException(detail=str(e))
         total_count = await product_repository.get_total_count(db_session)
 
         return ProductListResponse(
             products=[ProductResponse.model_validate(p) for p in products],
-            total_count=total_count
+            total_count=total_count,
+            next_cursor=next_cursor(products, count, "id")
         )
+
+    @post("/bulk", status_code=201)
+    async def create_products_bulk(
+            self,
+            db_session: AsyncSession,
+            product_repository: ProductRepository,
+            data: List[ProductCreate],
+    ) -> ProductBulkResponse:
+        """
+        Создать продукты пакетно (импорт каталога)
+
+        Args:
+            data: Список продуктов для создания
+        """
+        products = await product_repository.create_many(db_session, data)
+        return ProductBulkResponse(created=len(products), ids=[p.id for p in products])
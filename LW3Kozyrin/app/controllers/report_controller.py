@@ -1,15 +1,66 @@
+import asyncio
+import hashlib
+import time
+import uuid
 from litestar import Controller, get, post
 from litestar.di import Provide
 from litestar.params import Parameter
-from litestar.status_codes import HTTP_200_OK, HTTP_202_ACCEPTED, HTTP_404_NOT_FOUND
-from litestar.response import Response
+from litestar.status_codes import HTTP_200_OK, HTTP_202_ACCEPTED, HTTP_304_NOT_MODIFIED, HTTP_404_NOT_FOUND
+from litestar.enums import MediaType
+from litestar.response import Response, Stream
+from litestar.exceptions import ValidationException, NotFoundException
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.repositories.report_repository import ReportRepository
-from app.schemas.report_schema import ReportResponse
-from typing import List, Annotated
+from app.repositories.product_sales_repository import ProductSalesRepository
+from app.schemas.report_schema import ReportResponse, ProductSalesResponse
+from app.repositories.cursor import next_cursor
+from app.scheduler.backfill import BackfillProgress
+from app.scheduler.locks import ReportTaskRegistry
+from app.scheduler.taskiq_app import broker, generate_report_for_date, backfill_reports
+from app.metrics import metrics
+from app.services.report_export import EXPORT_FORMATS, check_format, export_reports
+from typing import List, Annotated, Optional
 from datetime import date
 
 
+# Максимальная длина диапазона пересчета отчетов, дней
+REPORT_BACKFILL_MAX_DAYS = 366
+
+# Максимальное время ожидания результата задачи в GET /report/tasks/{task_id}, секунды
+TASK_MAX_WAIT = 60
+
+# Интервал проверки готовности результата при ожидании, секунды
+TASK_POLL_INTERVAL = 0.25
+
+# Максимальное количество продуктов в GET /report/top-products
+TOP_PRODUCTS_MAX_LIMIT = 100
+
+
+
+def etag_matches(etag: str, if_none_match: Optional[str]) -> bool:
+    """
+    Совпадает ли ETag с заголовком If-None-Match
+
+    Используется слабое сравнение (RFC 9110): префикс W/ не учитывается,
+    "*" совпадает с любым ETag.
+
+    Args:
+        etag: ETag ответа
+        if_none_match: Значение заголовка If-None-Match
+
+    Returns:
+        True если клиенту можно ответить 304
+    """
+    if not if_none_match:
+        return False
+    weak_etag = etag.removeprefix("W/")
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*" or tag.removeprefix("W/") == weak_etag:
+            return True
+    return False
+
+
 class ReportController(Controller):
     """Контроллер для работы с отчетами"""
 
@@ -20,32 +71,120 @@ class ReportController(Controller):
             self,
             db_session: AsyncSession,
             report_repository: ReportRepository,
-            report_date: Annotated[date, Parameter(description="Дата отчета в формате YYYY-MM-DD")]
-    ) -> List[ReportResponse]:
+            report_date: Annotated[date, Parameter(description="Дата отчета в формате YYYY-MM-DD")],
+            if_none_match: Annotated[Optional[str], Parameter(header="If-None-Match", default=None)]
+    ) -> Response[bytes]:
         """
         Получить отчеты за конкретную дату
 
+        Ответ содержит ETag; если клиент передал тот же ETag (в том числе
+        слабый W/"..." или "*") в If-None-Match, возвращается 304 без тела.
+
         Args:
             db_session: Сессия базы данных
             report_repository: Репозиторий отчетов
             report_date: Дата отчета
+            if_none_match: ETag из предыдущего ответа
 
         Returns:
-            Список отчетов за указанную дату
+            Список отчетов за указанную дату (или сообщение об их отсутствии)
         """
-        reports = await report_repository.get_by_date(db_session, report_date)
+        body = await report_repository.get_response_by_date(db_session, report_date)
+        etag = f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
 
-        if not reports:
-            return Response(
-                content={
-                    "message": f"Отчеты за {report_date} не найдены",
-                    "date": str(report_date),
-                    "reports": []
-                },
-                status_code=HTTP_200_OK
-            )
+        if etag_matches(etag, if_none_match):
+            return Response(content=b"", status_code=HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+        return Response(
+            content=body,
+            media_type=MediaType.JSON,
+            status_code=HTTP_200_OK,
+            headers={"ETag": etag}
+        )
+
+    @get("/export", status_code=HTTP_200_OK)
+    async def export_reports_file(
+            self,
+            db_session: AsyncSession,
+            date_from: Annotated[date, Parameter(query="from", description="Первая дата диапазона")],
+            date_to: Annotated[date, Parameter(query="to", description="Последняя дата диапазона (включительно)")],
+            export_format: Annotated[str, Parameter(
+                query="format",
+                default="csv.gz",
+                description="Формат выгрузки: csv.gz или parquet"
+            )]
+    ) -> Stream:
+        """
+        Выгрузить отчеты за диапазон дат файлом
+
+        Строки читаются из БД пачками и кодируются вне цикла событий
+        по мере отдачи ответа, поэтому память не зависит от объема выгрузки.
 
-        return [ReportResponse.model_validate(report) for report in reports]
+        Args:
+            db_session: Сессия базы данных (используется ее движок)
+            date_from: Первая дата диапазона
+            date_to: Последняя дата диапазона
+            export_format: Формат выгрузки
+
+        Returns:
+            Потоковый ответ с файлом
+
+        Raises:
+            ValidationException: Если диапазон пустой или формат не поддерживается
+        """
+        if date_from > date_to:
+            raise ValidationException(detail="Дата начала диапазона позже даты окончания")
+        try:
+            check_format(export_format)
+        except ValueError as e:
+            raise ValidationException(detail=str(e))
+
+        filename = f"reports_{date_from}_{date_to}.{export_format}"
+        return Stream(
+            export_reports(db_session.bind, date_from, date_to, export_format),
+            media_type=EXPORT_FORMATS[export_format],
+            headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+        )
+
+    @get("/top-products", status_code=HTTP_200_OK)
+    async def get_top_products(
+            self,
+            db_session: AsyncSession,
+            product_sales_repository: ProductSalesRepository,
+            sales_date: Annotated[date, Parameter(query="date", description="Дата продаж в формате YYYY-MM-DD")],
+            limit: Annotated[int, Parameter(default=10, ge=1, le=TOP_PRODUCTS_MAX_LIMIT)],
+            by: Annotated[str, Parameter(default="units", description="Сортировка: units или revenue")]
+    ) -> dict:
+        """
+        Получить топ продуктов за дату
+
+        Читается свертка product_daily_sales, которую ведет планировщик,
+        а не позиции заказов; продажи за текущий день отстают на интервал
+        задачи update_product_sales.
+
+        Args:
+            db_session: Сессия базы данных
+            product_sales_repository: Репозиторий свертки продаж
+            sales_date: Дата продаж
+            limit: Количество продуктов
+            by: Поле сортировки
+
+        Returns:
+            Дата, поле сортировки и список продуктов
+
+        Raises:
+            ValidationException: Если поле сортировки неизвестно
+        """
+        try:
+            rows = await product_sales_repository.get_top(db_session, sales_date, limit, by)
+        except ValueError as e:
+            raise ValidationException(detail=str(e))
+
+        return {
+            "date": str(sales_date),
+            "by": by,
+            "products": [ProductSalesResponse.model_validate(row) for row in rows]
+        }
 
     @get("/all", status_code=HTTP_200_OK)
     async def get_all_reports(
@@ -53,7 +192,8 @@ class ReportController(Controller):
             db_session: AsyncSession,
             report_repository: ReportRepository,
             count: int = 10,
-            page: int = 1
+            page: int = 1,
+            after: Optional[str] = None
     ) -> dict:
         """
         Получить все отчеты с пагинацией
@@ -63,6 +203,7 @@ class ReportController(Controller):
             report_repository: Репозиторий отчетов
             count: Количество записей на странице
             page: Номер страницы
+            after: Курсор из next_cursor предыдущего ответа (keyset-пагинация, page игнорируется)
 
         Returns:
             Словарь с отчетами и метаданными пагинации
@@ -72,7 +213,10 @@ class ReportController(Controller):
         if page <= 0:
             page = 1
 
-        reports = await report_repository.get_all(db_session, count, page)
+        try:
+            reports = await report_repository.get_all(db_session, count, page, after=after)
+        except ValueError as e:
+            raise ValidationException(detail=str(e))
         total = await report_repository.get_total_count(db_session)
 
         return {
@@ -81,7 +225,8 @@ class ReportController(Controller):
                 "page": page,
                 "count": count,
                 "total": total,
-                "pages": (total + count - 1) // count
+                "pages": (total + count - 1) // count,
+                "next_cursor": next_cursor(reports, count, "report_at", "id")
             }
         }
 
@@ -93,17 +238,32 @@ class ReportController(Controller):
         """
         Запустить генерацию отчета за конкретную дату вручную
 
+        Повторный запрос для даты, пересчет которой уже запланирован или
+        выполняется, не ставит новую задачу, а возвращает ID текущей.
+
         Args:
             report_date: Дата для генерации отчета
 
         Returns:
             Статус запуска задачи
         """
-        from app.scheduler.taskiq_app import generate_report_for_date
+        # Если пересчет даты уже запланирован, возвращаем ID той задачи
+        registry = ReportTaskRegistry()
+        task_id = uuid.uuid4().hex
+        existing_task_id = await registry.claim(report_date, task_id)
+        if existing_task_id is not None:
+            return {
+                "status": "already_scheduled",
+                "message": f"Генерация отчета за {report_date} уже запланирована",
+                "task_id": existing_task_id,
+                "date": str(report_date)
+            }
 
         try:
             # Запускаем задачу асинхронно через TaskIQ
-            task = await generate_report_for_date.kiq(target_date=str(report_date))
+            task = await generate_report_for_date.kicker().with_task_id(task_id).kiq(
+                target_date=str(report_date)
+            )
 
             return {
                 "status": "scheduled",
@@ -112,6 +272,8 @@ class ReportController(Controller):
                 "date": str(report_date)
             }
         except Exception as e:
+            metrics.error(f"taskiq.kiq.{generate_report_for_date.task_name}")
+            await registry.release(report_date, task_id)
             return Response(
                 content={
                     "status": "error",
@@ -120,3 +282,119 @@ class ReportController(Controller):
                 },
                 status_code=500
             )
+
+    @post("/backfill", status_code=HTTP_202_ACCEPTED)
+    async def start_backfill(
+            self,
+            start: Annotated[date, Parameter(description="Первая дата диапазона")],
+            end: Annotated[date, Parameter(description="Последняя дата диапазона (включительно)")]
+    ) -> dict:
+        """
+        Запустить пересчет отчетов за диапазон дат
+
+        Args:
+            start: Первая дата диапазона
+            end: Последняя дата диапазона
+
+        Returns:
+            ID пересчета для опроса прогресса
+
+        Raises:
+            ValidationException: Если диапазон пустой или слишком длинный
+        """
+        if start > end:
+            raise ValidationException(detail="Дата начала диапазона позже даты окончания")
+        if (end - start).days + 1 > REPORT_BACKFILL_MAX_DAYS:
+            raise ValidationException(detail=f"Диапазон длиннее {REPORT_BACKFILL_MAX_DAYS} дней")
+
+        progress = BackfillProgress()
+        backfill_id = await progress.create(start, end)
+        try:
+            await backfill_reports.kiq(backfill_id=backfill_id)
+        except Exception as e:
+            metrics.error(f"taskiq.kiq.{backfill_reports.task_name}")
+            await progress.fail(backfill_id, f"Ошибка при запуске задачи: {str(e)}")
+            return Response(
+                content={
+                    "status": "error",
+                    "message": f"Ошибка при запуске задачи: {str(e)}",
+                    "backfill_id": backfill_id
+                },
+                status_code=500
+            )
+
+        return {
+            "status": "scheduled",
+            "backfill_id": backfill_id,
+            "start": str(start),
+            "end": str(end),
+            "total": (end - start).days + 1
+        }
+
+    @get("/backfill/{backfill_id:str}", status_code=HTTP_200_OK)
+    async def get_backfill_progress(self, backfill_id: str) -> dict:
+        """
+        Получить прогресс пересчета отчетов
+
+        Args:
+            backfill_id: ID пересчета
+
+        Returns:
+            Счетчики обработанных, пропущенных и неудачных дат и статус
+
+        Raises:
+            NotFoundException: Если пересчет не найден
+        """
+        progress = await BackfillProgress().get(backfill_id)
+        if progress is None:
+            raise NotFoundException(detail=f"Пересчет {backfill_id} не найден")
+        return progress
+
+    @get("/tasks/{task_id:str}", status_code=HTTP_200_OK)
+    async def get_task_status(
+            self,
+            task_id: str,
+            wait: Annotated[float, Parameter(
+                default=0,
+                ge=0,
+                le=TASK_MAX_WAIT,
+                description="Сколько секунд ждать завершения задачи (long-poll)"
+            )]
+    ) -> dict:
+        """
+        Получить статус задачи пересчета
+
+        При wait > 0 запрос ждет завершения задачи до wait секунд, проверяя
+        хранилище результатов в Redis, поэтому клиенту не нужно опрашивать
+        /report/ в цикле. Задача, результат которой еще не записан (в том
+        числе неизвестная или с истекшим результатом), имеет статус pending.
+
+        Args:
+            task_id: ID задачи из POST /report/generate
+            wait: Время ожидания завершения в секундах
+
+        Returns:
+            Статус задачи и ее результат или ошибка
+        """
+        result_backend = broker.result_backend
+        deadline = time.monotonic() + wait
+        while not await result_backend.is_result_ready(task_id):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return {"task_id": task_id, "status": "pending"}
+            await asyncio.sleep(min(TASK_POLL_INTERVAL, remaining))
+
+        result = await result_backend.get_result(task_id)
+        if result.is_err:
+            return {
+                "task_id": task_id,
+                "status": "error",
+                "error": str(result.error),
+                "execution_time": result.execution_time
+            }
+        return {
+            "task_id": task_id,
+            "status": "success",
+            "result": result.return_value,
+            "execution_time": result.execution_time
+        }
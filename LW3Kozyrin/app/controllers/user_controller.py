@@ -1,8 +1,10 @@
 from litestar import Controller, get, post, put, delete
 from litestar.params import Parameter
-from litestar.exceptions import NotFoundException
+from litestar.exceptions import NotFoundException, ValidationException
 from app.services.user_service import UserService
 from app.schemas.user_schema import UserCreate, UserUpdate, UserResponse, UserListResponse
+from app.repositories.cursor import next_cursor
+from typing import Optional
 
 
 class UserController(Controller):
@@ -38,8 +40,9 @@ class UserController(Controller):
     async def get_all_users(
             self,
             user_service: UserService,
-            count: int = Parameter(10, gt=0, le=100, description="Количество записей на странице"),
-            page: int = Parameter(1, gt=0, description="Номер страницы"),
+            count: int = Parameter(default=10, gt=0, le=100, description="Количество записей на странице"),
+            page: int = Parameter(default=1, gt=0, description="Номер страницы"),
+            after: Optional[str] = Parameter(default=None, description="Курсор следующей страницы (next_cursor)"),
     ) -> UserListResponse:
         """
         Получить список всех пользователей с пагинацией
@@ -48,16 +51,24 @@ class UserController(Controller):
             user_service: Сервис для работы с пользователями
             count: Количество записей на странице (по умолчанию 10, максимум 100)
             page: Номер страницы (начиная с 1)
+            after: Курсор из next_cursor предыдущего ответа (keyset-пагинация, page игнорируется)
 
         Returns:
-            UserListResponse со списком пользователей и общим количеством
+            UserListResponse со списком пользователей, общим количеством и курсором следующей страницы
+
+        Raises:
+            ValidationException: Если курсор поврежден
         """
-        users = await user_service.get_by_filter(count=count, page=page)
+        try:
+            users = await user_service.get_by_filter(count=count, page=page, after=after)
+        except ValueError as e:
+            raise ValidationException(detail=str(e))
         total_count = await user_service.get_total_count()
 
         return UserListResponse(
             users=[UserResponse.model_validate(user) for user in users],
-            total_count=total_count
+            total_count=total_count,
+            next_cursor=next_cursor(users, count, "id")
         )
 
     @post(status_code=201)
@@ -0,0 +1,124 @@
+"""Метрики приложения в памяти процесса"""
+import bisect
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List
+
+# Верхние границы корзин гистограммы задержек, миллисекунды
+LATENCY_BUCKETS_MS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+class LatencyStats:
+    """Гистограмма задержек одной операции"""
+
+    def __init__(self):
+        """Инициализация"""
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets: List[int] = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+
+    def observe(self, seconds: float) -> None:
+        """Учесть одно измерение"""
+        ms = seconds * 1000
+        self.count += 1
+        self.total += ms
+        self.max = max(self.max, ms)
+        self.buckets[bisect.bisect_left(LATENCY_BUCKETS_MS, ms)] += 1
+
+    def quantile(self, q: float) -> float:
+        """Оценка квантиля по корзинам (верхняя граница корзины), мс"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, bucket_count in zip(LATENCY_BUCKETS_MS, self.buckets):
+            seen += bucket_count
+            if seen >= rank:
+                return float(bound)
+        return self.max
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Текущие значения"""
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "avg_ms": round(self.total / self.count, 3) if self.count else 0.0,
+            "p50_ms": self.quantile(0.5),
+            "p95_ms": self.quantile(0.95),
+            "p99_ms": self.quantile(0.99),
+            "max_ms": round(self.max, 3),
+            "buckets_ms": {
+                **{str(bound): count for bound, count in zip(LATENCY_BUCKETS_MS, self.buckets)},
+                "inf": self.buckets[-1],
+            },
+        }
+
+
+class Metrics:
+    """
+    Реестр метрик процесса: задержки, счетчики и показатели,
+    вычисляемые при чтении (например, статистика кэша)
+    """
+
+    def __init__(self):
+        """Инициализация"""
+        self._latencies: Dict[str, LatencyStats] = {}
+        self._counters: Dict[str, int] = {}
+        self._gauges: Dict[str, Callable[[], Any]] = {}
+
+    def observe(self, name: str, seconds: float) -> None:
+        """
+        Учесть длительность операции
+
+        Args:
+            name: Имя метрики
+            seconds: Длительность в секундах
+        """
+        self._latencies.setdefault(name, LatencyStats()).observe(seconds)
+
+    def error(self, name: str) -> None:
+        """Учесть неудачную операцию"""
+        self._latencies.setdefault(name, LatencyStats()).errors += 1
+
+    @contextmanager
+    def timer(self, name: str) -> Iterator[None]:
+        """Измерить длительность блока; исключение учитывается как ошибка"""
+        started = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.error(name)
+            raise
+        self.observe(name, time.perf_counter() - started)
+
+    def increment(self, name: str, value: int = 1) -> None:
+        """Увеличить счетчик"""
+        self._counters[name] = self._counters.get(name, 0) + value
+
+    def register_gauge(self, name: str, func: Callable[[], Any]) -> None:
+        """
+        Зарегистрировать показатель, вычисляемый при чтении метрик
+
+        Args:
+            name: Имя показателя
+            func: Функция без аргументов, возвращающая значение
+        """
+        self._gauges[name] = func
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Текущие значения всех метрик"""
+        return {
+            "latency": {name: stats.snapshot() for name, stats in self._latencies.items()},
+            "counters": dict(self._counters),
+            "gauges": {name: func() for name, func in self._gauges.items()},
+        }
+
+    def reset(self) -> None:
+        """Сбросить задержки и счетчики (показатели остаются зарегистрированными)"""
+        self._latencies.clear()
+        self._counters.clear()
+
+
+metrics = Metrics()
@@ -7,6 +7,8 @@ from app.models.address import Address
 from app.models.product import Product
 from app.models.order import Order, OrderItem, OrderStatus
 from app.models.report import Report
+from app.models.product_sales import ProductDailySales, RollupWatermark
+from app.models.processed_message import ProcessedMessage
 
 __all__ = [
     "Base",
@@ -17,4 +19,7 @@ __all__ = [
     "OrderItem",
     "OrderStatus",
     "Report",
+    "ProductDailySales",
+    "RollupWatermark",
+    "ProcessedMessage",
 ]
@@ -0,0 +1,26 @@
+from sqlalchemy import Column, DateTime, String
+from datetime import datetime
+from app.models.base import Base
+
+
+class ProcessedMessage(Base):
+    """
+    Модель обработанного сообщения брокера (ключ идемпотентности)
+
+    Запись добавляется в транзакции обработчика, поэтому повторно
+    доставленное сообщение не применяется дважды, даже если ключ
+    в Redis уже истек или недоступен.
+
+    Attributes:
+        queue: Очередь сообщения
+        message_id: Ключ идемпотентности сообщения
+        processed_at: Время обработки
+    """
+    __tablename__ = 'processed_messages'
+
+    queue = Column(String(64), primary_key=True)
+    message_id = Column(String(128), primary_key=True)
+    processed_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+    def __repr__(self):
+        return f"<ProcessedMessage(queue='{self.queue}', message_id='{self.message_id}')>"
@@ -0,0 +1,52 @@
+from sqlalchemy import Column, Integer, Float, Date, String, ForeignKey, Index
+from sqlalchemy.orm import relationship
+from app.models.base import Base
+
+
+class ProductDailySales(Base):
+    """
+    Модель дневных продаж продукта (свертка позиций заказов)
+
+    Attributes:
+        sales_date: Дата продаж (дата создания заказов)
+        product_id: ID продукта
+        units: Количество проданных единиц
+        revenue: Выручка (сумма price_at_purchase * quantity)
+    """
+    __tablename__ = 'product_daily_sales'
+    __table_args__ = (
+        # Топ продуктов за дату читается по индексу без сортировки
+        Index('idx_product_daily_sales_date_units', 'sales_date', 'units', 'product_id'),
+        Index('idx_product_daily_sales_date_revenue', 'sales_date', 'revenue', 'product_id'),
+    )
+
+    sales_date = Column(Date, primary_key=True)
+    product_id = Column(Integer, ForeignKey('products.id'), primary_key=True)
+    units = Column(Integer, nullable=False, default=0)
+    revenue = Column(Float, nullable=False, default=0.0)
+
+    # Связи
+    product = relationship("Product")
+
+    def __repr__(self):
+        return (
+            f"<ProductDailySales(sales_date={self.sales_date}, product_id={self.product_id}, "
+            f"units={self.units}, revenue={self.revenue})>"
+        )
+
+
+class RollupWatermark(Base):
+    """
+    Модель водяного знака инкрементальной свертки
+
+    Attributes:
+        name: Имя свертки
+        last_order_id: ID последнего учтенного заказа
+    """
+    __tablename__ = 'rollup_watermarks'
+
+    name = Column(String, primary_key=True)
+    last_order_id = Column(Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<RollupWatermark(name='{self.name}', last_order_id={self.last_order_id})>"
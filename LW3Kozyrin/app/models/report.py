@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, Date, ForeignKey
+from sqlalchemy import Column, Integer, Date, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from datetime import date
 from app.models.base import Base
@@ -15,6 +15,12 @@ class Report(Base):
         count_product: Количество продуктов в заказе
     """
     __tablename__ = 'reports'
+    __table_args__ = (
+        # Ключ keyset-пагинации GET /report/all
+        Index('idx_reports_report_at_id', 'report_at', 'id'),
+        # Одна запись на заказ в отчете за дату; ключ ON CONFLICT при пересчете
+        Index('uq_reports_report_at_order_id', 'report_at', 'order_id', unique=True),
+    )
 
     id = Column(Integer, primary_key=True)
     report_at = Column(Date, nullable=False, index=True)
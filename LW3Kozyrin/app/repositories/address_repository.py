@@ -2,6 +2,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func
 from app.models.address import Address
 from app.schemas.address_schema import AddressCreate, AddressUpdate
+from app.repositories.cursor import decode_id_cursor
 from typing import Optional, List
 
 
@@ -27,9 +28,18 @@ class AddressRepository:
         session: AsyncSession, 
         count: int = 10, 
         page: int = 1, 
+        after: Optional[str] = None,
         **kwargs
     ) -> List[Address]:
-        """Получить список адресов с пагинацией"""
+        """
+        Получить список адресов с пагинацией
+
+        При переданном курсоре after используется keyset-пагинация по id
+        вместо OFFSET (page игнорируется).
+
+        Raises:
+            ValueError: Если курсор поврежден
+        """
         query = select(Address)
         
         if "user_id" in kwargs and kwargs["user_id"]:
@@ -37,8 +47,13 @@ class AddressRepository:
         if "city" in kwargs and kwargs["city"]:
             query = query.where(Address.city.ilike(f"%{kwargs['city']}%"))
         
-        offset = (page - 1) * count
-        query = query.offset(offset).limit(count)
+        query = query.order_by(Address.id)
+
+        if after is not None:
+            query = query.where(Address.id > decode_id_cursor(after)).limit(count)
+        else:
+            offset = (page - 1) * count
+            query = query.offset(offset).limit(count)
         
         result = await session.execute(query)
         return list(result.scalars().all())
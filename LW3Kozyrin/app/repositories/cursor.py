@@ -0,0 +1,74 @@
+"""Курсоры для keyset-пагинации"""
+import base64
+import json
+from datetime import date
+from typing import Any, Optional, Sequence
+
+
+def encode_cursor(*values: Any) -> str:
+    """
+    Закодировать значения ключа сортировки в непрозрачный курсор
+
+    Args:
+        *values: Значения ключа последней записи страницы (например, id)
+
+    Returns:
+        Курсор в base64url без выравнивания
+    """
+    raw = json.dumps([v.isoformat() if isinstance(v, date) else v for v in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int = 1) -> list:
+    """
+    Раскодировать курсор
+
+    Args:
+        cursor: Курсор из параметра after
+        size: Ожидаемое количество значений в курсоре
+
+    Returns:
+        Список значений ключа сортировки
+
+    Raises:
+        ValueError: Если курсор поврежден
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Некорректный курсор: {cursor}") from e
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError(f"Некорректный курсор: {cursor}")
+    return values
+
+
+def decode_id_cursor(cursor: str) -> int:
+    """
+    Раскодировать курсор, содержащий только id
+
+    Raises:
+        ValueError: Если курсор поврежден
+    """
+    (value,) = decode_cursor(cursor)
+    if not isinstance(value, int) or isinstance(value, bool):
+        raise ValueError(f"Некорректный курсор: {cursor}")
+    return value
+
+
+def next_cursor(items: Sequence[Any], count: int, *fields: str) -> Optional[str]:
+    """
+    Курсор следующей страницы
+
+    Args:
+        items: Записи текущей страницы
+        count: Размер страницы
+        *fields: Поля ключа сортировки
+
+    Returns:
+        Курсор или None, если страница последняя
+    """
+    if not items or len(items) < count:
+        return None
+    last = items[-1]
+    return encode_cursor(*(getattr(last, field) for field in fields))
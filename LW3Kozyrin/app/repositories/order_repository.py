@@ -1,17 +1,30 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func
+from sqlalchemy import select, func, insert
 from sqlalchemy.orm import selectinload
+from sqlalchemy.orm.attributes import set_committed_value
 from app.models.order import Order, OrderItem
-from app.models.product import Product
 from app.models.user import User
 from app.models.address import Address
 from app.schemas.order_schema import OrderCreate, OrderUpdate
+from app.repositories.cursor import decode_id_cursor
+from app.repositories.report_repository import ReportRepository
+from app.repositories.product_sales_repository import ProductSalesRepository
+from app.repositories.product_repository import ProductRepository
 from typing import Optional, List
 
 
 class OrderRepository:
     """Репозиторий для работы с заказами в базе данных"""
 
+    # Отчет за день ведется инкрементально в транзакциях заказов
+    report_repository = ReportRepository()
+
+    # Свертку продаж ведет планировщик; при удалении заказа она уменьшается сразу
+    product_sales_repository = ProductSalesRepository()
+
+    # Цены продуктов заказа читаются из кэша одним MGET
+    product_repository = ProductRepository()
+
     async def get_by_id(self, session: AsyncSession, order_id: int) -> Optional[Order]:
         """
         Получить заказ по ID вместе со всеми связанными данными
@@ -44,9 +57,18 @@ class OrderRepository:
             session: AsyncSession,
             count: int = 10,
             page: int = 1,
+            after: Optional[str] = None,
             **kwargs
     ) -> List[Order]:
-        """Получить список заказов с фильтрацией и пагинацией"""
+        """
+        Получить список заказов с фильтрацией и пагинацией
+
+        При переданном курсоре after используется keyset-пагинация по id
+        вместо OFFSET (page игнорируется).
+
+        Raises:
+            ValueError: Если курсор поврежден
+        """
         query = select(Order).options(selectinload(Order.order_items))
 
         if "user_id" in kwargs and kwargs["user_id"]:
@@ -54,8 +76,13 @@ class OrderRepository:
         if "status" in kwargs and kwargs["status"]:
             query = query.where(Order.status == kwargs["status"])
 
-        offset = (page - 1) * count
-        query = query.offset(offset).limit(count)
+        query = query.order_by(Order.id)
+
+        if after is not None:
+            query = query.where(Order.id > decode_id_cursor(after)).limit(count)
+        else:
+            offset = (page - 1) * count
+            query = query.offset(offset).limit(count)
 
         result = await session.execute(query)
         return list(result.scalars().all())
@@ -69,73 +96,80 @@ class OrderRepository:
         """
         Создать новый заказ с несколькими продуктами
 
+        Количество запросов не зависит от размера корзины: пользователь и адрес
+        проверяются одним запросом, цены продуктов читаются из кэша одним MGET,
+        а отсутствующие в кэше загружаются одним запросом IN (см.
+        ProductRepository.get_by_ids), заказ вставляется сразу с итоговой
+        стоимостью, а все элементы заказа - одним пакетным INSERT. В той же транзакции заказ учитывается в отчете
+        за день его создания.
+
         Args:
             session: Сессия базы данных
             order_data: Данные для создания заказа (включая список товаров)
 
         Returns:
-            Созданный заказ
+            Созданный заказ (с загруженными order_items)
 
         Raises:
             ValueError: Если пользователь, адрес или продукт не найдены
         """
-        user_result = await session.execute(
-            select(User).where(User.id == order_data.user_id)
-        )
-        user = user_result.scalar_one_or_none()
-        if not user:
+        user_exists, address_exists = (await session.execute(
+            select(
+                select(User.id).where(User.id == order_data.user_id).exists(),
+                select(Address.id).where(Address.id == order_data.address_id).exists()
+            )
+        )).one()
+        if not user_exists:
             raise ValueError(f"User with ID {order_data.user_id} not found")
-
-        address_result = await session.execute(
-            select(Address).where(Address.id == order_data.address_id)
-        )
-        address = address_result.scalar_one_or_none()
-        if not address:
+        if not address_exists:
             raise ValueError(f"Address with ID {order_data.address_id} not found")
 
-        # Создаем заказ
+        # Получаем цены всех продуктов заказа одним запросом к кэшу
+        product_ids = {item.product_id for item in order_data.items}
+        # Незафиксированные остатки (списание в той же транзакции) в кэш не пишутся
+        products = await self.product_repository.get_by_ids(session, product_ids, store_missing=False)
+        prices = {product_id: product.price for product_id, product in products.items()}
+        for item_data in order_data.items:
+            if item_data.product_id not in prices:
+                raise ValueError(f"Product with ID {item_data.product_id} not found")
+
+        # Создаем заказ сразу с итоговой стоимостью
         order = Order(
             user_id=order_data.user_id,
             address_id=order_data.address_id,
-            total_price=0.0
+            total_price=sum(
+                prices[item_data.product_id] * item_data.quantity
+                for item_data in order_data.items
+            )
         )
         session.add(order)
         await session.flush()  # Получаем ID заказа
 
-        # Добавляем товары в заказ и подсчитываем общую стоимость
-        total_price = 0.0
-        for item_data in order_data.items:
-            # Получаем продукт для получения его цены
-            product_result = await session.execute(
-                select(Product).where(Product.id == item_data.product_id)
-            )
-            product = product_result.scalar_one_or_none()
-            if not product:
-                raise ValueError(f"Product with ID {item_data.product_id} not found")
-
-            # Создаем элемент заказа
-            order_item = OrderItem(
-                order_id=order.id,
-                product_id=item_data.product_id,
-                quantity=item_data.quantity,
-                price_at_purchase=product.price
-            )
-            session.add(order_item)
-            total_price += product.price * item_data.quantity
-
-        # Обновляем общую стоимость заказа
-        order.total_price = total_price
+        # Добавляем все товары заказа одним INSERT ... RETURNING
+        items_result = await session.scalars(
+            insert(OrderItem).returning(OrderItem),
+            [
+                {
+                    "order_id": order.id,
+                    "product_id": item_data.product_id,
+                    "quantity": item_data.quantity,
+                    "price_at_purchase": prices[item_data.product_id]
+                }
+                for item_data in order_data.items
+            ]
+        )
+        # Заполняем order_items без повторного SELECT заказа
+        set_committed_value(order, "order_items", list(items_result.all()))
+
+        await self.report_repository.record_order(
+            session,
+            order.created_at.date(),
+            order.id,
+            sum(item_data.quantity for item_data in order_data.items)
+        )
 
         await session.commit()
-        await session.refresh(order)
-
-        # Загружаем order_items
-        result = await session.execute(
-            select(Order)
-            .options(selectinload(Order.order_items))
-            .where(Order.id == order.id)
-        )
-        return result.scalar_one()
+        return order
 
     async def update(
             self,
@@ -143,7 +177,12 @@ class OrderRepository:
             order_id: int,
             order_data: OrderUpdate
     ) -> Optional[Order]:
-        """Обновить данные заказа"""
+        """
+        Обновить данные заказа
+
+        Обновляются только адрес и статус, количество продуктов не меняется,
+        поэтому запись заказа в отчете остается актуальной.
+        """
         order = await self.get_by_id(session, order_id)
         if not order:
             return None
@@ -157,11 +196,15 @@ class OrderRepository:
         return order
 
     async def delete(self, session: AsyncSession, order_id: int) -> bool:
-        """Удалить заказ"""
+        """Удалить заказ вместе с его записями в отчетах и в свертке продаж"""
         order = await self.get_by_id(session, order_id)
         if not order:
             return False
 
+        report_date = order.created_at.date()
+        await self.report_repository.remove_order(session, order_id)
+        await self.product_sales_repository.remove_order(session, order)
         await session.delete(order)
         await session.commit()
+        await self.report_repository.invalidate_cache([report_date])
         return True
@@ -0,0 +1,63 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, insert, delete
+from sqlalchemy.dialects import postgresql, sqlite
+from app.models.processed_message import ProcessedMessage
+from datetime import datetime
+
+
+class ProcessedMessageRepository:
+    """Репозиторий ключей идемпотентности сообщений брокера"""
+
+    # Диалекты с INSERT ... ON CONFLICT; для остальных ключ сначала ищется
+    UPSERT_INSERTS = {
+        "postgresql": postgresql.insert,
+        "sqlite": sqlite.insert,
+    }
+
+    async def record(self, session: AsyncSession, queue: str, message_id: str) -> bool:
+        """
+        Записать ключ сообщения в транзакции обработчика (без commit)
+
+        Ключ фиксируется вместе с изменениями обработчика и откатывается
+        вместе с ними. Параллельная транзакция с тем же ключом ждет
+        фиксации первой (первичный ключ) и получает False.
+
+        Args:
+            session: Сессия базы данных
+            queue: Очередь сообщения
+            message_id: Ключ идемпотентности
+
+        Returns:
+            True если ключ записан, False если сообщение уже обработано
+        """
+        values = {"queue": queue, "message_id": message_id, "processed_at": datetime.utcnow()}
+        dialect_insert = self.UPSERT_INSERTS.get(session.bind.dialect.name)
+        if dialect_insert is not None:
+            result = await session.execute(dialect_insert(ProcessedMessage).values(**values).on_conflict_do_nothing())
+            return result.rowcount == 1
+
+        exists = (await session.execute(
+            select(ProcessedMessage.message_id).where(
+                ProcessedMessage.queue == queue,
+                ProcessedMessage.message_id == message_id
+            )
+        )).first()
+        if exists:
+            return False
+        await session.execute(insert(ProcessedMessage).values(**values))
+        return True
+
+    async def purge(self, session: AsyncSession, before: datetime) -> int:
+        """
+        Удалить ключи сообщений, обработанных раньше заданного времени
+
+        Args:
+            session: Сессия базы данных
+            before: Граница времени обработки
+
+        Returns:
+            Количество удаленных ключей
+        """
+        result = await session.execute(delete(ProcessedMessage).where(ProcessedMessage.processed_at < before))
+        await session.commit()
+        return result.rowcount
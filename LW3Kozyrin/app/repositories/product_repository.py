@@ -1,9 +1,12 @@
+import os
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func
+from sqlalchemy import select, func, insert, update
+from sqlalchemy.engine import Row
 from app.models.product import Product
 from app.schemas.product_schema import ProductCreate, ProductUpdate
 from app.cache.redis_client import redis_client
-from typing import Optional, List
+from app.repositories.cursor import decode_id_cursor
+from typing import Optional, List, Dict, Iterable, Mapping, Sequence, Union
 
 
 class ProductRepository:
@@ -11,10 +14,19 @@ class ProductRepository:
 
     PRODUCT_CACHE_TTL = 600
 
+    # Количество строк в одном INSERT при пакетном создании продуктов
+    BULK_INSERT_BATCH_SIZE = 1000
+
+    # Время жизни записи об отсутствующем объекте (negative caching)
+    NEGATIVE_CACHE_TTL = int(os.getenv("NEGATIVE_CACHE_TTL", "30"))
+
     async def get_by_id(self, session: AsyncSession, product_id: int) -> Optional[Product]:
         """
         Получить продукт по ID с кэшированием
 
+        Одновременные промахи по одному ключу загружаются из БД один раз
+        (см. RedisClient.get_or_load_json).
+
         Args:
             session: Сессия базы данных
             product_id: ID продукта
@@ -23,35 +35,147 @@ class ProductRepository:
             Product или None, если продукт не найден
         """
         cache_key = f"product:{product_id}"
-        cached_data = await redis_client.get_json(cache_key)
-
+        loaded: Optional[Product] = None
+
+        async def load_from_db() -> Optional[dict]:
+            nonlocal loaded
+            result = await session.execute(
+                select(Product).where(Product.id == product_id)
+            )
+            loaded = result.scalar_one_or_none()
+            return self._to_cache_dict(loaded) if loaded else None
+
+        cached_data = await redis_client.get_or_load_json(
+            cache_key, load_from_db,
+            expire=self.PRODUCT_CACHE_TTL,
+            negative_expire=self.NEGATIVE_CACHE_TTL
+        )
+        if loaded is not None:
+            return loaded
         if cached_data:
             # Восстанавливаем объект Product из кэша
-            product = Product(**cached_data)
-            return product
+            return Product(**cached_data)
+        return None
 
-        # Если данных нет в кэше, запрашиваем из БД
-        result = await session.execute(
-            select(Product).where(Product.id == product_id)
-        )
-        product = result.scalar_one_or_none()
+    async def get_by_ids(
+            self,
+            session: AsyncSession,
+            product_ids: Iterable[int],
+            store_missing: bool = True
+    ) -> Dict[int, Product]:
+        """
+        Получить несколько продуктов по ID одним запросом к кэшу и к БД
 
-        if product:
-            product_dict = {
-                "id": product.id,
-                "name": product.name,
-                "price": float(product.price),
-                "stock_quantity": product.stock_quantity
-            }
-            await redis_client.set_json(cache_key, product_dict, expire=self.PRODUCT_CACHE_TTL)
+        Сначала все ключи читаются из Redis одним MGET, затем
+        отсутствующие в кэше продукты загружаются одним запросом IN
+        и записываются в кэш одним pipeline.
 
-        return product
+        Args:
+            session: Сессия базы данных
+            product_ids: ID продуктов
+            store_missing: Записать загруженные из БД продукты в кэш (False, если
+                транзакция сессии уже изменила продукты и еще не зафиксирована)
+
+        Returns:
+            Словарь {ID: Product} только для найденных продуктов
+        """
+        product_ids = list(dict.fromkeys(product_ids))
+        if not product_ids:
+            return {}
+
+        cached = await redis_client.get_many_json(f"product:{pid}" for pid in product_ids)
+        products = {
+            data["id"]: Product(**data)
+            for data in cached.values()
+        }
+
+        missing_ids = [pid for pid in product_ids if pid not in products]
+        if missing_ids:
+            result = await session.execute(
+                select(Product).where(Product.id.in_(missing_ids))
+            )
+            loaded = list(result.scalars().all())
+            if store_missing:
+                await redis_client.set_many_json(
+                    {f"product:{p.id}": self._to_cache_dict(p) for p in loaded},
+                    expire=self.PRODUCT_CACHE_TTL
+                )
+            products.update({p.id: p for p in loaded})
+
+        return products
+
+    async def reserve_stock(self, session: AsyncSession, quantities: Mapping[int, int]) -> List[Row]:
+        """
+        Атомарно списать товар со склада
+
+        Для каждого продукта выполняется условный
+        UPDATE ... SET stock_quantity = stock_quantity - :q WHERE id = :id AND stock_quantity >= :q RETURNING,
+        поэтому одновременные заказы не могут продать больше, чем есть на складе.
+        Продукты обрабатываются в порядке ID, чтобы параллельные транзакции
+        блокировали строки в одном порядке. Транзакция не фиксируется:
+        списание подтверждается или откатывается вместе с заказом.
+
+        Args:
+            session: Сессия базы данных
+            quantities: Словарь {ID продукта: количество}
+
+        Returns:
+            Строки (id, name, price, stock_quantity) с остатками после списания
+
+        Raises:
+            ValueError: Если продукт не найден или товара недостаточно
+        """
+        reserved = []
+        for product_id in sorted(quantities):
+            quantity = quantities[product_id]
+            result = await session.execute(
+                update(Product)
+                .where(Product.id == product_id, Product.stock_quantity >= quantity)
+                .values(stock_quantity=Product.stock_quantity - quantity)
+                .returning(Product.id, Product.name, Product.price, Product.stock_quantity)
+            )
+            row = result.one_or_none()
+            if row is None:
+                available = (await session.execute(
+                    select(Product.stock_quantity).where(Product.id == product_id)
+                )).scalar_one_or_none()
+                if available is None:
+                    raise ValueError(f"Product with ID {product_id} not found")
+                raise ValueError(
+                    f"Not enough stock for product {product_id}: "
+                    f"requested {quantity}, available {available}"
+                )
+            reserved.append(row)
+        return reserved
+
+    async def cache_products(self, products: Sequence[Union[Product, Row]]) -> None:
+        """
+        Записать продукты в кэш одним pipeline
+
+        Args:
+            products: Продукты или строки с полями id, name, price, stock_quantity
+        """
+        await redis_client.set_many_json(
+            {f"product:{p.id}": self._to_cache_dict(p) for p in products},
+            expire=self.PRODUCT_CACHE_TTL
+        )
+
+    @staticmethod
+    def _to_cache_dict(product: Union[Product, Row]) -> dict:
+        """Представление продукта для хранения в кэше"""
+        return {
+            "id": product.id,
+            "name": product.name,
+            "price": float(product.price),
+            "stock_quantity": product.stock_quantity
+        }
 
     async def get_by_filter(
             self,
             session: AsyncSession,
             count: int = 10,
             page: int = 1,
+            after: Optional[str] = None,
             **kwargs
     ) -> List[Product]:
         """
@@ -61,10 +185,14 @@ class ProductRepository:
             session: Сессия базы данных
             count: Количество записей на странице
             page: Номер страницы
+            after: Курсор последней записи предыдущей страницы (keyset-пагинация, page игнорируется)
             **kwargs: Дополнительные фильтры
 
         Returns:
-            Список продуктов
+            Список продуктов, упорядоченный по id
+
+        Raises:
+            ValueError: Если курсор поврежден
         """
         query = select(Product)
 
@@ -76,9 +204,14 @@ class ProductRepository:
         if "max_price" in kwargs and kwargs["max_price"]:
             query = query.where(Product.price <= kwargs["max_price"])
 
+        query = query.order_by(Product.id)
+
         # Пагинация
-        offset = (page - 1) * count
-        query = query.offset(offset).limit(count)
+        if after is not None:
+            query = query.where(Product.id > decode_id_cursor(after)).limit(count)
+        else:
+            offset = (page - 1) * count
+            query = query.offset(offset).limit(count)
 
         result = await session.execute(query)
         return list(result.scalars().all())
@@ -107,8 +240,41 @@ class ProductRepository:
         session.add(product)
         await session.commit()
         await session.refresh(product)
+
+        # Снимаем запись об отсутствии объекта, если ID запрашивали до создания
+        await redis_client.delete(f"product:{product.id}")
+
         return product
 
+    async def create_many(self, session: AsyncSession, products_data: List[ProductCreate]) -> List[Product]:
+        """
+        Создать несколько продуктов пакетно
+
+        Продукты вставляются пачками по BULK_INSERT_BATCH_SIZE строк
+        (один INSERT ... RETURNING на пачку) в одной транзакции, после чего
+        все созданные продукты одним pipeline записываются в кэш.
+
+        Args:
+            session: Сессия базы данных
+            products_data: Данные для создания продуктов
+
+        Returns:
+            Созданные продукты
+        """
+        products: List[Product] = []
+        for start in range(0, len(products_data), self.BULK_INSERT_BATCH_SIZE):
+            batch = products_data[start:start + self.BULK_INSERT_BATCH_SIZE]
+            result = await session.scalars(
+                insert(Product).returning(Product),
+                [product_data.model_dump() for product_data in batch]
+            )
+            products.extend(result.all())
+        await session.commit()
+
+        # Прогреваем кэш (и снимаем записи об отсутствии) для новых ID
+        await self.cache_products(products)
+        return products
+
     async def update(
             self,
             session: AsyncSession,
@@ -126,7 +292,8 @@ class ProductRepository:
         Returns:
             Обновленный продукт или None
         """
-        product = await self.get_by_id(session, product_id)
+        # Изменяем объект, загруженный в сессию, а не восстановленный из кэша
+        product = await session.get(Product, product_id)
         if not product:
             return None
 
@@ -138,13 +305,7 @@ class ProductRepository:
         await session.refresh(product)
 
         cache_key = f"product:{product_id}"
-        product_dict = {
-            "id": product.id,
-            "name": product.name,
-            "price": float(product.price),
-            "stock_quantity": product.stock_quantity
-        }
-        await redis_client.set_json(cache_key, product_dict, expire=self.PRODUCT_CACHE_TTL)
+        await redis_client.set_json(cache_key, self._to_cache_dict(product), expire=self.PRODUCT_CACHE_TTL)
 
         return product
 
@@ -159,7 +320,7 @@ class ProductRepository:
         Returns:
             True если удален, False если не найден
         """
-        product = await self.get_by_id(session, product_id)
+        product = await session.get(Product, product_id)
         if not product:
             return False
 
@@ -0,0 +1,275 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, func, insert, delete, update, literal, Date
+from sqlalchemy.dialects import postgresql, sqlite
+from app.models.order import Order, OrderItem
+from app.models.product import Product
+from app.models.product_sales import ProductDailySales, RollupWatermark
+from collections import defaultdict
+from typing import List, Tuple
+from datetime import date, datetime, timedelta
+
+
+class ProductSalesRepository:
+    """Репозиторий свертки дневных продаж продуктов"""
+
+    # Имя водяного знака свертки в rollup_watermarks
+    WATERMARK_NAME = "product_daily_sales"
+
+    # Диалекты с INSERT ... ON CONFLICT; для остальных затронутые даты пересчитываются
+    UPSERT_INSERTS = {
+        "postgresql": postgresql.insert,
+        "sqlite": sqlite.insert,
+    }
+
+    # Поля, по которым строится топ продуктов
+    TOP_ORDERINGS = {
+        "units": ProductDailySales.units,
+        "revenue": ProductDailySales.revenue,
+    }
+
+    async def get_top(
+            self,
+            session: AsyncSession,
+            sales_date: date,
+            limit: int = 10,
+            by: str = "units"
+    ) -> List[tuple]:
+        """
+        Получить топ продуктов за дату
+
+        Строки читаются по индексу (sales_date, units|revenue, product_id)
+        в обратном порядке, поэтому запрос читает не больше limit строк
+        независимо от количества продуктов.
+
+        Args:
+            session: Сессия базы данных
+            sales_date: Дата продаж
+            limit: Количество продуктов
+            by: Поле сортировки: units или revenue
+
+        Returns:
+            Строки (product_id, name, units, revenue)
+
+        Raises:
+            ValueError: Если поле сортировки неизвестно
+        """
+        ordering = self.TOP_ORDERINGS.get(by)
+        if ordering is None:
+            raise ValueError(f"Неизвестное поле сортировки: {by}")
+
+        result = await session.execute(
+            select(
+                ProductDailySales.product_id,
+                Product.name,
+                ProductDailySales.units,
+                ProductDailySales.revenue
+            )
+            .join(Product, Product.id == ProductDailySales.product_id)
+            .where(ProductDailySales.sales_date == sales_date)
+            .order_by(ordering.desc(), ProductDailySales.product_id.desc())
+            .limit(limit)
+        )
+        return list(result.all())
+
+    async def apply_new_orders(self, session: AsyncSession) -> Tuple[int, int]:
+        """
+        Учесть в свертке заказы, созданные после водяного знака
+
+        Позиции новых заказов агрегируются одним
+        INSERT ... SELECT ... GROUP BY (дата заказа, product_id) и
+        прибавляются к существующим строкам через ON CONFLICT DO UPDATE.
+        Водяной знак (ID последнего учтенного заказа) хранится в БД и
+        сдвигается в той же транзакции, поэтому повторный запуск после
+        сбоя не учитывает заказы дважды.
+
+        Заказ с меньшим ID, зафиксированный позже заказа с большим, будет
+        пропущен; такие расхождения исправляет rebuild_for_date.
+
+        Args:
+            session: Сессия базы данных
+
+        Returns:
+            Кортеж (количество учтенных заказов, новый водяной знак)
+        """
+        last_order_id = await self._lock_watermark(session, create=True)
+        max_order_id = (await session.execute(select(func.max(Order.id)))).scalar_one()
+        if max_order_id is None or max_order_id <= last_order_id:
+            await session.commit()
+            return 0, last_order_id
+
+        new_orders = (Order.id > last_order_id, Order.id <= max_order_id)
+        orders_count = (await session.execute(
+            select(func.count(Order.id)).where(*new_orders)
+        )).scalar_one()
+
+        dialect_insert = self.UPSERT_INSERTS.get(session.bind.dialect.name)
+        if dialect_insert is None:
+            sales_dates = (await session.execute(
+                select(func.date(Order.created_at, type_=Date)).where(*new_orders).distinct()
+            )).scalars().all()
+            for sales_date in sales_dates:
+                await self._replace_date(session, sales_date, max_order_id)
+        else:
+            aggregate = self._sales_aggregate(func.date(Order.created_at, type_=Date), *new_orders)
+            statement = dialect_insert(ProductDailySales).from_select(
+                ["sales_date", "product_id", "units", "revenue"], aggregate
+            )
+            await session.execute(statement.on_conflict_do_update(
+                index_elements=[ProductDailySales.sales_date, ProductDailySales.product_id],
+                set_={
+                    "units": ProductDailySales.units + statement.excluded.units,
+                    "revenue": ProductDailySales.revenue + statement.excluded.revenue,
+                }
+            ))
+
+        await self._set_watermark(session, max_order_id)
+        await session.commit()
+        return orders_count, max_order_id
+
+    async def rebuild_for_date(self, session: AsyncSession, sales_date: date) -> int:
+        """
+        Пересчитать свертку за дату по позициям заказов
+
+        Учитываются только заказы до водяного знака: заказы после него
+        прибавит следующий apply_new_orders. Водяной знак блокируется
+        (SELECT ... FOR UPDATE), поэтому пересчет не пересекается
+        с инкрементальным обновлением.
+
+        Args:
+            session: Сессия базы данных
+            sales_date: Дата продаж
+
+        Returns:
+            Количество строк свертки за дату
+        """
+        last_order_id = await self._lock_watermark(session, create=True)
+        rowcount = await self._replace_date(session, sales_date, last_order_id)
+        await session.commit()
+        return rowcount
+
+    async def remove_order(self, session: AsyncSession, order: Order) -> None:
+        """
+        Вычесть позиции заказа из свертки (без commit)
+
+        Заказы после водяного знака в свертке еще не учтены и пропускаются
+        по чтению без блокировки, поэтому удаления таких заказов не ждут
+        друг друга и apply_new_orders. Строка водяного знака блокируется,
+        только если заказ уже учтен. Удаление, совпавшее с
+        apply_new_orders, который учитывает этот заказ, исправит ночной
+        rebuild_for_date.
+
+        Args:
+            session: Сессия базы данных
+            order: Удаляемый заказ с загруженными order_items
+        """
+        if order.id > await self._read_watermark(session):
+            return
+        await self._lock_watermark(session)
+
+        sales_date = order.created_at.date()
+        totals = defaultdict(lambda: [0, 0.0])
+        for item in order.order_items:
+            totals[item.product_id][0] += item.quantity
+            totals[item.product_id][1] += item.price_at_purchase * item.quantity
+
+        for product_id, (units, revenue) in totals.items():
+            await session.execute(
+                update(ProductDailySales)
+                .where(ProductDailySales.sales_date == sales_date, ProductDailySales.product_id == product_id)
+                .values(units=ProductDailySales.units - units, revenue=ProductDailySales.revenue - revenue)
+            )
+        await session.execute(
+            delete(ProductDailySales).where(
+                ProductDailySales.sales_date == sales_date,
+                ProductDailySales.units <= 0
+            )
+        )
+
+    async def _replace_date(self, session: AsyncSession, sales_date: date, last_order_id: int) -> int:
+        """Заменить строки свертки за дату агрегатом заказов с ID не больше last_order_id"""
+        start, end = self._day_bounds(sales_date)
+        await session.execute(delete(ProductDailySales).where(ProductDailySales.sales_date == sales_date))
+        result = await session.execute(
+            insert(ProductDailySales).from_select(
+                ["sales_date", "product_id", "units", "revenue"],
+                self._sales_aggregate(
+                    literal(sales_date, Date),
+                    Order.created_at >= start,
+                    Order.created_at < end,
+                    Order.id <= last_order_id,
+                    group_by_date=False
+                )
+            )
+        )
+        return result.rowcount
+
+    @staticmethod
+    def _sales_aggregate(sales_date, *conditions, group_by_date: bool = True):
+        """
+        SELECT (sales_date, product_id, units, revenue) по позициям заказов,
+        отобранных условиями, с группировкой по дате и продукту
+
+        Если sales_date - константа (пересчет одной даты), группировка
+        выполняется только по продукту.
+        """
+        units = func.sum(OrderItem.quantity)
+        group_by = (sales_date, OrderItem.product_id) if group_by_date else (OrderItem.product_id,)
+        return (
+            select(
+                sales_date.label("sales_date"),
+                OrderItem.product_id,
+                units.label("units"),
+                func.sum(OrderItem.price_at_purchase * OrderItem.quantity).label("revenue")
+            )
+            .join(Order, Order.id == OrderItem.order_id)
+            .where(*conditions)
+            .group_by(*group_by)
+            .having(units > 0)
+        )
+
+    async def _read_watermark(self, session: AsyncSession) -> int:
+        """Прочитать водяной знак без блокировки (0, если свертка еще не велась)"""
+        statement = select(RollupWatermark.last_order_id).where(RollupWatermark.name == self.WATERMARK_NAME)
+        return (await session.execute(statement)).scalar_one_or_none() or 0
+
+    async def _lock_watermark(self, session: AsyncSession, create: bool = False) -> int:
+        """
+        Прочитать водяной знак с блокировкой строки до конца транзакции
+
+        Args:
+            session: Сессия базы данных
+            create: Создать водяной знак, если его еще нет
+
+        Returns:
+            ID последнего учтенного заказа (0, если свертка еще не велась)
+        """
+        statement = (
+            select(RollupWatermark.last_order_id)
+            .where(RollupWatermark.name == self.WATERMARK_NAME)
+            .with_for_update()
+        )
+        last_order_id = (await session.execute(statement)).scalar_one_or_none()
+        if last_order_id is not None or not create:
+            return last_order_id or 0
+
+        values = {"name": self.WATERMARK_NAME, "last_order_id": 0}
+        dialect_insert = self.UPSERT_INSERTS.get(session.bind.dialect.name)
+        if dialect_insert is None:
+            await session.execute(insert(RollupWatermark).values(**values))
+        else:
+            await session.execute(dialect_insert(RollupWatermark).values(**values).on_conflict_do_nothing())
+        return (await session.execute(statement)).scalar_one()
+
+    async def _set_watermark(self, session: AsyncSession, last_order_id: int) -> None:
+        """Сдвинуть водяной знак (без commit)"""
+        await session.execute(
+            update(RollupWatermark)
+            .where(RollupWatermark.name == self.WATERMARK_NAME)
+            .values(last_order_id=last_order_id)
+        )
+
+    @staticmethod
+    def _day_bounds(sales_date: date) -> Tuple[datetime, datetime]:
+        """Границы суток [начало, начало следующих суток)"""
+        start = datetime.combine(sales_date, datetime.min.time())
+        return start, start + timedelta(days=1)
@@ -1,14 +1,48 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func
+from sqlalchemy import select, func, or_, and_, insert, delete, literal, cast, BigInteger, Date
+from sqlalchemy.dialects import postgresql, sqlite
+from redis.exceptions import RedisError, WatchError
+from pydantic import TypeAdapter
+from app.models.order import Order, OrderItem
 from app.models.report import Report
-from app.schemas.report_schema import ReportCreate
-from typing import List
-from datetime import date
+from app.schemas.report_schema import ReportCreate, ReportResponse
+from app.repositories.cursor import decode_cursor
+from app.cache.redis_client import redis_client
+from typing import AsyncIterator, Iterable, List, Optional, Tuple
+from datetime import date, datetime, timedelta
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+_report_list = TypeAdapter(List[ReportResponse])
 
 
 class ReportRepository:
     """Репозиторий для работы с отчетами в базе данных"""
 
+    # Максимальное количество строк в одном INSERT при пакетной вставке
+    BULK_INSERT_BATCH_SIZE = 1000
+
+    # Диалекты с INSERT ... ON CONFLICT; для остальных отчет пересоздается
+    UPSERT_INSERTS = {
+        "postgresql": postgresql.insert,
+        "sqlite": sqlite.insert,
+    }
+
+    # Время жизни кэша ответа GET /report за прошедший день, секунды
+    REPORT_CACHE_TTL = 7 * 24 * 3600
+
+    @staticmethod
+    def cache_key(report_date: date) -> str:
+        """Ключ кэша ответа за дату"""
+        return f"report:day:{report_date.isoformat()}"
+
+    @classmethod
+    def cache_version_key(cls, report_date: date) -> str:
+        """Ключ счетчика инвалидаций кэша за дату"""
+        return f"{cls.cache_key(report_date)}:version"
+
     async def get_by_date(self, session: AsyncSession, report_date: date) -> List[Report]:
         """
         Получить все отчеты за конкретную дату
@@ -25,22 +59,158 @@ class ReportRepository:
         )
         return list(result.scalars().all())
 
+    async def iter_range(
+            self,
+            session: AsyncSession,
+            start: date,
+            end: date,
+            chunk_size: int = 10000
+    ) -> AsyncIterator[List[tuple]]:
+        """
+        Прочитать отчеты за диапазон дат пачками
+
+        Используется серверный курсор (stream + yield_per), поэтому
+        в памяти находится только текущая пачка независимо от объема.
+
+        Args:
+            session: Сессия базы данных
+            start: Первая дата диапазона
+            end: Последняя дата диапазона (включительно)
+            chunk_size: Количество строк в пачке
+
+        Yields:
+            Пачки строк (id, report_at, order_id, count_product) в порядке (report_at, id)
+        """
+        result = await session.stream(
+            select(Report.id, Report.report_at, Report.order_id, Report.count_product)
+            .where(Report.report_at >= start, Report.report_at <= end)
+            .order_by(Report.report_at, Report.id)
+            .execution_options(yield_per=chunk_size)
+        )
+        async for partition in result.partitions():
+            yield [tuple(row) for row in partition]
+
+    async def get_response_by_date(self, session: AsyncSession, report_date: date) -> bytes:
+        """
+        Получить тело ответа GET /report за дату в JSON
+
+        Отчет за прошедший день меняется только при пересчете, поэтому тело
+        ответа сериализуется один раз и хранится в Redis как байты до
+        инвалидации (invalidate_cache). Отчет за текущий день ведется
+        инкрементально и не кэшируется.
+
+        Запись в кэш выполняется только если версия даты не изменилась с
+        момента промаха (WATCH), иначе пересчет, завершившийся во время
+        чтения из БД, мог бы оставить в кэше устаревший ответ.
+        Если Redis недоступен, ответ собирается из БД без кэша.
+
+        Args:
+            session: Сессия базы данных
+            report_date: Дата отчета
+
+        Returns:
+            JSON-тело ответа
+        """
+        if report_date >= datetime.utcnow().date():
+            return self._serialize_reports(report_date, await self.get_by_date(session, report_date))
+
+        key, version_key = self.cache_key(report_date), self.cache_version_key(report_date)
+        try:
+            redis = await redis_client.client()
+            body, version = await redis.mget(key, version_key)
+        except RedisError as e:
+            logger.warning(f"Кэш отчета за {report_date} недоступен: {e}")
+            return self._serialize_reports(report_date, await self.get_by_date(session, report_date))
+        if body is not None:
+            return body
+
+        body = self._serialize_reports(report_date, await self.get_by_date(session, report_date))
+        try:
+            async with redis.pipeline(transaction=True) as pipe:
+                await pipe.watch(version_key)
+                if await pipe.get(version_key) == version:
+                    pipe.multi()
+                    pipe.set(key, body, ex=self.REPORT_CACHE_TTL)
+                    await pipe.execute()
+        except WatchError:
+            pass
+        except RedisError as e:
+            logger.warning(f"Не удалось сохранить в кэш отчет за {report_date}: {e}")
+        return body
+
+    async def invalidate_cache(self, report_dates: Iterable[date]) -> None:
+        """
+        Удалить закэшированные ответы за даты
+
+        Args:
+            report_dates: Даты, отчеты за которые изменились
+        """
+        report_dates = set(report_dates)
+        if not report_dates:
+            return
+        redis = await redis_client.client()
+        async with redis.pipeline(transaction=False) as pipe:
+            for report_date in report_dates:
+                version_key = self.cache_version_key(report_date)
+                pipe.incr(version_key)
+                pipe.expire(version_key, self.REPORT_CACHE_TTL)
+                pipe.delete(self.cache_key(report_date))
+            await pipe.execute()
+
+    @staticmethod
+    def _serialize_reports(report_date: date, reports: List[Report]) -> bytes:
+        """Тело ответа GET /report: список отчетов или сообщение об их отсутствии"""
+        if not reports:
+            return json.dumps({
+                "message": f"Отчеты за {report_date} не найдены",
+                "date": str(report_date),
+                "reports": []
+            }, ensure_ascii=False).encode("utf-8")
+        return _report_list.dump_json([ReportResponse.model_validate(report) for report in reports])
+
     async def get_all(
             self,
             session: AsyncSession,
             count: int = 10,
-            page: int = 1
+            page: int = 1,
+            after: Optional[str] = None
     ) -> List[Report]:
-        """Получить все отчеты с пагинацией"""
-        offset = (page - 1) * count
-        result = await session.execute(
-            select(Report)
-            .order_by(Report.report_at.desc())
-            .offset(offset)
-            .limit(count)
-        )
+        """
+        Получить все отчеты с пагинацией
+
+        Отчеты упорядочены по (report_at, id) по убыванию. При переданном
+        курсоре after используется keyset-пагинация вместо OFFSET
+        (page игнорируется).
+
+        Raises:
+            ValueError: Если курсор поврежден
+        """
+        query = select(Report).order_by(Report.report_at.desc(), Report.id.desc())
+
+        if after is not None:
+            report_at, report_id = self._decode_cursor(after)
+            query = query.where(
+                or_(
+                    Report.report_at < report_at,
+                    and_(Report.report_at == report_at, Report.id < report_id)
+                )
+            ).limit(count)
+        else:
+            offset = (page - 1) * count
+            query = query.offset(offset).limit(count)
+
+        result = await session.execute(query)
         return list(result.scalars().all())
 
+    @staticmethod
+    def _decode_cursor(cursor: str) -> tuple[date, int]:
+        """Раскодировать курсор (report_at, id)"""
+        report_at, report_id = decode_cursor(cursor, size=2)
+        try:
+            return date.fromisoformat(report_at), int(report_id)
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"Некорректный курсор: {cursor}") from e
+
     async def get_total_count(self, session: AsyncSession) -> int:
         """Получить общее количество отчетов"""
         result = await session.execute(select(func.count(Report.id)))
@@ -65,11 +235,38 @@ class ReportRepository:
         session.add(report)
         await session.commit()
         await session.refresh(report)
+        await self.invalidate_cache([report.report_at])
         return report
 
+    async def create_many(self, session: AsyncSession, reports_data: List[ReportCreate]) -> List[Report]:
+        """
+        Создать несколько отчетов пакетно
+
+        Отчеты вставляются пачками по BULK_INSERT_BATCH_SIZE строк
+        (один INSERT ... RETURNING на пачку) в одной транзакции.
+
+        Args:
+            session: Сессия базы данных
+            reports_data: Данные для создания отчетов
+
+        Returns:
+            Созданные отчеты
+        """
+        reports: List[Report] = []
+        for start in range(0, len(reports_data), self.BULK_INSERT_BATCH_SIZE):
+            batch = reports_data[start:start + self.BULK_INSERT_BATCH_SIZE]
+            result = await session.scalars(
+                insert(Report).returning(Report),
+                [report_data.model_dump() for report_data in batch]
+            )
+            reports.extend(result.all())
+        await session.commit()
+        await self.invalidate_cache(report.report_at for report in reports)
+        return reports
+
     async def delete_by_date(self, session: AsyncSession, report_date: date) -> int:
         """
-        Удалить все отчеты за конкретную дату
+        Удалить все отчеты за конкретную дату одним DELETE
 
         Args:
             session: Сессия базы данных
@@ -78,15 +275,192 @@ class ReportRepository:
         Returns:
             Количество удаленных записей
         """
-        result = await session.execute(
-            select(Report).where(Report.report_at == report_date)
-        )
-        reports = result.scalars().all()
+        result = await session.execute(delete(Report).where(Report.report_at == report_date))
+        await session.commit()
+        await self.invalidate_cache([report_date])
+        return result.rowcount
+
+    async def record_order(
+            self,
+            session: AsyncSession,
+            report_date: date,
+            order_id: int,
+            count_product: int
+    ) -> None:
+        """
+        Учесть заказ в отчете за дату
 
-        count = 0
-        for report in reports:
-            await session.delete(report)
-            count += 1
+        Запись (report_at, order_id) вставляется или обновляется через
+        ON CONFLICT. Транзакция не фиксируется: запись отчета сохраняется
+        вместе с заказом.
+
+        Args:
+            session: Сессия базы данных
+            report_date: Дата отчета (дата создания заказа)
+            order_id: ID заказа
+            count_product: Количество продуктов в заказе
+        """
+        values = {"report_at": report_date, "order_id": order_id, "count_product": count_product}
+        dialect_insert = self.UPSERT_INSERTS.get(session.bind.dialect.name)
+        if dialect_insert is None:
+            await session.execute(
+                delete(Report).where(Report.report_at == report_date, Report.order_id == order_id)
+            )
+            await session.execute(insert(Report).values(**values))
+            return
+        await session.execute(self._on_conflict_update(dialect_insert(Report).values(**values)))
+
+    async def remove_order(self, session: AsyncSession, order_id: int) -> None:
+        """
+        Удалить записи отчетов по заказу (без commit)
+
+        После фиксации вызывающий код должен инвалидировать кэш
+        за дату заказа (invalidate_cache).
+
+        Args:
+            session: Сессия базы данных
+            order_id: ID заказа
+        """
+        await session.execute(delete(Report).where(Report.order_id == order_id))
+
+    async def order_watermark(self, session: AsyncSession, report_date: date) -> str:
+        """
+        Водяной знак заказов за дату
+
+        Строка из количества заказов, максимального ID и максимального
+        времени изменения заказа за дату. Если она не изменилась, заказы
+        дня не менялись и отчет пересчитывать не нужно.
+
+        Args:
+            session: Сессия базы данных
+            report_date: Дата отчета
+
+        Returns:
+            Водяной знак вида "<count>:<max id>:<max updated_at>"
+        """
+        start, end = self._day_bounds(report_date)
+        orders_count, max_id, max_updated_at = (await session.execute(
+            select(func.count(Order.id), func.max(Order.id), func.max(Order.updated_at))
+            .where(Order.created_at >= start, Order.created_at < end)
+        )).one()
+        return f"{orders_count}:{max_id or ''}:{max_updated_at or ''}"
+
+    async def verify_date(self, session: AsyncSession, report_date: date) -> bool:
+        """
+        Проверить, что отчет за дату совпадает с заказами
 
+        Сравниваются количество записей, сумма count_product и контрольная
+        сумма order_id * count_product отчета с теми же величинами,
+        посчитанными по позициям заказов. Два агрегирующих запроса без
+        передачи строк в приложение. Произведение считается в BIGINT:
+        произведение двух INTEGER в PostgreSQL остается 32-битным и
+        переполняется на больших ID заказов.
+
+        Args:
+            session: Сессия базы данных
+            report_date: Дата отчета
+
+        Returns:
+            True, если отчет актуален
+        """
+        aggregate = self._day_aggregate(report_date).subquery()
+        expected = (await session.execute(
+            select(
+                func.count(),
+                func.coalesce(func.sum(aggregate.c.count_product), 0),
+                func.coalesce(func.sum(
+                    cast(aggregate.c.order_id, BigInteger) * cast(aggregate.c.count_product, BigInteger)
+                ), 0)
+            ).select_from(aggregate)
+        )).one()
+        actual = (await session.execute(
+            select(
+                func.count(Report.id),
+                func.coalesce(func.sum(Report.count_product), 0),
+                func.coalesce(func.sum(cast(Report.order_id, BigInteger) * cast(Report.count_product, BigInteger)), 0)
+            ).where(Report.report_at == report_date)
+        )).one()
+        return tuple(expected) == tuple(actual)
+
+    async def upsert_for_date(self, session: AsyncSession, report_date: date) -> Tuple[int, int]:
+        """
+        Пересчитать отчет за дату на стороне БД
+
+        Количество продуктов по заказам дня считается одним
+        INSERT INTO reports ... SELECT order_id, SUM(quantity) ... GROUP BY order_id
+        с ON CONFLICT (report_at, order_id) DO UPDATE: существующие записи
+        обновляются на месте, поэтому повторная генерация идемпотентна и не
+        удаляет отчет целиком. Записи заказов, которых больше нет в агрегате,
+        удаляются отдельным DELETE. Все выполняется в одной транзакции.
+
+        Для диалектов без ON CONFLICT отчет удаляется и вставляется заново.
+
+        Args:
+            session: Сессия базы данных
+            report_date: Дата отчета
+
+        Returns:
+            Кортеж (количество заказов за дату, количество записанных строк отчета).
+            Если заказов нет, отчет не изменяется
+        """
+        start, end = self._day_bounds(report_date)
+        orders_count = (await session.execute(
+            select(func.count(Order.id)).where(Order.created_at >= start, Order.created_at < end)
+        )).scalar_one()
+        if not orders_count:
+            return 0, 0
+
+        aggregate = self._day_aggregate(report_date)
+        columns = ["report_at", "order_id", "count_product"]
+
+        dialect_insert = self.UPSERT_INSERTS.get(session.bind.dialect.name)
+        if dialect_insert is None:
+            await session.execute(delete(Report).where(Report.report_at == report_date))
+            statement = insert(Report).from_select(columns, aggregate)
+        else:
+            # Удаляем записи заказов, у которых не осталось позиций
+            await session.execute(
+                delete(Report).where(
+                    Report.report_at == report_date,
+                    Report.order_id.not_in(aggregate.with_only_columns(OrderItem.order_id))
+                )
+            )
+            statement = self._on_conflict_update(dialect_insert(Report).from_select(columns, aggregate))
+
+        result = await session.execute(statement)
         await session.commit()
-        return count
+        await self.invalidate_cache([report_date])
+        return orders_count, result.rowcount
+
+    def _day_aggregate(self, report_date: date):
+        """
+        SELECT (report_at, order_id, count_product) по позициям заказов,
+        созданных за дату, с ненулевым количеством продуктов
+        """
+        start, end = self._day_bounds(report_date)
+        total_products = func.sum(OrderItem.quantity)
+        return (
+            select(
+                literal(report_date, Date).label("report_at"),
+                OrderItem.order_id,
+                total_products.label("count_product")
+            )
+            .join(Order, Order.id == OrderItem.order_id)
+            .where(Order.created_at >= start, Order.created_at < end)
+            .group_by(OrderItem.order_id)
+            .having(total_products > 0)
+        )
+
+    @staticmethod
+    def _on_conflict_update(statement):
+        """Добавить к INSERT обновление count_product при конфликте (report_at, order_id)"""
+        return statement.on_conflict_do_update(
+            index_elements=[Report.report_at, Report.order_id],
+            set_={"count_product": statement.excluded.count_product}
+        )
+
+    @staticmethod
+    def _day_bounds(report_date: date) -> Tuple[datetime, datetime]:
+        """Границы суток [начало, начало следующих суток)"""
+        start = datetime.combine(report_date, datetime.min.time())
+        return start, start + timedelta(days=1)
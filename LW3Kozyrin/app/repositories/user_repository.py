@@ -1,10 +1,12 @@
+import os
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func
 from app.models.user import User
 from app.schemas.user_schema import UserCreate, UserUpdate
 from app.cache.redis_client import redis_client
+from app.repositories.cursor import decode_id_cursor
 from typing import Optional
-import json
+from datetime import datetime
 
 
 class UserRepository:
@@ -12,10 +14,16 @@ class UserRepository:
 
     USER_CACHE_TTL = 3600
 
+    # Время жизни записи об отсутствующем объекте (negative caching)
+    NEGATIVE_CACHE_TTL = int(os.getenv("NEGATIVE_CACHE_TTL", "30"))
+
     async def get_by_id(self, session: AsyncSession, user_id: int) -> Optional[User]:
         """
         Получить пользователя по ID с кэшированием
 
+        Одновременные промахи по одному ключу загружаются из БД один раз
+        (см. RedisClient.get_or_load_json).
+
         Args:
             session: Сессия базы данных
             user_id: ID пользователя
@@ -24,35 +32,55 @@ class UserRepository:
             User или None, если пользователь не найден
         """
         cache_key = f"user:{user_id}"
-        cached_data = await redis_client.get_json(cache_key)
-
+        loaded: Optional[User] = None
+
+        async def load_from_db() -> Optional[dict]:
+            nonlocal loaded
+            result = await session.execute(
+                select(User).where(User.id == user_id)
+            )
+            loaded = result.scalar_one_or_none()
+            return self._to_cache_dict(loaded) if loaded else None
+
+        cached_data = await redis_client.get_or_load_json(
+            cache_key, load_from_db,
+            expire=self.USER_CACHE_TTL,
+            negative_expire=self.NEGATIVE_CACHE_TTL
+        )
+        if loaded is not None:
+            return loaded
         if cached_data:
             # Восстанавливаем объект User из кэша
-            user = User(**cached_data)
-            return user
-
-        # Если данных нет в кэше, запрашиваем из БД
-        result = await session.execute(
-            select(User).where(User.id == user_id)
-        )
-        user = result.scalar_one_or_none()
-
-        if user:
-            user_dict = {
-                "id": user.id,
-                "username": user.username,
-                "email": user.email,
-                "full_name": user.full_name
-            }
-            await redis_client.set_json(cache_key, user_dict, expire=self.USER_CACHE_TTL)
-
-        return user
+            return self._from_cache_dict(cached_data)
+        return None
+
+    @staticmethod
+    def _to_cache_dict(user: User) -> dict:
+        """Представление пользователя для хранения в кэше"""
+        return {
+            "id": user.id,
+            "username": user.username,
+            "email": user.email,
+            "full_name": user.full_name,
+            "created_at": user.created_at.isoformat() if user.created_at else None,
+            "updated_at": user.updated_at.isoformat() if user.updated_at else None
+        }
+
+    @staticmethod
+    def _from_cache_dict(data: dict) -> User:
+        """Восстановить пользователя из представления в кэше"""
+        data = dict(data)
+        for field in ("created_at", "updated_at"):
+            if data.get(field):
+                data[field] = datetime.fromisoformat(data[field])
+        return User(**data)
 
     async def get_by_filter(
             self,
             session: AsyncSession,
             count: int = 10,
             page: int = 1,
+            after: Optional[str] = None,
             **kwargs
     ) -> list[User]:
         """
@@ -62,10 +90,14 @@ class UserRepository:
             session: Сессия базы данных
             count: Количество записей на странице
             page: Номер страницы (начиная с 1)
+            after: Курсор последней записи предыдущей страницы (keyset-пагинация, page игнорируется)
             **kwargs: Дополнительные фильтры (username, email и т.д.)
 
         Returns:
-            Список пользователей
+            Список пользователей, упорядоченный по id
+
+        Raises:
+            ValueError: Если курсор поврежден
         """
         query = select(User)
 
@@ -75,11 +107,17 @@ class UserRepository:
         if "email" in kwargs and kwargs["email"]:
             query = query.where(User.email == kwargs["email"])
 
-        # Вычисляем offset для пагинации
-        offset = (page - 1) * count
+        query = query.order_by(User.id)
 
-        # Применяем пагинацию
-        query = query.offset(offset).limit(count)
+        if after is not None:
+            # Keyset-пагинация: продолжаем после id из курсора без OFFSET
+            query = query.where(User.id > decode_id_cursor(after)).limit(count)
+        else:
+            # Вычисляем offset для пагинации
+            offset = (page - 1) * count
+
+            # Применяем пагинацию
+            query = query.offset(offset).limit(count)
 
         result = await session.execute(query)
         return list(result.scalars().all())
@@ -116,6 +154,10 @@ class UserRepository:
         session.add(user)
         await session.commit()
         await session.refresh(user)
+
+        # Снимаем запись об отсутствии объекта, если ID запрашивали до создания
+        await redis_client.delete(f"user:{user.id}")
+
         return user
 
     async def update(
@@ -135,7 +177,8 @@ class UserRepository:
         Returns:
             Обновленный пользователь или None, если не найден
         """
-        user = await self.get_by_id(session, user_id)
+        # Изменяем объект, загруженный в сессию, а не восстановленный из кэша
+        user = await session.get(User, user_id)
         if not user:
             return None
 
@@ -163,7 +206,7 @@ class UserRepository:
         Returns:
             True, если пользователь был удален, False если не найден
         """
-        user = await self.get_by_id(session, user_id)
+        user = await session.get(User, user_id)
         if not user:
             return False
 
@@ -1,11 +1,26 @@
 """
 Модуль планировщика задач
 """
-from app.scheduler.taskiq_app import broker, scheduler, generate_daily_report, generate_report_for_date
+from app.scheduler.taskiq_app import (
+    broker,
+    scheduler,
+    generate_daily_report,
+    generate_report_for_date,
+    backfill_reports,
+    backfill_report_day,
+    update_product_sales,
+    rebuild_product_sales,
+    purge_processed_messages,
+)
 
 __all__ = [
     "broker",
     "scheduler",
     "generate_daily_report",
     "generate_report_for_date",
+    "backfill_reports",
+    "backfill_report_day",
+    "update_product_sales",
+    "rebuild_product_sales",
+    "purge_processed_messages",
 ]
@@ -0,0 +1,142 @@
+"""Состояние пересчета отчетов за диапазон дат в Redis"""
+import uuid
+from datetime import date, datetime, timedelta
+from typing import Optional
+from app.cache.redis_client import redis_client
+
+# Время хранения прогресса пересчета, секунды
+BACKFILL_PROGRESS_TTL = 7 * 24 * 3600
+
+# Хеш {дата: водяной знак заказов} на момент последнего пересчета дня
+REPORT_WATERMARKS_KEY = "report:watermarks"
+
+
+class BackfillProgress:
+    """
+    Прогресс пересчета отчетов за диапазон дат
+
+    Для каждого пересчета в Redis хранятся хеш report:backfill:<id>
+    со счетчиками и статусом и список report:backfill:<id>:days с еще
+    не взятыми в работу датами. Задачи-исполнители забирают даты из
+    списка атомарным LPOP, поэтому одна дата обрабатывается один раз.
+    """
+
+    @staticmethod
+    def key(backfill_id: str) -> str:
+        """Ключ хеша прогресса"""
+        return f"report:backfill:{backfill_id}"
+
+    @classmethod
+    def days_key(cls, backfill_id: str) -> str:
+        """Ключ списка необработанных дат"""
+        return f"{cls.key(backfill_id)}:days"
+
+    async def create(self, start: date, end: date) -> str:
+        """
+        Зарегистрировать пересчет
+
+        Args:
+            start: Первая дата диапазона
+            end: Последняя дата диапазона (включительно)
+
+        Returns:
+            ID пересчета
+        """
+        backfill_id = uuid.uuid4().hex
+        days = [(start + timedelta(days=i)).isoformat() for i in range((end - start).days + 1)]
+
+        redis = await redis_client.client()
+        async with redis.pipeline(transaction=True) as pipe:
+            pipe.hset(self.key(backfill_id), mapping={
+                "start": start.isoformat(),
+                "end": end.isoformat(),
+                "total": len(days),
+                "done": 0,
+                "skipped": 0,
+                "failed": 0,
+                "status": "pending",
+                "created_at": datetime.utcnow().isoformat(),
+            })
+            pipe.rpush(self.days_key(backfill_id), *days)
+            pipe.expire(self.key(backfill_id), BACKFILL_PROGRESS_TTL)
+            pipe.expire(self.days_key(backfill_id), BACKFILL_PROGRESS_TTL)
+            await pipe.execute()
+        return backfill_id
+
+    async def start(self, backfill_id: str) -> None:
+        """Отметить, что исполнители запущены"""
+        redis = await redis_client.client()
+        await redis.hset(self.key(backfill_id), "status", "running")
+
+    async def fail(self, backfill_id: str, error: str) -> None:
+        """
+        Отметить, что пересчет не удалось запустить
+
+        Необработанные даты удаляются, чтобы их не забрали исполнители.
+
+        Args:
+            backfill_id: ID пересчета
+            error: Текст ошибки
+        """
+        redis = await redis_client.client()
+        async with redis.pipeline(transaction=True) as pipe:
+            pipe.hset(self.key(backfill_id), mapping={"status": "failed", "error": error})
+            pipe.delete(self.days_key(backfill_id))
+            await pipe.execute()
+
+    async def next_day(self, backfill_id: str) -> Optional[date]:
+        """
+        Забрать следующую дату
+
+        Returns:
+            Дата или None, если все даты разобраны
+        """
+        redis = await redis_client.client()
+        value = await redis.lpop(self.days_key(backfill_id))
+        return date.fromisoformat(value.decode()) if value is not None else None
+
+    async def record(self, backfill_id: str, outcome: str) -> None:
+        """
+        Учесть результат обработки даты
+
+        Args:
+            backfill_id: ID пересчета
+            outcome: done, skipped или failed
+        """
+        redis = await redis_client.client()
+        key = self.key(backfill_id)
+        async with redis.pipeline(transaction=True) as pipe:
+            pipe.hincrby(key, outcome, 1)
+            pipe.hmget(key, "total", "done", "skipped", "failed")
+            _, counters = await pipe.execute()
+        total, *processed = (int(value) for value in counters)
+        if sum(processed) >= total:
+            await redis.hset(key, "status", "completed")
+
+    async def get(self, backfill_id: str) -> Optional[dict]:
+        """
+        Получить прогресс пересчета
+
+        Returns:
+            Словарь прогресса или None, если пересчет не найден
+        """
+        redis = await redis_client.client()
+        raw = await redis.hgetall(self.key(backfill_id))
+        if not raw:
+            return None
+        progress = {key.decode(): value.decode() for key, value in raw.items()}
+        for field in ("total", "done", "skipped", "failed"):
+            progress[field] = int(progress[field])
+        progress["id"] = backfill_id
+        return progress
+
+    async def get_watermark(self, report_date: date) -> Optional[str]:
+        """Водяной знак заказов на момент последнего пересчета дня"""
+        redis = await redis_client.client()
+        value = await redis.hget(REPORT_WATERMARKS_KEY, report_date.isoformat())
+        return value.decode() if value is not None else None
+
+    async def set_watermark(self, report_date: date, watermark: str) -> None:
+        """Сохранить водяной знак заказов пересчитанного дня"""
+        redis = await redis_client.client()
+        await redis.hset(REPORT_WATERMARKS_KEY, report_date.isoformat(), watermark)
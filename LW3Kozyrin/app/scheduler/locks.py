@@ -0,0 +1,88 @@
+"""Распределенная блокировка и дедупликация задач пересчета отчетов в Redis"""
+import os
+import uuid
+from datetime import date
+from typing import Optional
+from app.cache.redis_client import redis_client
+
+# Время жизни блокировки и записи о запланированной задаче, секунды.
+# Если воркер упал, дата снова станет доступной для пересчета по истечении TTL
+REPORT_LOCK_TTL = int(os.getenv("REPORT_LOCK_TTL", "900"))
+
+
+class ReportDateLock:
+    """
+    Блокировка пересчета отчета за дату
+
+    Ставится через SET NX PX со случайным токеном, снимается только
+    владельцем. Пересчет даты (ручной, ночной или в рамках backfill)
+    выполняется только под блокировкой, поэтому одновременные задачи
+    не пересчитывают одну дату дважды.
+    """
+
+    def __init__(self, report_date: date, ttl: int = REPORT_LOCK_TTL):
+        """
+        Args:
+            report_date: Дата отчета
+            ttl: Время жизни блокировки в секундах
+        """
+        self.key = f"report:lock:{report_date.isoformat()}"
+        self.ttl = ttl
+        self._token = uuid.uuid4().hex.encode()
+        self.acquired = False
+
+    async def acquire(self) -> bool:
+        """
+        Попытаться захватить блокировку без ожидания
+
+        Returns:
+            True, если блокировка захвачена
+        """
+        redis = await redis_client.client()
+        self.acquired = bool(await redis.set(self.key, self._token, nx=True, px=self.ttl * 1000))
+        return self.acquired
+
+    async def release(self) -> None:
+        """Снять блокировку, если она все еще принадлежит нам"""
+        if self.acquired:
+            await redis_client.delete_if_equal(self.key, self._token)
+            self.acquired = False
+
+
+class ReportTaskRegistry:
+    """
+    Запланированные задачи пересчета отчета по датам
+
+    Повторный запрос на пересчет даты, задача для которой уже поставлена
+    в очередь или выполняется, получает ID этой задачи вместо новой.
+    """
+
+    @staticmethod
+    def key(report_date: date) -> str:
+        """Ключ с ID задачи пересчета за дату"""
+        return f"report:task:{report_date.isoformat()}"
+
+    async def claim(self, report_date: date, task_id: str) -> Optional[str]:
+        """
+        Зарегистрировать задачу пересчета за дату
+
+        Args:
+            report_date: Дата отчета
+            task_id: ID новой задачи
+
+        Returns:
+            None, если задача зарегистрирована, иначе ID уже запланированной задачи
+        """
+        redis = await redis_client.client()
+        key = self.key(report_date)
+        while True:
+            if await redis.set(key, task_id, nx=True, ex=REPORT_LOCK_TTL):
+                return None
+            existing = await redis.get(key)
+            # Ключ мог истечь между SET и GET - пробуем зарегистрироваться снова
+            if existing is not None:
+                return existing.decode()
+
+    async def release(self, report_date: date, task_id: str) -> None:
+        """Снять регистрацию задачи (если дата все еще закреплена за ней)"""
+        await redis_client.delete_if_equal(self.key(report_date), task_id.encode())
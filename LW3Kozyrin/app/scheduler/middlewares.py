@@ -0,0 +1,33 @@
+"""Middleware брокера TaskIQ"""
+import time
+from typing import Dict
+from taskiq import TaskiqMessage, TaskiqMiddleware
+from app.metrics import metrics
+
+# Ограничение числа незавершенных измерений (отправки, упавшие до post_send)
+MAX_PENDING_SENDS = 10000
+
+
+class KiqLatencyMiddleware(TaskiqMiddleware):
+    """
+    Время постановки задачи в очередь (kiq) по имени задачи
+
+    Измеряется от pre_send до post_send, то есть публикация сообщения
+    в брокер; пишется в метрику taskiq.kiq.<имя задачи>.
+    """
+
+    def __init__(self):
+        """Инициализация"""
+        super().__init__()
+        self._started: Dict[str, float] = {}
+
+    def pre_send(self, message: TaskiqMessage) -> TaskiqMessage:
+        if len(self._started) >= MAX_PENDING_SENDS:
+            self._started.clear()
+        self._started[message.task_id] = time.perf_counter()
+        return message
+
+    def post_send(self, message: TaskiqMessage) -> None:
+        started = self._started.pop(message.task_id, None)
+        if started is not None:
+            metrics.observe(f"taskiq.kiq.{message.task_name}", time.perf_counter() - started)
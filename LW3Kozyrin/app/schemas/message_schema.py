@@ -2,20 +2,27 @@
 from pydantic import BaseModel, Field
 from typing import List, Optional
 from app.models.order import OrderStatus
+from app.schemas.product_schema import ProductCreate
 
 
 class ProductMessage(BaseModel):
     """Схема сообщения для создания/обновления продукта"""
-    action: str = Field(..., description="Действие: create, update, mark_out_of_stock")
+    action: str = Field(..., description="Действие: create, update, mark_out_of_stock, bulk_create")
     id: Optional[int] = Field(None, description="ID продукта (для update)")
     name: Optional[str] = Field(None, description="Название продукта")
     price: Optional[float] = Field(None, gt=0, description="Цена продукта")
     stock_quantity: Optional[int] = Field(None, ge=0, description="Количество на складе")
+    products: Optional[List[ProductCreate]] = Field(None, description="Список продуктов (для bulk_create)")
+    message_id: Optional[str] = Field(
+        None, min_length=1, max_length=128,
+        description="Ключ идемпотентности: повторная доставка сообщения с тем же ключом пропускается"
+    )
 
     model_config = {"json_schema_extra": {
         "examples": [
             {
                 "action": "create",
+                "message_id": "product-create-0001",
                 "name": "Ноутбук ASUS",
                 "price": 75000.0,
                 "stock_quantity": 10
@@ -28,6 +35,13 @@ class ProductMessage(BaseModel):
             {
                 "action": "mark_out_of_stock",
                 "id": 1
+            },
+            {
+                "action": "bulk_create",
+                "products": [
+                    {"name": "Мышь", "price": 1000.0, "stock_quantity": 50},
+                    {"name": "Клавиатура", "price": 3000.0, "stock_quantity": 20}
+                ]
             }
         ]
     }}
@@ -47,11 +61,16 @@ class OrderMessage(BaseModel):
     address_id: Optional[int] = Field(None, gt=0)
     items: Optional[List[OrderItemMessage]] = Field(None, description="Список товаров")
     status: Optional[OrderStatus] = Field(None, description="Новый статус заказа")
+    message_id: Optional[str] = Field(
+        None, min_length=1, max_length=128,
+        description="Ключ идемпотентности: повторная доставка сообщения с тем же ключом пропускается"
+    )
 
     model_config = {"json_schema_extra": {
         "examples": [
             {
                 "action": "create",
+                "message_id": "order-create-0001",
                 "user_id": 1,
                 "address_id": 1,
                 "items": [
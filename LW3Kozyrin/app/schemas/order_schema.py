@@ -72,3 +72,4 @@ class OrderListResponse(BaseModel):
     """Схема для ответа со списком заказов"""
     orders: list[OrderResponse]
     total_count: int = Field(..., description="Общее количество заказов")
+    next_cursor: Optional[str] = Field(None, description="Курсор следующей страницы (параметр after)")
@@ -18,6 +18,12 @@ class ProductCreate(BaseModel):
     )
 
 
+class ProductBulkResponse(BaseModel):
+    """Схема для ответа на пакетное создание продуктов"""
+    created: int = Field(..., description="Количество созданных продуктов")
+    ids: list[int] = Field(..., description="ID созданных продуктов")
+
+
 class ProductUpdate(BaseModel):
     """Схема для обновления продукта"""
     name: Optional[str] = Field(None, min_length=1, max_length=200)
@@ -49,3 +55,4 @@ class ProductListResponse(BaseModel):
     """Схема для ответа со списком продуктов"""
     products: list[ProductResponse]
     total_count: int = Field(..., description="Общее количество продуктов")
+    next_cursor: Optional[str] = Field(None, description="Курсор следующей страницы (параметр after)")
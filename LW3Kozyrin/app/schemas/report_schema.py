@@ -25,3 +25,13 @@ class ReportResponse(ReportBase):
 class ReportFilter(BaseModel):
     """Схема фильтра для получения отчетов"""
     report_date: date
+
+
+class ProductSalesResponse(BaseModel):
+    """Схема строки топа продуктов за дату"""
+    product_id: int
+    name: str
+    units: int
+    revenue: float
+
+    model_config = ConfigDict(from_attributes=True)
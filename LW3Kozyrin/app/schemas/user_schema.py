@@ -52,6 +52,7 @@ class UserListResponse(BaseModel):
     """Схема для ответа со списком пользователей"""
     users: list[UserResponse]
     total_count: int = Field(..., description="Общее количество пользователей в базе данных")
+    next_cursor: Optional[str] = Field(None, description="Курсор следующей страницы (параметр after)")
 
     model_config = ConfigDict(
         json_schema_extra={
@@ -66,7 +67,8 @@ class UserListResponse(BaseModel):
                         "updated_at": "2024-01-01T00:00:00"
                     }
                 ],
-                "total_count": 10
+                "total_count": 10,
+                "next_cursor": "WzFd"
             }
         }
     )
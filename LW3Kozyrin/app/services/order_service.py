@@ -0,0 +1,51 @@
+from app.repositories.order_repository import OrderRepository
+from app.repositories.product_repository import ProductRepository
+from app.schemas.order_schema import OrderCreate
+from app.models.order import Order
+from sqlalchemy.ext.asyncio import AsyncSession
+from collections import defaultdict
+
+
+class OrderService:
+    """Сервисный слой для оформления заказов"""
+
+    def __init__(
+        self,
+        order_repository: OrderRepository,
+        product_repository: ProductRepository,
+        db_session: AsyncSession
+    ):
+        self.order_repository = order_repository
+        self.product_repository = product_repository
+        self.db_session = db_session
+
+    async def create(self, order_data: OrderCreate) -> Order:
+        """
+        Создать заказ со списанием товара со склада
+
+        Остатки списываются условным UPDATE в той же транзакции, что и
+        вставка заказа: либо фиксируются и заказ, и списание, либо ничего.
+        После фиксации кэш продуктов обновляется остатками из RETURNING.
+
+        Args:
+            order_data: Данные для создания заказа
+
+        Returns:
+            Созданный заказ
+
+        Raises:
+            ValueError: Если товара недостаточно, продукт, пользователь или адрес не найдены
+        """
+        quantities = defaultdict(int)
+        for item in order_data.items:
+            quantities[item.product_id] += item.quantity
+
+        try:
+            reserved = await self.product_repository.reserve_stock(self.db_session, quantities)
+            order = await self.order_repository.create(self.db_session, order_data)
+        except Exception:
+            await self.db_session.rollback()
+            raise
+
+        await self.product_repository.cache_products(reserved)
+        return order
@@ -0,0 +1,99 @@
+"""
+Кодирование пачек строк отчета для выгрузки
+
+Модуль импортирует только стандартную библиотеку: функции выполняются
+в процессах пула выгрузки, которые запускаются методом spawn.
+"""
+import csv
+import gzip
+import io
+from typing import List, Sequence, Tuple
+
+# Колонки выгрузки отчетов
+EXPORT_COLUMNS = ("id", "report_at", "order_id", "count_product")
+
+# Уровень сжатия gzip (компромисс скорости и размера)
+GZIP_LEVEL = 6
+
+
+def encode_csv_gzip(rows: Sequence[Tuple], with_header: bool) -> bytes:
+    """
+    Закодировать пачку строк в CSV и сжать отдельным членом gzip
+
+    Последовательность членов gzip - корректный gzip-файл, поэтому пачки
+    кодируются независимо и могут отдаваться клиенту по мере готовности.
+
+    Args:
+        rows: Строки (id, report_at, order_id, count_product)
+        with_header: Добавить строку заголовка (для первой пачки)
+
+    Returns:
+        Сжатые байты
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    if with_header:
+        writer.writerow(EXPORT_COLUMNS)
+    writer.writerows(rows)
+    return gzip.compress(buffer.getvalue().encode("utf-8"), compresslevel=GZIP_LEVEL, mtime=0)
+
+
+class ParquetStreamEncoder:
+    """
+    Потоковая запись Parquet (требуется пакет pyarrow)
+
+    Каждая пачка записывается отдельной группой строк; байты, записанные
+    в выходной поток, забираются после каждой пачки. В отличие от CSV,
+    Parquet-файл имеет общий футер, поэтому кодировщик хранит состояние
+    и работает в потоке (pyarrow освобождает GIL при кодировании и сжатии).
+    """
+
+    def __init__(self):
+        """Инициализация"""
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self._pa = pa
+        self._chunks: List[bytes] = []
+        self._position = 0
+        self._schema = pa.schema([
+            ("id", pa.int64()),
+            ("report_at", pa.date32()),
+            ("order_id", pa.int64()),
+            ("count_product", pa.int64()),
+        ])
+        self._writer = pq.ParquetWriter(self, self._schema, compression="zstd")
+
+    # Минимальный интерфейс файла для ParquetWriter
+    closed = False
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self) -> None:
+        pass
+
+    def _drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+    def encode(self, rows: Sequence[Tuple]) -> bytes:
+        """Записать пачку строк группой строк и вернуть накопленные байты"""
+        columns = list(zip(*rows)) if rows else [[] for _ in EXPORT_COLUMNS]
+        table = self._pa.Table.from_arrays(
+            [self._pa.array(column, type=field.type) for column, field in zip(columns, self._schema)],
+            schema=self._schema
+        )
+        self._writer.write_table(table)
+        return self._drain()
+
+    def finish(self) -> bytes:
+        """Записать футер и вернуть оставшиеся байты"""
+        self._writer.close()
+        return self._drain()
@@ -0,0 +1,115 @@
+"""Потоковая выгрузка отчетов в CSV (gzip) и Parquet"""
+import asyncio
+import importlib.util
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from functools import partial
+from typing import AsyncIterator, Optional
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from app.repositories.report_repository import ReportRepository
+from app.services.report_encoders import encode_csv_gzip, ParquetStreamEncoder
+
+# Количество процессов, кодирующих выгрузку
+EXPORT_PROCESS_WORKERS = int(os.getenv("EXPORT_PROCESS_WORKERS", "2"))
+
+# Количество строк, читаемых из БД и кодируемых за раз
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "50000"))
+
+# Поддерживаемые форматы: тип содержимого и расширение файла
+EXPORT_FORMATS = {
+    "csv.gz": "application/gzip",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+_process_pool: Optional[ProcessPoolExecutor] = None
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """Пул процессов кодирования (создается при первой выгрузке)"""
+    global _process_pool
+    if _process_pool is None:
+        _process_pool = ProcessPoolExecutor(
+            max_workers=EXPORT_PROCESS_WORKERS,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _process_pool
+
+
+def shutdown_process_pool() -> None:
+    """Остановить пул процессов кодирования"""
+    global _process_pool
+    if _process_pool is not None:
+        _process_pool.shutdown(wait=False, cancel_futures=True)
+        _process_pool = None
+
+
+def check_format(export_format: str) -> None:
+    """
+    Проверить, что формат поддерживается и доступен
+
+    Raises:
+        ValueError: Если формат неизвестен или для него не установлен пакет
+    """
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Неизвестный формат выгрузки: {export_format}")
+    if export_format == "parquet" and importlib.util.find_spec("pyarrow") is None:
+        raise ValueError("Формат parquet недоступен: не установлен пакет pyarrow")
+
+
+async def export_reports(
+        engine: AsyncEngine,
+        start: date,
+        end: date,
+        export_format: str,
+        chunk_size: Optional[int] = None
+) -> AsyncIterator[bytes]:
+    """
+    Выгрузить отчеты за диапазон дат
+
+    Строки читаются из БД пачками через серверный курсор
+    (ReportRepository.iter_range) в собственной сессии: выгрузка идет
+    после завершения обработчика запроса. CSV-пачки кодируются и сжимаются
+    в пуле процессов, Parquet - в потоке. Чтение следующей пачки идет
+    параллельно с кодированием текущей, поэтому в памяти одновременно не
+    больше двух пачек.
+
+    Args:
+        engine: Движок БД
+        start: Первая дата диапазона
+        end: Последняя дата диапазона (включительно)
+        export_format: csv.gz или parquet
+        chunk_size: Размер пачки (по умолчанию EXPORT_CHUNK_SIZE)
+
+    Yields:
+        Части файла выгрузки
+    """
+    loop = asyncio.get_running_loop()
+    repository = ReportRepository()
+    parquet = ParquetStreamEncoder() if export_format == "parquet" else None
+    pending: Optional[asyncio.Future] = None
+    first = True
+
+    async with AsyncSession(engine) as session:
+        async for rows in repository.iter_range(session, start, end, chunk_size or EXPORT_CHUNK_SIZE):
+            if parquet is not None and pending is not None:
+                # Кодировщик Parquet хранит состояние: пачки кодируются строго по очереди
+                yield await pending
+                pending = None
+            if parquet is not None:
+                future = asyncio.ensure_future(asyncio.to_thread(parquet.encode, rows))
+            else:
+                future = loop.run_in_executor(get_process_pool(), partial(encode_csv_gzip, rows, first))
+            first = False
+            if pending is not None:
+                yield await pending
+            pending = future
+
+    if pending is not None:
+        yield await pending
+    if parquet is not None:
+        yield await asyncio.to_thread(parquet.finish)
+    elif first:
+        # Пустая выгрузка - только заголовок
+        yield encode_csv_gzip([], True)
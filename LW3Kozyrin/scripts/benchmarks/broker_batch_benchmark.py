@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк пропускной способности подписчика product
+
+Публикует MESSAGES сообщений create через TestRabbitBroker (в памяти,
+без RabbitMQ) окнами по IN_FLIGHT одновременных сообщений, как при
+prefetch канала, и сравнивает обработку по одному сообщению (сессия и
+COMMIT на сообщение) с пакетной обработкой (BatchConsumer: create_many
+на пакет) для разных размеров пакета.
+
+По умолчанию используется файловая SQLite во временном каталоге; для
+PostgreSQL задайте BENCH_DATABASE_URL. Требуется запущенный
+redis-server (REDIS_URL): репозиторий продуктов пишет в кэш.
+
+Запуск:
+    python scripts/benchmarks/broker_batch_benchmark.py
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from faststream.rabbit import TestRabbitBroker
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from app.broker import rabbitmq_broker
+from app.broker.batching import BatchConsumer
+from app.models.base import Base
+from app.models.product import Product
+
+MESSAGES = 2_000
+IN_FLIGHT = 200
+BATCH_SIZES = [1, 10, 50, 200]
+MAX_WAIT = 0.01
+
+
+async def run(database_url: str, batch_size: int) -> float:
+    """Опубликовать MESSAGES сообщений и вернуть сообщений в секунду"""
+    # SQLite допускает одного писателя: одно соединение вместо ожидания блокировки
+    pool_args = {"pool_size": 1, "max_overflow": 0} if database_url.startswith("sqlite") else {}
+    engine = create_async_engine(database_url, echo=False, **pool_args)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+
+    rabbitmq_broker.async_session_factory = async_sessionmaker(
+        engine, class_=AsyncSession, expire_on_commit=False
+    )
+    rabbitmq_broker.product_batches = (
+        BatchConsumer(
+            "product", rabbitmq_broker.handle_product_message, engine, batch_size, MAX_WAIT,
+            batch_handler=rabbitmq_broker.handle_product_batch
+        )
+        if batch_size > 1 else None
+    )
+
+    messages = [
+        {"action": "create", "name": f"Товар {i}", "price": 100.0, "stock_quantity": 10}
+        for i in range(MESSAGES)
+    ]
+    async with TestRabbitBroker(rabbitmq_broker.broker) as broker:
+        started = time.perf_counter()
+        for offset in range(0, MESSAGES, IN_FLIGHT):
+            await asyncio.gather(*(
+                broker.publish(message, "product") for message in messages[offset:offset + IN_FLIGHT]
+            ))
+        elapsed = time.perf_counter() - started
+
+    async with engine.connect() as conn:
+        assert (await conn.execute(select(func.count(Product.id)))).scalar_one() == MESSAGES
+    await engine.dispose()
+    return MESSAGES / elapsed
+
+
+async def main():
+    # Логи каждого сообщения искажают измерение
+    rabbitmq_broker.logger.disabled = True
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = os.getenv("BENCH_DATABASE_URL", f"sqlite+aiosqlite:///{tmp}/bench.db")
+        print(f"{'пакет':>6} | {'сообщений/с':>12}")
+        print("-" * 21)
+        for batch_size in BATCH_SIZES:
+            rate = await run(database_url, batch_size)
+            print(f"{batch_size:>6} | {rate:>12.0f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк сессий БД обработчика сообщений брокера
+
+Публикует MESSAGES сообщений update_status очереди order через
+TestRabbitBroker (в памяти, без RabbitMQ) и сравнивает:
+- до: движок с echo=True и прежний get_db_session, возвращавший сессию
+  из уже завершенного контекста (закрывалась вручную в обработчике);
+- после: echo из SQL_ECHO (выключен) и get_db_session как контекстный
+  менеджер на время обработки сообщения.
+
+Сообщения обрабатываются по одному (без пакетов). По умолчанию
+используется файловая SQLite во временном каталоге; для PostgreSQL
+задайте BENCH_DATABASE_URL.
+
+Запуск:
+    python scripts/benchmarks/broker_session_benchmark.py
+"""
+import asyncio
+import io
+import logging
+import os
+import sys
+import tempfile
+import time
+from contextlib import asynccontextmanager, redirect_stdout
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from faststream.rabbit import TestRabbitBroker
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from app.broker import rabbitmq_broker
+from app.models.base import Base
+from app.models import User, Address, Order
+from app.models.order import OrderStatus
+
+MESSAGES = 2_000
+ORDERS = 100
+IN_FLIGHT = 50
+REPEATS = 3
+STATUSES = [OrderStatus.PROCESSING, OrderStatus.SHIPPED, OrderStatus.DELIVERED]
+
+
+async def fill(engine) -> None:
+    """Создать пользователя, адрес и ORDERS заказов"""
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+        user_id = (await conn.execute(
+            insert(User).values(username="bench", email="bench@example.com").returning(User.id)
+        )).scalar_one()
+        address_id = (await conn.execute(
+            insert(Address).values(
+                street="ул. Тестовая, 1", city="Москва", zip_code="123456", country="Russia", user_id=user_id
+            ).returning(Address.id)
+        )).scalar_one()
+        await conn.execute(insert(Order), [
+            {"user_id": user_id, "address_id": address_id, "total_price": 1.0}
+            for _ in range(ORDERS)
+        ])
+
+
+def legacy_session_provider(session_factory):
+    """Прежний get_db_session: сессия из завершенного контекста, закрывается вручную"""
+    @asynccontextmanager
+    async def get_db_session():
+        async with session_factory() as session:
+            pass
+        try:
+            yield session
+        except Exception:
+            await session.rollback()
+            raise
+        finally:
+            await session.close()
+    return get_db_session
+
+
+async def run(database_url: str, legacy: bool) -> float:
+    """Опубликовать MESSAGES сообщений и вернуть сообщений в секунду"""
+    # SQLite допускает одного писателя: одно соединение вместо ожидания блокировки
+    pool_args = {"pool_size": 1, "max_overflow": 0} if database_url.startswith("sqlite") else {}
+    engine = create_async_engine(database_url, echo=legacy, **pool_args)
+    await fill(engine)
+
+    session_factory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    rabbitmq_broker.async_session_factory = session_factory
+    rabbitmq_broker.order_batches = None
+    if legacy:
+        rabbitmq_broker.get_db_session = legacy_session_provider(session_factory)
+
+    messages = [
+        {"action": "update_status", "id": i % ORDERS + 1, "status": STATUSES[i % len(STATUSES)].value}
+        for i in range(MESSAGES)
+    ]
+    async with TestRabbitBroker(rabbitmq_broker.broker) as broker:
+        started = time.perf_counter()
+        for offset in range(0, MESSAGES, IN_FLIGHT):
+            await asyncio.gather(*(
+                broker.publish(message, "order") for message in messages[offset:offset + IN_FLIGHT]
+            ))
+        elapsed = time.perf_counter() - started
+
+    await engine.dispose()
+    return MESSAGES / elapsed
+
+
+async def main():
+    # Логи каждого сообщения одинаковы в обоих режимах и искажают измерение
+    rabbitmq_broker.logger.disabled = True
+    scoped_session = rabbitmq_broker.get_db_session
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = os.getenv("BENCH_DATABASE_URL", f"sqlite+aiosqlite:///{tmp}/bench.db")
+        results = {}
+        for legacy in (True, False):
+            rabbitmq_broker.get_db_session = scoped_session
+            # Вывод echo не нужен, но его форматирование и запись измеряются
+            sink = io.StringIO()
+            previous = [handler.setStream(sink) for handler in logging.root.handlers]
+            with redirect_stdout(sink):
+                rates = [await run(database_url, legacy) for _ in range(REPEATS)]
+            for handler, stream in zip(logging.root.handlers, previous):
+                handler.setStream(stream)
+            results[legacy] = max(rates)
+
+    print(f"{'режим':<32} | {'сообщений/с':>12}")
+    print("-" * 47)
+    print(f"{'до (echo=True, старая сессия)':<32} | {results[True]:>12.0f}")
+    print(f"{'после (echo выкл., контекст)':<32} | {results[False]:>12.0f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
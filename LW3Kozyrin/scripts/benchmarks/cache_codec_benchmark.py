@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк кодеков сериализации кэша
+
+Измеряет стоимость кодирования и декодирования значений,
+которые репозитории кладут в кэш (product:{id}, user:{id}),
+и размер закодированного значения для каждого доступного кодека.
+
+Запуск:
+    python scripts/benchmarks/cache_codec_benchmark.py
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from app.cache import codecs
+from app.models.product import Product
+from app.models.user import User
+from app.repositories.product_repository import ProductRepository
+from app.repositories.user_repository import UserRepository
+
+NUMBER = 100_000
+
+PAYLOADS = {
+    "Product": ProductRepository._to_cache_dict(
+        Product(id=42, name="Ноутбук ASUS ROG Strix", price=85000.0, stock_quantity=5)
+    ),
+    "User": UserRepository._to_cache_dict(
+        User(id=42, username="johndoe", email="john.doe@example.com", full_name="John Doe")
+    ),
+}
+
+
+def main():
+    print(f"{'кодек':<8} | {'payload':<8} | {'байт':>5} | {'encode, мкс':>11} | {'decode, мкс':>11}")
+    print("-" * 56)
+
+    for name in codecs.CODECS:
+        try:
+            codec = codecs.get_codec(name)
+        except ValueError as e:
+            print(f"{name:<8} | пропущен: {e}")
+            continue
+
+        for payload_name, value in PAYLOADS.items():
+            data = codec.dumps(value)
+            encode = timeit.timeit(lambda: codec.dumps(value), number=NUMBER) / NUMBER * 1e6
+            decode = timeit.timeit(lambda: codecs.loads(data), number=NUMBER) / NUMBER * 1e6
+            print(f"{name:<8} | {payload_name:<8} | {len(data):>5} | {encode:>11.2f} | {decode:>11.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк пагинации: OFFSET против keyset (курсор)
+
+Заполняет таблицу products и сравнивает время получения первой
+и 10 000-й страницы через ProductRepository.get_by_filter
+в режимах page/count и after=<курсор>.
+
+По умолчанию используется SQLite in-memory; для PostgreSQL
+задайте BENCH_DATABASE_URL.
+
+Запуск:
+    python scripts/benchmarks/pagination_benchmark.py
+"""
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from app.models.base import Base
+from app.models.product import Product
+from app.repositories.cursor import encode_cursor
+from app.repositories.product_repository import ProductRepository
+
+DATABASE_URL = os.getenv("BENCH_DATABASE_URL", "sqlite+aiosqlite:///:memory:")
+ROWS = 200_000
+COUNT = 10
+PAGES = [1, 10_000]
+REPEATS = 20
+CHUNK = 10_000
+
+
+async def measure(coro_factory) -> float:
+    """Среднее время выполнения в миллисекундах"""
+    start = time.perf_counter()
+    for _ in range(REPEATS):
+        await coro_factory()
+    return (time.perf_counter() - start) / REPEATS * 1000
+
+
+async def main():
+    engine = create_async_engine(DATABASE_URL, echo=False)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+
+    session_factory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    repository = ProductRepository()
+
+    async with session_factory() as session:
+        print(f"Заполнение products: {ROWS} строк...")
+        for start in range(0, ROWS, CHUNK):
+            await session.execute(insert(Product), [
+                {"name": f"Товар {i}", "price": 100.0, "stock_quantity": 1}
+                for i in range(start, start + CHUNK)
+            ])
+        await session.commit()
+
+        print(f"\n{'страница':>9} | {'OFFSET, мс':>10} | {'курсор, мс':>10}")
+        print("-" * 36)
+        for page in PAGES:
+            # Курсор страницы page - id последней записи предыдущей страницы (id идут с 1)
+            after = encode_cursor((page - 1) * COUNT)
+
+            by_page = await repository.get_by_filter(session, count=COUNT, page=page)
+            by_cursor = await repository.get_by_filter(session, count=COUNT, after=after)
+            assert [p.id for p in by_page] == [p.id for p in by_cursor]
+
+            offset_ms = await measure(lambda: repository.get_by_filter(session, count=COUNT, page=page))
+            cursor_ms = await measure(lambda: repository.get_by_filter(session, count=COUNT, after=after))
+            print(f"{page:>9} | {offset_ms:>10.3f} | {cursor_ms:>10.3f}")
+
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Микро-бенчмарк пакетных операций RedisClient
+
+Сравнивает поштучные get_json/set_json/delete с пакетными
+get_many_json/set_many_json/delete_many для 1/10/100 ключей.
+Round trips измеряются: считается каждая отправка команды или
+pipeline соединением Redis (send_packed_command).
+Требуется запущенный redis-server (REDIS_URL).
+
+Запуск:
+    python scripts/benchmarks/redis_bulk_benchmark.py
+"""
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from redis.asyncio.connection import AbstractConnection
+from app.cache.redis_client import RedisClient
+
+KEY_COUNTS = [1, 10, 100]
+REPEATS = 50
+PAYLOAD = {"id": 0, "name": "Ноутбук ASUS", "price": 75000.0, "stock_quantity": 10}
+
+
+# Количество отправок в Redis (одна команда или один pipeline - один round trip)
+round_trips = 0
+_send_packed_command = AbstractConnection.send_packed_command
+
+
+async def counting_send_packed_command(self, command, check_health=True):
+    """send_packed_command с подсчетом round trips"""
+    global round_trips
+    round_trips += 1
+    return await _send_packed_command(self, command, check_health)
+
+
+async def measure(coro_factory) -> tuple[float, float]:
+    """Среднее время выполнения в миллисекундах и среднее количество round trips"""
+    sent = round_trips
+    start = time.perf_counter()
+    for _ in range(REPEATS):
+        await coro_factory()
+    elapsed = time.perf_counter() - start
+    return elapsed / REPEATS * 1000, (round_trips - sent) / REPEATS
+
+
+async def main():
+    AbstractConnection.send_packed_command = counting_send_packed_command
+    client = RedisClient()
+    await client.connect()
+
+    print(f"{'ключей':>7} | {'операция':<8} | {'RTT поштучно':>12} | {'мс поштучно':>11} | "
+          f"{'RTT пакетом':>11} | {'мс пакетом':>10}")
+    print("-" * 75)
+
+    for count in KEY_COUNTS:
+        keys = [f"bench:product:{i}" for i in range(count)]
+        values = {key: {**PAYLOAD, "id": i} for i, key in enumerate(keys)}
+
+        async def set_single():
+            for key, value in values.items():
+                await client.set_json(key, value, expire=60)
+
+        async def get_single():
+            for key in keys:
+                await client.get_json(key)
+
+        async def delete_single():
+            for key in keys:
+                await client.delete(key)
+
+        rows = [
+            ("set", set_single, lambda: client.set_many_json(values, expire=60)),
+            ("get", get_single, lambda: client.get_many_json(keys)),
+            ("delete", delete_single, lambda: client.delete_many(keys)),
+        ]
+        for name, single, bulk in rows:
+            single_ms, single_trips = await measure(single)
+            bulk_ms, bulk_trips = await measure(bulk)
+            print(f"{count:>7} | {name:<8} | {single_trips:>12g} | {single_ms:>11.3f} | "
+                  f"{bulk_trips:>11g} | {bulk_ms:>10.3f}")
+
+    await client.disconnect()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
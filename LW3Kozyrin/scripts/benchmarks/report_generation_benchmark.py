@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк генерации отчета за день
+
+Сравнивает прежний способ (SUM по каждому заказу и commit на каждую
+запись отчета) с ReportRepository.upsert_for_date (один
+INSERT ... SELECT ... GROUP BY) для 1 000 и 100 000 заказов за день.
+Прежний способ для больших объемов не запускается (LEGACY_MAX_ORDERS).
+
+По умолчанию используется SQLite in-memory; для PostgreSQL
+задайте BENCH_DATABASE_URL.
+
+Запуск:
+    python scripts/benchmarks/report_generation_benchmark.py
+"""
+import asyncio
+import os
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from sqlalchemy import insert, select, func
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from app.models.base import Base
+from app.models import User, Address, Order, Report
+from app.models.order import OrderItem
+from app.models.product import Product
+from app.repositories.report_repository import ReportRepository
+
+DATABASE_URL = os.getenv("BENCH_DATABASE_URL", "sqlite+aiosqlite:///:memory:")
+ORDER_COUNTS = [1_000, 100_000]
+ITEMS_PER_ORDER = 3
+LEGACY_MAX_ORDERS = 10_000
+CHUNK = 10_000
+REPORT_DATE = date(2024, 1, 15)
+
+
+async def fill(session: AsyncSession, orders: int) -> None:
+    """Заполнить заказы за REPORT_DATE"""
+    user = User(username="bench", email="bench@example.com")
+    session.add(user)
+    await session.flush()
+    address = Address(street="ул. Тестовая, 1", city="Москва", zip_code="123456", country="Russia", user_id=user.id)
+    product = Product(name="Товар", price=1.0, stock_quantity=1)
+    session.add_all([address, product])
+    await session.flush()
+
+    start = datetime.combine(REPORT_DATE, datetime.min.time())
+    step = timedelta(days=1) / orders
+    for offset in range(0, orders, CHUNK):
+        order_ids = (await session.scalars(insert(Order).returning(Order.id), [
+            {"user_id": user.id, "address_id": address.id, "total_price": 3.0, "created_at": start + step * i}
+            for i in range(offset, min(offset + CHUNK, orders))
+        ])).all()
+        await session.execute(insert(OrderItem), [
+            {"order_id": order_id, "product_id": product.id, "quantity": 1, "price_at_purchase": 1.0}
+            for order_id in order_ids
+            for _ in range(ITEMS_PER_ORDER)
+        ])
+    await session.commit()
+
+
+async def legacy_generate(session: AsyncSession) -> int:
+    """Прежняя генерация: запрос SUM и commit на каждый заказ"""
+    start = datetime.combine(REPORT_DATE, datetime.min.time())
+    orders = (await session.scalars(
+        select(Order).where(Order.created_at >= start, Order.created_at < start + timedelta(days=1))
+    )).all()
+    created = 0
+    for order in orders:
+        total = (await session.execute(
+            select(func.sum(OrderItem.quantity)).where(OrderItem.order_id == order.id)
+        )).scalar() or 0
+        if total > 0:
+            report = Report(report_at=REPORT_DATE, order_id=order.id, count_product=total)
+            session.add(report)
+            await session.commit()
+            await session.refresh(report)
+            created += 1
+    return created
+
+
+async def run(orders: int) -> None:
+    engine = create_async_engine(DATABASE_URL, echo=False)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+
+    session_factory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    async with session_factory() as session:
+        await fill(session, orders)
+
+        legacy = "-"
+        if orders <= LEGACY_MAX_ORDERS:
+            started = time.perf_counter()
+            created = await legacy_generate(session)
+            legacy = f"{time.perf_counter() - started:.3f}"
+            assert created == orders
+
+        started = time.perf_counter()
+        _, created = await ReportRepository().upsert_for_date(session, REPORT_DATE)
+        rebuilt = time.perf_counter() - started
+        assert created == orders
+
+    print(f"{orders:>8} | {legacy:>12} | {rebuilt:>14.3f}")
+    await engine.dispose()
+
+
+async def main():
+    print(f"{'заказов':>8} | {'по заказу, с':>12} | {'INSERT..SELECT, с':>14}")
+    print("-" * 42)
+    for orders in ORDER_COUNTS:
+        await run(orders)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк памяти генерации отчета за день (пик tracemalloc)
+
+Сравнивает три способа обработки заказов дня на 10 000 и 1 000 000 заказов:
+- all(): прежний способ, все ORM-объекты Order дня загружаются в память сразу
+  (для больших объемов не запускается, LEGACY_MAX_ORDERS);
+- yield_per: потоковое чтение заказов пачками по STREAM_CHUNK строк;
+- INSERT..SELECT: ReportRepository.upsert_for_date, строки заказов вообще
+  не передаются в приложение.
+
+tracemalloc учитывает только память, выделенную Python; кэш страниц
+SQLite в него не попадает. По умолчанию используется SQLite in-memory;
+для PostgreSQL задайте BENCH_DATABASE_URL.
+
+Запуск:
+    python scripts/benchmarks/report_memory_benchmark.py
+"""
+import asyncio
+import os
+import sys
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from app.models.base import Base
+from app.models import User, Address, Order
+from app.models.order import OrderItem
+from app.models.product import Product
+from app.repositories.report_repository import ReportRepository
+
+DATABASE_URL = os.getenv("BENCH_DATABASE_URL", "sqlite+aiosqlite:///:memory:")
+ORDER_COUNTS = [10_000, 1_000_000]
+LEGACY_MAX_ORDERS = 100_000
+STREAM_CHUNK = 1000
+CHUNK = 20_000
+REPORT_DATE = date(2024, 1, 15)
+
+
+async def fill(session: AsyncSession, orders: int) -> None:
+    """Заполнить заказы за REPORT_DATE (по одной позиции в заказе)"""
+    user = User(username="bench", email="bench@example.com")
+    session.add(user)
+    await session.flush()
+    address = Address(street="ул. Тестовая, 1", city="Москва", zip_code="123456", country="Russia", user_id=user.id)
+    product = Product(name="Товар", price=1.0, stock_quantity=1)
+    session.add_all([address, product])
+    await session.flush()
+
+    start = datetime.combine(REPORT_DATE, datetime.min.time())
+    step = timedelta(days=1) / orders
+    for offset in range(0, orders, CHUNK):
+        order_ids = (await session.scalars(insert(Order).returning(Order.id), [
+            {"user_id": user.id, "address_id": address.id, "total_price": 1.0, "created_at": start + step * i}
+            for i in range(offset, min(offset + CHUNK, orders))
+        ])).all()
+        await session.execute(insert(OrderItem), [
+            {"order_id": order_id, "product_id": product.id, "quantity": 1, "price_at_purchase": 1.0}
+            for order_id in order_ids
+        ])
+    await session.commit()
+
+
+def day_orders():
+    start = datetime.combine(REPORT_DATE, datetime.min.time())
+    return select(Order).where(Order.created_at >= start, Order.created_at < start + timedelta(days=1))
+
+
+async def scan_all(session: AsyncSession) -> int:
+    """Прежний способ: все заказы дня в памяти"""
+    orders = (await session.execute(day_orders())).scalars().all()
+    return len(orders)
+
+
+async def scan_streamed(session: AsyncSession) -> int:
+    """
+    Потоковое чтение пачками
+
+    Неизмененные объекты хранятся в identity map по слабым ссылкам,
+    поэтому обработанная пачка освобождается при переходе к следующей
+    """
+    processed = 0
+    result = await session.stream_scalars(day_orders().execution_options(yield_per=STREAM_CHUNK))
+    async for chunk in result.partitions():
+        processed += len(chunk)
+    return processed
+
+
+async def upsert(session: AsyncSession) -> int:
+    """Текущий способ: агрегация в БД"""
+    orders_count, _ = await ReportRepository().upsert_for_date(session, REPORT_DATE)
+    return orders_count
+
+
+async def measure(session_factory, func, orders: int) -> str:
+    """Пик tracemalloc (МиБ) и время выполнения"""
+    async with session_factory() as session:
+        tracemalloc.start()
+        started = time.perf_counter()
+        processed = await func(session)
+        elapsed = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    assert processed == orders
+    return f"{peak / 2 ** 20:8.1f} МиБ {elapsed:6.2f} с"
+
+
+async def run(orders: int) -> None:
+    engine = create_async_engine(DATABASE_URL, echo=False)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+
+    session_factory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    async with session_factory() as session:
+        await fill(session, orders)
+
+    legacy = await measure(session_factory, scan_all, orders) if orders <= LEGACY_MAX_ORDERS else "-"
+    streamed = await measure(session_factory, scan_streamed, orders)
+    aggregated = await measure(session_factory, upsert, orders)
+    print(f"{orders:>9} | {legacy:>20} | {streamed:>20} | {aggregated:>20}")
+    await engine.dispose()
+
+
+async def main():
+    print(f"{'заказов':>9} | {'all()':>20} | {'yield_per':>20} | {'INSERT..SELECT':>20}")
+    print("-" * 78)
+    for orders in ORDER_COUNTS:
+        await run(orders)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
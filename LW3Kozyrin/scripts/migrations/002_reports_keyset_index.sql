@@ -0,0 +1,5 @@
+-- Миграция: индекс для keyset-пагинации отчетов
+-- Описание: GET /report/all?after=<курсор> сортирует отчеты по (report_at, id)
+-- по убыванию и продолжает выборку после последней записи страницы
+
+CREATE INDEX IF NOT EXISTS idx_reports_report_at_id ON reports(report_at, id);
@@ -0,0 +1,12 @@
+-- Миграция: уникальность записи заказа в отчете за дату
+-- Описание: ReportRepository.upsert_for_date пересчитывает отчет через
+-- INSERT ... ON CONFLICT (report_at, order_id) DO UPDATE
+
+-- Удаляем дубликаты, оставшиеся от повторной генерации (оставляем последнюю запись)
+DELETE FROM reports r
+USING reports newer
+WHERE r.report_at = newer.report_at
+  AND r.order_id = newer.order_id
+  AND r.id < newer.id;
+
+CREATE UNIQUE INDEX IF NOT EXISTS uq_reports_report_at_order_id ON reports(report_at, order_id);
@@ -0,0 +1,20 @@
+-- Миграция: свертка дневных продаж продуктов
+-- Описание: таблица product_daily_sales ведется задачами TaskIQ
+-- (ProductSalesRepository) и обслуживает GET /report/top-products
+
+CREATE TABLE IF NOT EXISTS product_daily_sales (
+    sales_date DATE NOT NULL,
+    product_id INTEGER NOT NULL REFERENCES products(id),
+    units INTEGER NOT NULL DEFAULT 0,
+    revenue DOUBLE PRECISION NOT NULL DEFAULT 0,
+    PRIMARY KEY (sales_date, product_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_product_daily_sales_date_units ON product_daily_sales(sales_date, units, product_id);
+CREATE INDEX IF NOT EXISTS idx_product_daily_sales_date_revenue ON product_daily_sales(sales_date, revenue, product_id);
+
+-- Водяной знак инкрементальной свертки: ID последнего учтенного заказа
+CREATE TABLE IF NOT EXISTS rollup_watermarks (
+    name VARCHAR PRIMARY KEY,
+    last_order_id INTEGER NOT NULL DEFAULT 0
+);
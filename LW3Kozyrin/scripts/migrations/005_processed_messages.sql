@@ -0,0 +1,13 @@
+-- Миграция: ключи идемпотентности сообщений брокера
+-- Описание: запись добавляется в транзакции обработчика сообщения;
+-- первичный ключ не дает применить повторно доставленное сообщение дважды
+
+CREATE TABLE IF NOT EXISTS processed_messages (
+    queue VARCHAR(64) NOT NULL,
+    message_id VARCHAR(128) NOT NULL,
+    processed_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (queue, message_id)
+);
+
+-- Очистка устаревших ключей задачей purge_processed_messages
+CREATE INDEX IF NOT EXISTS idx_processed_messages_processed_at ON processed_messages(processed_at);
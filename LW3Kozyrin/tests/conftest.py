@@ -3,12 +3,17 @@
 
 Фикстуры:
     - engine: Создает тестовый движок SQLite in-memory
+    - file_engine: Движок файловой SQLite с отдельным соединением на сессию
+    - postgres_engine: Движок PostgreSQL из TEST_POSTGRES_URL (тест пропускается, если не задан)
     - test_session: Предоставляет сессию БД для каждого теста
     - user_repository: Репозиторий пользователей
     - product_repository: Репозиторий продуктов
     - address_repository: Репозиторий адресов
     - order_repository: Репозиторий заказов
+    - reset_redis_client: Переподключение клиента Redis в цикле событий каждого теста
+    - reset_metrics: Сброс метрик процесса до и после каждого теста
 """
+import os
 import pytest
 import pytest_asyncio
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
@@ -18,6 +23,8 @@ from app.repositories.user_repository import UserRepository
 from app.repositories.product_repository import ProductRepository
 from app.repositories.address_repository import AddressRepository
 from app.repositories.order_repository import OrderRepository
+from app.cache.redis_client import redis_client
+from app.metrics import metrics
 
 
 @pytest_asyncio.fixture(scope="function")
@@ -51,6 +58,76 @@ async def engine():
     await engine.dispose()
 
 
+@pytest_asyncio.fixture(scope="function")
+async def file_engine(tmp_path):
+    """
+    Фикстура движка на файловой SQLite
+
+    В отличие от engine, у каждой сессии свое соединение, поэтому
+    транзакции действительно конкурируют за запись.
+
+    Yields:
+        AsyncEngine: Асинхронный движок базы данных с созданными таблицами
+    """
+    engine = create_async_engine(
+        f"sqlite+aiosqlite:///{tmp_path / 'test.db'}",
+        connect_args={"timeout": 30},
+        pool_size=20,
+        max_overflow=0
+    )
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    yield engine
+    await engine.dispose()
+
+
+@pytest_asyncio.fixture(scope="function")
+async def postgres_engine():
+    """
+    Фикстура движка на PostgreSQL для тестов конкуренции транзакций
+
+    Таблицы создаются перед тестом и удаляются после него, поэтому
+    TEST_POSTGRES_URL должен указывать на отдельную тестовую БД.
+
+    Yields:
+        AsyncEngine: Асинхронный движок базы данных с созданными таблицами
+    """
+    url = os.getenv("TEST_POSTGRES_URL")
+    if not url:
+        pytest.skip("TEST_POSTGRES_URL не задан")
+    engine = create_async_engine(url, pool_size=20, max_overflow=0)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    yield engine
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+    await engine.dispose()
+
+
+@pytest.fixture(scope="function", autouse=True)
+def reset_metrics():
+    """Сбросить метрики процесса до и после теста"""
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+@pytest_asyncio.fixture(scope="function", autouse=True)
+async def reset_redis_client():
+    """
+    Фикстура для сброса подключения глобального клиента Redis
+
+    Каждый тест выполняется в своем цикле событий, поэтому соединение,
+    открытое в предыдущем тесте, использовать нельзя.
+    """
+    yield
+    try:
+        await redis_client.disconnect()
+    except RuntimeError:
+        # Соединение открыто в уже закрытом цикле событий (например, AsyncTestClient)
+        redis_client._redis = None
+
+
 @pytest_asyncio.fixture(scope="function")
 async def test_session(engine):
     """
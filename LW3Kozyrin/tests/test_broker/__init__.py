@@ -0,0 +1 @@
+"""Тесты обработчиков брокера RabbitMQ"""
@@ -0,0 +1,180 @@
+"""
+Тесты пакетной обработки сообщений брокера
+
+Используется файловая SQLite: пакет открывает собственное соединение
+"""
+import asyncio
+import pytest
+from unittest.mock import patch
+from faststream.rabbit import TestRabbitBroker
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncConnection
+from app.broker import rabbitmq_broker
+from app.broker.batching import BatchConsumer
+from app.cache.redis_client import redis_client
+from app.metrics import metrics
+from app.models.product import Product
+
+
+async def product_names(engine):
+    """Названия сохраненных продуктов"""
+    async with engine.connect() as conn:
+        return sorted((await conn.execute(select(Product.name))).scalars().all())
+
+
+async def add_product(session, name):
+    """Обработчик: создать продукт; сообщение "bad" завершается ошибкой после записи"""
+    session.add(Product(name=name, price=1.0, stock_quantity=1))
+    await session.flush()
+    if name == "bad":
+        raise RuntimeError("bad message")
+    await session.commit()
+
+
+@pytest.mark.asyncio
+async def test_batch_commits_once_and_rejects_only_failing(file_engine):
+    """
+    Тест пакета с ошибочным сообщением
+
+    Проверяет:
+    - Сообщения пакета обрабатываются одним пакетом (по max_size)
+    - Ошибка сообщения откатывает только его, остальные сохраняются
+    - Ошибка доходит только до обработчика ошибочного сообщения
+    """
+    batches = BatchConsumer("test", add_product, file_engine, max_size=4, max_wait=10)
+
+    results = await asyncio.gather(
+        *(batches.submit(name) for name in ["a", "bad", "b", "c"]),
+        return_exceptions=True
+    )
+
+    assert results[0] is None and results[2] is None and results[3] is None
+    assert isinstance(results[1], RuntimeError)
+    assert await product_names(file_engine) == ["a", "b", "c"]
+    counters = metrics.snapshot()["counters"]
+    assert counters["broker.test.batches"] == 1
+    assert counters["broker.test.failed"] == 1
+
+
+@pytest.mark.asyncio
+async def test_batch_flushed_after_max_wait(file_engine):
+    """Тест: неполный пакет обрабатывается по истечении max_wait"""
+    batches = BatchConsumer("test", add_product, file_engine, max_size=100, max_wait=0.01)
+
+    await asyncio.wait_for(asyncio.gather(batches.submit("a"), batches.submit("b")), timeout=5)
+
+    assert await product_names(file_engine) == ["a", "b"]
+    assert metrics.snapshot()["counters"]["broker.test.batches"] == 1
+
+
+@pytest.mark.asyncio
+async def test_batch_split_on_commit_failure(file_engine):
+    """Тест: при ошибке COMMIT пакет делится, пока не останется виновное сообщение"""
+    async def handler(session, name):
+        if name == "poison":
+            (await session.connection()).info["fail_commit"] = True
+        await add_product(session, name)
+
+    original_commit = AsyncConnection.commit
+
+    async def commit(self):
+        if self.info.pop("fail_commit", False):
+            await self.rollback()
+            raise RuntimeError("commit failed")
+        await original_commit(self)
+
+    batches = BatchConsumer("test", handler, file_engine, max_size=4, max_wait=10)
+    with patch.object(AsyncConnection, "commit", commit):
+        results = await asyncio.gather(
+            *(batches.submit(name) for name in ["a", "b", "poison", "c"]),
+            return_exceptions=True
+        )
+
+    assert [isinstance(result, RuntimeError) for result in results] == [False, False, True, False]
+    assert await product_names(file_engine) == ["a", "b", "c"]
+    assert metrics.snapshot()["counters"]["broker.test.batch_splits"] == 2
+
+
+@pytest.mark.asyncio
+async def test_batch_handler_falls_back_to_single_messages(file_engine):
+    """Тест: при ошибке обработчика пакета сообщения обрабатываются по одному"""
+    async def add_all(session, names):
+        for name in names:
+            await add_product(session, name)
+
+    batches = BatchConsumer("test", add_product, file_engine, max_size=3, max_wait=10, batch_handler=add_all)
+
+    results = await asyncio.gather(
+        *(batches.submit(name) for name in ["a", "bad", "b"]),
+        return_exceptions=True
+    )
+
+    assert [isinstance(result, RuntimeError) for result in results] == [False, True, False]
+    assert await product_names(file_engine) == ["a", "b"]
+    assert metrics.snapshot()["counters"]["broker.test.batch_fallbacks"] == 1
+
+
+@pytest.mark.asyncio
+async def test_subscriber_batch_mode(file_engine):
+    """Тест: подписчик в пакетном режиме создает продукты из сообщений одной вставкой"""
+    batches = BatchConsumer(
+        "product", rabbitmq_broker.handle_product_message, file_engine, max_size=10, max_wait=0.01,
+        batch_handler=rabbitmq_broker.handle_product_batch
+    )
+    messages = [
+        {"action": "create", "name": f"Товар {i}", "price": 10.0, "stock_quantity": 1}
+        for i in range(10)
+    ]
+
+    with patch.object(rabbitmq_broker, "product_batches", batches):
+        async with TestRabbitBroker(rabbitmq_broker.broker) as broker:
+            await asyncio.gather(*(broker.publish(message, "product") for message in messages))
+
+    assert len(await product_names(file_engine)) == 10
+    counters = metrics.snapshot()["counters"]
+    assert counters["broker.product.batches"] == 1
+    assert "broker.product.batch_fallbacks" not in counters
+
+
+@pytest.mark.asyncio
+async def test_batch_cache_writes_applied_after_commit(file_engine):
+    """
+    Тест записей в кэш из обработчиков пакета
+
+    Проверяет:
+    - До COMMIT пакета запись обработчика не попадает в Redis
+    - После COMMIT затронутые ключи сбрасываются
+    - Ключи сообщения, изменения которого не зафиксированы, остаются прежними
+    """
+    names = ["a", "poison", "b"]
+    keys = {name: f"product:batch-cache-{name}" for name in names}
+    seen_in_redis = []
+
+    async def handler(session, name):
+        if name == "poison":
+            (await session.connection()).info["fail_commit"] = True
+        await add_product(session, name)
+        await redis_client.set_json(keys[name], {"name": "новое"}, expire=60)
+        seen_in_redis.append(await redis_client.get_json(keys[name]))
+
+    original_commit = AsyncConnection.commit
+
+    async def commit(self):
+        if self.info.pop("fail_commit", False):
+            await self.rollback()
+            raise RuntimeError("commit failed")
+        await original_commit(self)
+
+    for key in keys.values():
+        await redis_client.set_json(key, {"name": "старое"}, expire=60)
+    batches = BatchConsumer("test", handler, file_engine, max_size=3, max_wait=10)
+    try:
+        with patch.object(AsyncConnection, "commit", commit):
+            await asyncio.gather(*(batches.submit(name) for name in names), return_exceptions=True)
+
+        assert all(value == {"name": "старое"} for value in seen_in_redis)
+        assert await redis_client.get_json(keys["a"]) is None
+        assert await redis_client.get_json(keys["b"]) is None
+        assert await redis_client.get_json(keys["poison"]) == {"name": "старое"}
+    finally:
+        await redis_client.delete_many(keys.values())
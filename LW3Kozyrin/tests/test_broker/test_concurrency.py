@@ -0,0 +1,69 @@
+"""
+Тесты ограничения одновременной обработки сообщений
+"""
+import asyncio
+import pytest
+from unittest.mock import patch
+from faststream.rabbit import TestRabbitBroker
+from app.broker import rabbitmq_broker
+from app.broker.concurrency import WorkerPool
+from app.metrics import metrics
+
+
+@pytest.mark.asyncio
+async def test_worker_pool_limits_concurrency():
+    """
+    Тест пула обработчиков
+
+    Проверяет:
+    - Одновременно работает не больше limit обработчиков
+    - Ожидание места учитывается в метрике wait, stats отражает занятые и ожидающие места
+    """
+    pool = WorkerPool("test", 2)
+    running = 0
+    peak = 0
+    snapshots = []
+
+    async def work():
+        nonlocal running, peak
+        async with pool:
+            running += 1
+            peak = max(peak, running)
+            snapshots.append(pool.stats())
+            await asyncio.sleep(0.01)
+            running -= 1
+
+    await asyncio.gather(*(work() for _ in range(6)))
+
+    assert peak == 2
+    assert snapshots[0] == {"limit": 2, "in_flight": 1, "waiting": 0}
+    assert any(snapshot["waiting"] > 0 for snapshot in snapshots)
+    assert pool.stats() == {"limit": 2, "in_flight": 0, "waiting": 0}
+    wait = metrics.snapshot()["latency"]["broker.test.wait"]
+    assert wait["count"] == 6
+    assert wait["max_ms"] >= 10
+
+
+@pytest.mark.asyncio
+async def test_subscriber_respects_worker_pool():
+    """Тест: подписчик обрабатывает сообщения не больше чем в limit обработчиков"""
+    running = 0
+    peak = 0
+
+    async def handler(session, message):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+
+    pools = {"product": WorkerPool("product", 3), "order": WorkerPool("order", 3)}
+    message = {"action": "create", "name": "Товар", "price": 1.0, "stock_quantity": 1}
+    with patch.object(rabbitmq_broker, "worker_pools", pools), \
+            patch.object(rabbitmq_broker, "product_batches", None), \
+            patch.object(rabbitmq_broker, "handle_product_message", handler):
+        async with TestRabbitBroker(rabbitmq_broker.broker) as broker:
+            await asyncio.gather(*(broker.publish(message, "product") for _ in range(10)))
+
+    assert peak == 3
+    assert metrics.snapshot()["latency"]["broker.product.wait"]["count"] == 10
@@ -0,0 +1,205 @@
+"""
+Тесты идемпотентной обработки сообщений брокера
+
+Используется запущенный Redis (REDIS_URL): ключи сообщений захватываются в нем
+"""
+import asyncio
+import uuid
+import pytest
+import pytest_asyncio
+from unittest.mock import AsyncMock, Mock, patch
+from faststream.rabbit import TestRabbitBroker
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import async_sessionmaker, AsyncSession
+from app.broker import rabbitmq_broker
+from app.broker.idempotency import MessageDeduplicator
+from app.broker.retry import RetryPolicy, RETRY_COUNT_HEADER
+from app.cache.redis_client import redis_client
+from app.metrics import metrics
+from app.models import User, Address, Order
+from app.models.product import Product
+
+
+@pytest_asyncio.fixture
+async def factory(engine):
+    """Фабрика сессий брокера на тестовой БД"""
+    factory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    with patch.object(rabbitmq_broker, "async_session_factory", factory), \
+            patch.object(rabbitmq_broker, "order_batches", None), \
+            patch.object(rabbitmq_broker, "product_batches", None):
+        yield factory
+
+
+@pytest_asyncio.fixture
+async def order_message(test_session):
+    """Сообщение create для заказа одного товара (на складе 10 штук)"""
+    user = User(username="buyer", email="buyer@example.com")
+    product = Product(name="Товар", price=100.0, stock_quantity=10)
+    test_session.add_all([user, product])
+    await test_session.flush()
+    address = Address(street="ул. Тестовая, 1", city="Москва", zip_code="123456", country="Russia", user_id=user.id)
+    test_session.add(address)
+    await test_session.commit()
+    return {
+        "action": "create",
+        "message_id": uuid.uuid4().hex,
+        "user_id": user.id,
+        "address_id": address.id,
+        "items": [{"product_id": product.id, "quantity": 3}],
+    }
+
+
+async def orders_and_stock(factory):
+    """Количество заказов и остаток товара"""
+    async with factory() as session:
+        orders = (await session.execute(select(func.count(Order.id)))).scalar_one()
+        stock = (await session.execute(select(Product.stock_quantity))).scalar_one()
+    return orders, stock
+
+
+@pytest.mark.asyncio
+async def test_redelivered_order_is_skipped(factory, order_message):
+    """
+    Тест повторной доставки сообщения create для заказа
+
+    Проверяет:
+    - Повтор с тем же message_id отбрасывается ключом в Redis
+    - После истечения ключа в Redis повтор отсекает запись в processed_messages
+    - Заказ создается и товар списывается один раз
+    """
+    async with TestRabbitBroker(rabbitmq_broker.broker) as broker:
+        await broker.publish(order_message, "order")
+        await broker.publish(order_message, "order")
+        assert await orders_and_stock(factory) == (1, 7)
+
+        redis = await redis_client.client()
+        await redis.delete(rabbitmq_broker.deduplicators["order"].key(order_message["message_id"]))
+        await broker.publish(order_message, "order")
+
+        await broker.publish({**order_message, "message_id": None}, "order")
+
+    assert await orders_and_stock(factory) == (2, 4)
+    assert metrics.snapshot()["counters"]["broker.order.duplicates"] == 2
+
+
+@pytest.mark.asyncio
+async def test_failed_message_releases_claim(factory):
+    """Тест: ключ сообщения, обработка которого не удалась, снимается в Redis и не пишется в БД"""
+    calls = []
+
+    async def handler(session, message):
+        calls.append(message.message_id)
+        raise RuntimeError("сбой обработчика")
+
+    message = {"action": "create", "message_id": uuid.uuid4().hex, "name": "Товар", "price": 1.0, "stock_quantity": 1}
+    with patch.object(rabbitmq_broker, "handle_product_message", handler), \
+            patch.object(RetryPolicy, "retry", AsyncMock()):
+        async with TestRabbitBroker(rabbitmq_broker.broker) as broker:
+            await broker.publish(message, "product")
+            await broker.publish(message, "product")
+
+    assert len(calls) == 2
+    redis = await redis_client.client()
+    assert not await redis.exists(rabbitmq_broker.deduplicators["product"].key(message["message_id"]))
+
+
+def product_message():
+    """Сообщение create для продукта с новым message_id"""
+    return {"action": "create", "message_id": uuid.uuid4().hex, "name": "Товар", "price": 1.0, "stock_quantity": 1}
+
+
+@pytest.mark.asyncio
+async def test_processed_message_marked_done_after_commit(factory):
+    """Тест: после обработки отметка "обрабатывается" заменяется долгоживущим ключом обработанного сообщения"""
+    deduplicator = rabbitmq_broker.deduplicators["product"]
+    message = product_message()
+    redis = await redis_client.client()
+    states = []
+
+    async def handler(session, message):
+        states.append(await redis.get(deduplicator.key(message.message_id)))
+
+    with patch.object(rabbitmq_broker, "handle_product_message", handler):
+        async with TestRabbitBroker(rabbitmq_broker.broker) as broker:
+            await broker.publish(message, "product")
+
+    key = deduplicator.key(message["message_id"])
+    assert states == [b"processing"]
+    assert await redis.get(key) == b"done"
+    assert await redis.ttl(key) > deduplicator.processing_ttl
+
+
+@pytest.mark.asyncio
+async def test_message_in_progress_is_postponed(factory):
+    """
+    Тест повторной доставки сообщения, которое еще обрабатывается
+
+    Проверяет:
+    - Сообщение не обрабатывается и не отбрасывается, а откладывается
+    - Отсрочка не расходует попытку: счетчик x-retry-count не меняется
+    - Отметка "обрабатывается" другого обработчика не снимается
+    """
+    deduplicator = rabbitmq_broker.deduplicators["product"]
+    message = product_message()
+    key = deduplicator.key(message["message_id"])
+    redis = await redis_client.client()
+    await redis.set(key, "processing", ex=60)
+    handler = AsyncMock()
+    retry = AsyncMock()
+    publisher = Mock(publish=AsyncMock())
+
+    try:
+        with patch.object(rabbitmq_broker, "handle_product_message", handler), \
+                patch.object(RetryPolicy, "retry", retry):
+            async with TestRabbitBroker(rabbitmq_broker.broker) as broker:
+                with patch.object(rabbitmq_broker, "broker", publisher):
+                    for _ in range(10):
+                        await broker.publish(message, "product", headers={RETRY_COUNT_HEADER: 1})
+
+        handler.assert_not_awaited()
+        retry.assert_not_awaited()
+        assert publisher.publish.await_count == 10
+        for call in publisher.publish.await_args_list:
+            assert call.args[1].name == rabbitmq_broker.retry_policies["product"].retry_queue(1).name
+            assert call.kwargs["headers"][RETRY_COUNT_HEADER] == 1
+        assert await redis.get(key) == b"processing"
+        counters = metrics.snapshot()["counters"]
+        assert counters["broker.product.postponed"] == 10
+        assert "broker.product.duplicates" not in counters
+    finally:
+        await redis.delete(key)
+
+
+@pytest.mark.asyncio
+async def test_cancelled_message_releases_claim(factory):
+    """Тест: отметка сообщения, обработка которого прервана, снимается, и сообщение не теряется"""
+    async def handler(session, message):
+        raise asyncio.CancelledError()
+
+    message = product_message()
+    with patch.object(rabbitmq_broker, "handle_product_message", handler):
+        async with TestRabbitBroker(rabbitmq_broker.broker) as broker:
+            with pytest.raises(asyncio.CancelledError):
+                await broker.publish(message, "product")
+
+    redis = await redis_client.client()
+    assert not await redis.exists(rabbitmq_broker.deduplicators["product"].key(message["message_id"]))
+
+
+@pytest.mark.asyncio
+async def test_wrap_batch_skips_processed_messages(test_session):
+    """Тест: обработчик пакета получает только сообщения, ключи которых еще не записаны"""
+    deduplicator = MessageDeduplicator("product", ttl=60)
+    received = []
+
+    async def handler(session, messages):
+        received.append([message.message_id for message in messages])
+
+    messages = [
+        rabbitmq_broker.ProductMessage(action="create", message_id=message_id)
+        for message_id in ("a", "b", None)
+    ]
+    assert await deduplicator.record(test_session, "a")
+    await deduplicator.wrap_batch(handler)(test_session, messages)
+
+    assert received == [["b", None]]
@@ -0,0 +1,127 @@
+"""
+Тесты повторной обработки сообщений брокера и очереди недоставленных
+"""
+import json
+import pytest
+from unittest.mock import AsyncMock, Mock, patch
+from faststream.rabbit import TestRabbitBroker
+from faststream.rabbit.message import RabbitMessage
+from app.broker import rabbitmq_broker
+from app.broker.retry import RetryPolicy, RETRY_COUNT_HEADER, LAST_ERROR_HEADER
+from app.metrics import metrics
+from app.schemas.message_schema import ProductMessage
+
+
+@pytest.mark.asyncio
+async def test_retry_backoff_and_dead_letter():
+    """
+    Тест повторов с экспоненциальной задержкой
+
+    Проверяет:
+    - Каждый повтор публикуется в очередь задержки base * 2^(n-1), но не больше max_delay
+    - Очереди задержки возвращают сообщение в исходную очередь по истечении TTL
+    - Счетчик попыток передается в заголовке, после max_attempts сообщение уходит в DLQ
+    """
+    broker = Mock(publish=AsyncMock())
+    policy = RetryPolicy("product", max_attempts=5, base_delay=1, max_delay=3)
+    message = ProductMessage(action="create", name="Товар", price=1.0, stock_quantity=1)
+    error = RuntimeError("база недоступна")
+
+    for retries in range(5):
+        await policy.retry(broker, message, {RETRY_COUNT_HEADER: retries, "trace": "t-1"}, error)
+
+    targets = [
+        (call.args[1].name, call.kwargs["headers"][RETRY_COUNT_HEADER])
+        for call in broker.publish.call_args_list
+    ]
+    assert targets == [
+        ("product.retry.1000", 1), ("product.retry.2000", 2), ("product.retry.3000", 3),
+        ("product.retry.3000", 4), ("product.dlq", 5),
+    ]
+    body, _ = broker.publish.call_args.args
+    headers = broker.publish.call_args.kwargs["headers"]
+    assert body == {"action": "create", "name": "Товар", "price": 1.0, "stock_quantity": 1}
+    assert headers["trace"] == "t-1"
+    assert headers[LAST_ERROR_HEADER] == "RuntimeError: база недоступна"
+
+    assert policy.retry_queue(1).arguments.items() >= {
+        "x-message-ttl": 1000, "x-dead-letter-exchange": "", "x-dead-letter-routing-key": "product"
+    }.items()
+    assert [queue.name for queue in policy.queues()] == [
+        "product.retry.1000", "product.retry.2000", "product.retry.3000", "product.dlq"
+    ]
+    counters = metrics.snapshot()["counters"]
+    assert counters["broker.product.retries"] == 4
+    assert counters["broker.product.dead_lettered"] == 1
+
+
+@pytest.mark.asyncio
+async def test_failed_message_is_retried_with_headers():
+    """Тест: подписчик передает неудачное сообщение на повтор с заголовками полученного сообщения"""
+    async def handler(session, message):
+        raise RuntimeError("сбой обработчика")
+
+    policy = RetryPolicy("product")
+    message = {"action": "create", "name": "Товар", "price": 1.0, "stock_quantity": 1}
+    with patch.object(rabbitmq_broker, "product_batches", None), \
+            patch.object(rabbitmq_broker, "handle_product_message", handler), \
+            patch.object(rabbitmq_broker, "retry_policies", {"product": policy}), \
+            patch.object(policy, "retry", AsyncMock()) as retry:
+        async with TestRabbitBroker(rabbitmq_broker.broker) as broker:
+            await broker.publish(message, "product", headers={RETRY_COUNT_HEADER: 2})
+
+    retry.assert_awaited_once()
+    _, received, headers, error = retry.await_args.args
+    assert received.name == "Товар"
+    assert policy.retry_count(headers) == 2
+    assert str(error) == "сбой обработчика"
+
+
+@pytest.mark.asyncio
+async def test_invalid_message_is_dead_lettered():
+    """
+    Тест сообщения, которое не проходит валидацию
+
+    Проверяет:
+    - Обработчик не вызывается, сообщение без изменений публикуется в product.dlq
+    - В заголовках передается ошибка валидации, полученное сообщение подтверждается
+    """
+    handler = AsyncMock()
+    publisher = Mock(publish=AsyncMock())
+    with patch.object(rabbitmq_broker, "handle_product_message", handler), \
+            patch.object(RabbitMessage, "ack", AsyncMock()) as ack, \
+            patch.object(RabbitMessage, "nack", AsyncMock()) as nack:
+        async with TestRabbitBroker(rabbitmq_broker.broker) as broker:
+            with patch.object(rabbitmq_broker, "broker", publisher):
+                await broker.publish({"action": "create", "price": "дорого"}, "product", headers={"trace": "t-1"})
+
+    handler.assert_not_awaited()
+    body, queue = publisher.publish.await_args.args
+    headers = publisher.publish.await_args.kwargs["headers"]
+    assert queue.name == "product.dlq"
+    assert json.loads(body) == {"action": "create", "price": "дорого"}
+    assert headers["trace"] == "t-1"
+    assert headers[LAST_ERROR_HEADER].startswith("ValidationError")
+    ack.assert_awaited_once()
+    nack.assert_not_awaited()
+    assert metrics.snapshot()["counters"]["broker.product.dead_lettered"] == 1
+
+
+@pytest.mark.asyncio
+async def test_failed_retry_publish_requeues_message():
+    """Тест: если повтор не удалось опубликовать, сообщение возвращается в очередь"""
+    async def handler(session, message):
+        raise RuntimeError("сбой обработчика")
+
+    publisher = Mock(publish=AsyncMock(side_effect=ConnectionError("RabbitMQ недоступен")))
+    message = {"action": "create", "name": "Товар", "price": 1.0, "stock_quantity": 1}
+    with patch.object(rabbitmq_broker, "product_batches", None), \
+            patch.object(rabbitmq_broker, "handle_product_message", handler), \
+            patch.object(RabbitMessage, "nack", AsyncMock()) as nack, \
+            patch.object(RabbitMessage, "reject", AsyncMock()) as reject:
+        async with TestRabbitBroker(rabbitmq_broker.broker) as broker:
+            with patch.object(rabbitmq_broker, "broker", publisher):
+                await broker.publish(message, "product")
+
+    nack.assert_awaited_once_with(requeue=True)
+    reject.assert_not_awaited()
@@ -0,0 +1,54 @@
+"""
+Тесты сессии БД обработчика сообщений
+"""
+import pytest
+from unittest.mock import AsyncMock, patch
+from faststream.rabbit import TestRabbitBroker
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, AsyncSession
+from app.broker import rabbitmq_broker
+from app.broker.retry import RetryPolicy
+from app.models.product import Product
+
+
+@pytest.mark.asyncio
+async def test_message_session_is_rolled_back_and_closed(engine):
+    """
+    Тест жизненного цикла сессии сообщения
+
+    Проверяет:
+    - Незафиксированные изменения обработчика с ошибкой откатываются
+    - Сессия каждого сообщения закрывается, соединения возвращаются в пул
+    """
+    sessions = []
+    pool_events = []
+    event.listen(engine.sync_engine, "checkout", lambda *args: pool_events.append("checkout"))
+    event.listen(engine.sync_engine, "checkin", lambda *args: pool_events.append("checkin"))
+
+    async def handler(session, message):
+        sessions.append(session)
+        session.add(Product(name=message.name, price=message.price, stock_quantity=1))
+        await session.flush()
+        if message.name == "Ошибка":
+            raise RuntimeError("сбой обработчика")
+        await session.commit()
+
+    factory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    messages = [
+        {"action": "create", "name": name, "price": 1.0, "stock_quantity": 1}
+        for name in ("Товар", "Ошибка")
+    ]
+    with patch.object(rabbitmq_broker, "async_session_factory", factory), \
+            patch.object(rabbitmq_broker, "product_batches", None), \
+            patch.object(rabbitmq_broker, "handle_product_message", handler), \
+            patch.object(RetryPolicy, "retry", AsyncMock()):
+        async with TestRabbitBroker(rabbitmq_broker.broker) as broker:
+            for message in messages:
+                await broker.publish(message, "product")
+
+    assert len(sessions) == 2
+    assert not any(session.in_transaction() for session in sessions)
+    assert pool_events.count("checkout") == pool_events.count("checkin") == 2
+    async with factory() as session:
+        names = (await session.execute(select(Product.name))).scalars().all()
+    assert names == ["Товар"]
@@ -0,0 +1,63 @@
+"""
+Тесты для кодеков сериализации кэша
+
+Проверяются кодирование с тегом, чтение значений без тега
+и совместное чтение значений, записанных разными кодеками
+"""
+import pytest
+from app.cache import codecs
+from app.cache.redis_client import RedisClient
+
+PRODUCT = {"id": 1, "name": "Ноутбук ASUS", "price": 75000.0, "stock_quantity": 10}
+
+
+@pytest.mark.parametrize("name", ["json", "orjson", "msgpack"])
+def test_codec_roundtrip(name):
+    """Тест сериализации и десериализации каждым кодеком"""
+    try:
+        codec = codecs.get_codec(name)
+    except ValueError:
+        pytest.skip(f"Кодек {name} не установлен")
+
+    payload = codec.dumps(PRODUCT)
+
+    assert payload.startswith(codec.tag + codecs.TAG_SEPARATOR)
+    assert codecs.loads(payload) == PRODUCT
+
+
+def test_loads_untagged_json():
+    """Тест чтения значения, записанного до появления кодеков"""
+    assert codecs.loads(b'{"id": 1, "name": "a|b"}') == {"id": 1, "name": "a|b"}
+
+
+def test_loads_unknown_tag():
+    """Тест значения с неизвестным тегом: считается промахом кэша"""
+    assert codecs.loads(b"z9|garbage") is None
+
+
+def test_unknown_codec_name():
+    """Тест ошибки при неизвестном имени кодека"""
+    with pytest.raises(ValueError):
+        codecs.get_codec("pickle")
+
+
+@pytest.mark.asyncio
+async def test_switch_codec_keeps_cache_readable(monkeypatch):
+    """Тест чтения значения, записанного другим кодеком"""
+    monkeypatch.setenv("CACHE_CODEC", "json")
+    old_client = RedisClient()
+    await old_client.set_json("test:codec:1", PRODUCT, expire=60)
+
+    monkeypatch.setenv("CACHE_CODEC", "msgpack")
+    try:
+        new_client = RedisClient()
+    except ValueError:
+        await old_client.disconnect()
+        pytest.skip("Кодек msgpack не установлен")
+
+    try:
+        assert await new_client.get_json("test:codec:1") == PRODUCT
+    finally:
+        await old_client.delete("test:codec:1")
+        await old_client.disconnect()
+        await new_client.disconnect()
@@ -0,0 +1,114 @@
+"""
+Тесты для локального кэша первого уровня
+
+Проверяются LRU-вытеснение, ограничения по размеру, TTL,
+статистика по префиксам и инвалидация между процессами через pub/sub
+"""
+import asyncio
+import pytest
+from app.cache.local_cache import LocalCache
+from app.cache.redis_client import RedisClient
+
+
+def test_lru_eviction_by_items():
+    """Тест вытеснения самой старой записи при превышении количества"""
+    cache = LocalCache(max_items=2, max_bytes=1000, ttl=60)
+    cache.set("product:1", {"id": 1}, size=10)
+    cache.set("product:2", {"id": 2}, size=10)
+    cache.get("product:1")
+    cache.set("product:3", {"id": 3}, size=10)
+
+    assert "product:1" in cache
+    assert "product:2" not in cache
+    assert cache.stats()["prefixes"]["product"]["evictions"] == 1
+
+
+def test_eviction_by_bytes():
+    """Тест вытеснения при превышении суммарного размера"""
+    cache = LocalCache(max_items=100, max_bytes=25, ttl=60)
+    cache.set("user:1", {"id": 1}, size=10)
+    cache.set("user:2", {"id": 2}, size=10)
+    cache.set("user:3", {"id": 3}, size=10)
+
+    assert len(cache) == 2
+    assert cache.stats()["bytes"] == 20
+
+    cache.set("user:big", {"id": 4}, size=100)
+    assert "user:big" not in cache
+
+
+def test_ttl_expiration():
+    """Тест истечения TTL записи"""
+    cache = LocalCache(ttl=60)
+    cache.set("product:1", {"id": 1}, size=10, ttl=0)
+
+    assert cache.get("product:1") is None
+    assert len(cache) == 0
+
+
+def test_stats_per_prefix():
+    """Тест счетчиков попаданий и промахов по префиксам"""
+    cache = LocalCache()
+    cache.set("product:1", {"id": 1}, size=10)
+    cache.get("product:1")
+    cache.get("product:2")
+    cache.get("user:1")
+
+    prefixes = cache.stats()["prefixes"]
+    assert prefixes["product"] == {"hits": 1, "misses": 1, "evictions": 0}
+    assert prefixes["user"] == {"hits": 0, "misses": 1, "evictions": 0}
+
+
+@pytest.mark.asyncio
+async def test_invalidation_between_clients():
+    """Тест инвалидации локального кэша другого процесса через pub/sub"""
+    writer = RedisClient()
+    reader = RedisClient()
+    await reader.start_invalidation_listener()
+    try:
+        await writer.set_json("product:test-l1", {"id": 1, "name": "Старое"}, expire=60)
+        assert (await reader.get_json("product:test-l1"))["name"] == "Старое"
+        assert "product:test-l1" in reader.local_cache
+
+        await writer.set_json("product:test-l1", {"id": 1, "name": "Новое"}, expire=60)
+        for _ in range(50):
+            if "product:test-l1" not in reader.local_cache:
+                break
+            await asyncio.sleep(0.01)
+
+        assert (await reader.get_json("product:test-l1"))["name"] == "Новое"
+    finally:
+        await writer.delete("product:test-l1")
+        await reader.disconnect()
+        await writer.disconnect()
+
+
+@pytest.mark.asyncio
+async def test_listener_recovers_after_redis_unavailable():
+    """
+    Тест запуска без Redis
+
+    Проверяет:
+    - Недоступный Redis при подписке дает ошибку, локальный кэш отключен
+    - Фоновая задача восстанавливает подписку, когда Redis становится доступен
+    """
+    client = RedisClient()
+    redis_url, client.redis_url = client.redis_url, "redis://127.0.0.1:1/0"
+    client.resubscribe_interval = 0.01
+    try:
+        with pytest.raises(Exception):
+            await client.start_invalidation_listener()
+        client.keep_invalidation_listener()
+        await asyncio.sleep(0.05)
+        assert not client.local_cache_active
+
+        await client.disconnect()
+        client.redis_url = redis_url
+        client.keep_invalidation_listener()
+        for _ in range(50):
+            if client.local_cache_active:
+                break
+            await asyncio.sleep(0.01)
+        assert client.local_cache_active
+    finally:
+        await client.disconnect()
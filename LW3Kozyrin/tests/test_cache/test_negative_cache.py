@@ -0,0 +1,86 @@
+"""
+Тесты кэширования отсутствующих объектов (negative caching)
+
+Проверяются запись-маркер для промахов, счетчик попаданий в нее
+и снятие маркера при создании объекта
+"""
+import pytest
+from app.cache.redis_client import RedisClient, redis_client
+from app.schemas.product_schema import ProductCreate
+from app.schemas.user_schema import UserCreate
+
+
+@pytest.mark.asyncio
+async def test_missing_object_is_cached():
+    """Тест: повторные запросы отсутствующего объекта не доходят до источника"""
+    key = "test:negative:1"
+    client = RedisClient()
+    calls = 0
+
+    async def load():
+        nonlocal calls
+        calls += 1
+        return None
+
+    try:
+        for _ in range(3):
+            assert await client.get_or_load_json(key, load, expire=60, negative_expire=30) is None
+        assert calls == 1
+        assert client.negative_cache_stats() == {"test": 2}
+        assert 0 < await client.get_ttl(key) <= 30
+        assert await client.get_json(key) is None
+    finally:
+        await client.delete(key)
+        await client.disconnect()
+
+
+@pytest.mark.asyncio
+async def test_missing_object_without_negative_ttl():
+    """Тест: без negative_expire промахи не кэшируются"""
+    key = "test:negative:2"
+    client = RedisClient()
+    calls = 0
+
+    async def load():
+        nonlocal calls
+        calls += 1
+        return None
+
+    try:
+        await client.get_or_load_json(key, load, expire=60)
+        await client.get_or_load_json(key, load, expire=60)
+        assert calls == 2
+    finally:
+        await client.disconnect()
+
+
+@pytest.mark.asyncio
+async def test_create_product_clears_tombstone(test_session, product_repository):
+    """Тест: создание продукта снимает запись об его отсутствии"""
+    await redis_client.delete("product:1")
+    assert await product_repository.get_by_id(test_session, 1) is None
+
+    product = await product_repository.create(
+        test_session,
+        ProductCreate(name="Новый товар", price=100.0, stock_quantity=1)
+    )
+    found = await product_repository.get_by_id(test_session, product.id)
+
+    assert found is not None
+    assert found.name == "Новый товар"
+
+
+@pytest.mark.asyncio
+async def test_create_user_clears_tombstone(test_session, user_repository):
+    """Тест: создание пользователя снимает запись об его отсутствии"""
+    await redis_client.delete("user:1")
+    assert await user_repository.get_by_id(test_session, 1) is None
+
+    user = await user_repository.create(
+        test_session,
+        UserCreate(username="newcomer", email="newcomer@example.com")
+    )
+    found = await user_repository.get_by_id(test_session, user.id)
+
+    assert found is not None
+    assert found.username == "newcomer"
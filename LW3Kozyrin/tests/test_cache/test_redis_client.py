@@ -0,0 +1,50 @@
+"""
+Тесты для клиента Redis
+
+Проверяются пакетные операции get_many_json / set_many_json / delete_many
+"""
+import pytest
+from app.cache.redis_client import redis_client
+
+
+@pytest.mark.asyncio
+async def test_set_many_and_get_many_json():
+    """Тест пакетной записи и чтения JSON объектов"""
+    values = {f"test:bulk:{i}": {"id": i, "name": f"Товар {i}"} for i in range(5)}
+
+    assert await redis_client.set_many_json(values, expire=60)
+    found = await redis_client.get_many_json(list(values) + ["test:bulk:missing"])
+
+    assert found == values
+    await redis_client.delete_many(values)
+
+
+@pytest.mark.asyncio
+async def test_set_many_json_per_key_ttl():
+    """Тест индивидуального TTL для каждого ключа"""
+    values = {"test:ttl:short": {"id": 1}, "test:ttl:long": {"id": 2}}
+
+    await redis_client.set_many_json(values, expire={"test:ttl:short": 10, "test:ttl:long": 100})
+
+    assert 0 < await redis_client.get_ttl("test:ttl:short") <= 10
+    assert 10 < await redis_client.get_ttl("test:ttl:long") <= 100
+    await redis_client.delete_many(values)
+
+
+@pytest.mark.asyncio
+async def test_delete_many():
+    """Тест пакетного удаления ключей"""
+    await redis_client.set_many_json({"test:del:1": {"id": 1}, "test:del:2": {"id": 2}})
+
+    deleted = await redis_client.delete_many(["test:del:1", "test:del:2", "test:del:3"])
+
+    assert deleted == 2
+    assert await redis_client.get_many_json(["test:del:1", "test:del:2"]) == {}
+
+
+@pytest.mark.asyncio
+async def test_bulk_operations_with_empty_keys():
+    """Тест пакетных операций с пустым набором ключей"""
+    assert await redis_client.get_many_json([]) == {}
+    assert await redis_client.set_many_json({})
+    assert await redis_client.delete_many([]) == 0
@@ -0,0 +1,144 @@
+"""
+Тесты защиты от cache stampede
+
+Проверяются single-flight внутри процесса, блокировка загрузки
+между процессами и досрочное обновление значения
+"""
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, patch
+from app.cache.redis_client import RedisClient, redis_client
+from app.cache.single_flight import SingleFlight
+
+
+@pytest.mark.asyncio
+async def test_single_flight_coalesces_calls():
+    """Тест объединения одновременных вызовов с одним ключом"""
+    single_flight = SingleFlight()
+    calls = 0
+
+    async def load():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return calls
+
+    results = await asyncio.gather(*(single_flight.do("key", load) for _ in range(20)))
+
+    assert calls == 1
+    assert results == [1] * 20
+    assert len(single_flight) == 0
+
+
+@pytest.mark.asyncio
+async def test_single_flight_propagates_errors():
+    """Тест передачи исключения всем ожидающим"""
+    single_flight = SingleFlight()
+
+    async def load():
+        await asyncio.sleep(0.01)
+        raise ValueError("ошибка загрузки")
+
+    results = await asyncio.gather(
+        *(single_flight.do("key", load) for _ in range(3)),
+        return_exceptions=True
+    )
+
+    assert all(isinstance(r, ValueError) for r in results)
+
+
+@pytest.mark.asyncio
+async def test_get_or_load_json_loads_once_across_clients():
+    """Тест: при промахе в нескольких процессах загрузка выполняется один раз"""
+    key = "test:stampede:1"
+    clients = [RedisClient() for _ in range(3)]
+    calls = 0
+
+    async def load():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.1)
+        return {"id": 1}
+
+    await redis_client.delete_many([key, f"lock:{key}"])
+    try:
+        results = await asyncio.gather(*(
+            client.get_or_load_json(key, load, expire=60)
+            for client in clients
+            for _ in range(10)
+        ))
+    finally:
+        await redis_client.delete(key)
+        for client in clients:
+            await client.disconnect()
+
+    assert calls == 1
+    assert all(r == {"id": 1} for r in results)
+
+
+@pytest.mark.asyncio
+async def test_get_or_load_json_refreshes_early():
+    """Тест досрочного обновления значения перед истечением TTL"""
+    key = "test:stampede:early"
+    client = RedisClient()
+    calls = 0
+
+    async def load():
+        nonlocal calls
+        calls += 1
+        return {"version": calls}
+
+    try:
+        await client.get_or_load_json(key, load, expire=60)
+        assert await client.get_or_load_json(key, load, expire=60, beta=0) == {"version": 1}
+
+        # Загрузка "длится" дольше оставшегося TTL - обновление неизбежно
+        client._load_times["test"] = 3600
+        assert await client.get_or_load_json(key, load, expire=60) == {"version": 2}
+    finally:
+        await client.delete(key)
+        await client.disconnect()
+
+
+@pytest.mark.asyncio
+async def test_lock_of_another_owner_is_not_released():
+    """Тест: блокировка, истекшая во время загрузки и захваченная другим процессом, не снимается"""
+    key = "test:stampede:lock-owner"
+    lock_key = f"lock:{key}"
+    client = RedisClient()
+
+    async def load():
+        await redis_client.set(lock_key, "other", expire=60)
+        return {"id": 1}
+
+    await redis_client.delete_many([key, lock_key])
+    try:
+        assert await client.get_or_load_json(key, load, expire=60) == {"id": 1}
+        assert await redis_client.get(lock_key) == "other"
+    finally:
+        await redis_client.delete_many([key, lock_key])
+        await client.disconnect()
+
+
+@pytest.mark.asyncio
+async def test_value_stored_before_lock_is_not_reloaded():
+    """Тест: значение, записанное другим процессом перед захватом блокировки, не загружается заново"""
+    key = "test:stampede:reread"
+    client = RedisClient()
+    calls = 0
+
+    async def load():
+        nonlocal calls
+        calls += 1
+        return {"id": 2}
+
+    # Промах видим до захвата блокировки, а значение уже записано другим процессом
+    await redis_client.set_json(key, {"id": 1}, expire=60)
+    try:
+        with patch.object(client, "_get_with_ttl", AsyncMock(return_value=(None, -2))):
+            assert await client.get_or_load_json(key, load, expire=60) == {"id": 1}
+        assert calls == 0
+        assert not await redis_client.exists(f"lock:{key}")
+    finally:
+        await redis_client.delete(key)
+        await client.disconnect()
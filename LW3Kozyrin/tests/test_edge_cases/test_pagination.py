@@ -2,8 +2,13 @@
 Тесты пагинации
 
 Вопрос 5 из ЛР4: Тест для проверки пагинации товаров
+Keyset-пагинация по курсору (параметр after)
 """
 import pytest
+from datetime import date
+from app.models import User, Address, Order, Report
+from app.repositories.cursor import encode_cursor, next_cursor
+from app.repositories.report_repository import ReportRepository
 from app.schemas.product_schema import ProductCreate
 
 
@@ -155,3 +160,87 @@ async def test_product_pagination_with_large_count(test_session, product_reposit
     products = await product_repository.get_by_filter(test_session, count=100, page=1)
     
     assert len(products) == 5, "Должны вернуться все 5 продуктов"
+
+
+@pytest.mark.asyncio
+async def test_product_cursor_pagination(test_session, product_repository):
+    """
+    Тест keyset-пагинации продуктов по курсору
+
+    Проверяется, что обход страниц по next_cursor возвращает
+    все продукты по порядку без пропусков и повторов
+    """
+    for i in range(7):
+        await product_repository.create(
+            test_session,
+            ProductCreate(name=f"Товар {i}", price=100.0, stock_quantity=1)
+        )
+
+    names = []
+    after = None
+    while True:
+        products = await product_repository.get_by_filter(test_session, count=3, after=after)
+        names.extend(p.name for p in products)
+        after = next_cursor(products, 3, "id")
+        if after is None:
+            break
+
+    assert names == [f"Товар {i}" for i in range(7)]
+
+
+@pytest.mark.asyncio
+async def test_cursor_matches_offset_pagination(test_session, product_repository):
+    """Тест: страница по курсору совпадает со страницей по номеру"""
+    for i in range(10):
+        await product_repository.create(
+            test_session,
+            ProductCreate(name=f"Товар {i}", price=100.0, stock_quantity=1)
+        )
+
+    first_page = await product_repository.get_by_filter(test_session, count=4, page=1)
+    by_page = await product_repository.get_by_filter(test_session, count=4, page=2)
+    by_cursor = await product_repository.get_by_filter(
+        test_session, count=4, after=next_cursor(first_page, 4, "id")
+    )
+
+    assert [p.id for p in by_cursor] == [p.id for p in by_page]
+
+
+@pytest.mark.asyncio
+async def test_invalid_cursor(test_session, product_repository):
+    """Тест: поврежденный курсор вызывает ValueError"""
+    with pytest.raises(ValueError):
+        await product_repository.get_by_filter(test_session, count=5, after="не-курсор")
+    with pytest.raises(ValueError):
+        await product_repository.get_by_filter(test_session, count=5, after=encode_cursor("abc"))
+
+
+@pytest.mark.asyncio
+async def test_report_cursor_pagination(test_session):
+    """Тест keyset-пагинации отчетов по (report_at, id) по убыванию"""
+    user = User(username="reporter", email="reporter@example.com")
+    test_session.add(user)
+    await test_session.flush()
+    address = Address(street="ул. Ленина", city="Москва", zip_code="123456", user_id=user.id)
+    test_session.add(address)
+    await test_session.flush()
+    orders = [Order(user_id=user.id, address_id=address.id) for _ in range(2)]
+    test_session.add_all(orders)
+    await test_session.flush()
+    for day, order in ((1, orders[0]), (1, orders[1]), (2, orders[0]), (3, orders[0]), (3, orders[1])):
+        test_session.add(Report(report_at=date(2024, 1, day), order_id=order.id, count_product=1))
+    await test_session.commit()
+
+    repository = ReportRepository()
+    expected = await repository.get_all(test_session, count=10, page=1)
+
+    collected = []
+    after = None
+    while True:
+        reports = await repository.get_all(test_session, count=2, after=after)
+        collected.extend(reports)
+        after = next_cursor(reports, 2, "report_at", "id")
+        if after is None:
+            break
+
+    assert [r.id for r in collected] == [r.id for r in expected]
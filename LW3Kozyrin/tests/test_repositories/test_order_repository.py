@@ -4,7 +4,8 @@
 Проверяются операции CRUD для заказов с поддержкой нескольких продуктов
 """
 import pytest
-from app.schemas.order_schema import OrderCreate, OrderUpdate, OrderItemCreate
+from sqlalchemy import event
+from app.schemas.order_schema import OrderCreate, OrderUpdate, OrderItemCreate, OrderResponse
 from app.schemas.user_schema import UserCreate
 from app.schemas.address_schema import AddressCreate
 from app.schemas.product_schema import ProductCreate
@@ -281,3 +282,65 @@ async def test_get_orders_with_pagination(
     
     total_count = await order_repository.get_total_count(test_session)
     assert total_count == 5
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("basket_size, cached", [(1, False), (20, False), (20, True)])
+async def test_create_order_query_count(
+    engine,
+    test_session,
+    order_repository,
+    user_repository,
+    address_repository,
+    product_repository,
+    basket_size,
+    cached
+):
+    """
+    Тест количества SQL-запросов при создании заказа
+
+    Проверяет, что создание заказа выполняет фиксированное число запросов
+    независимо от размера корзины: проверка пользователя и адреса,
+    загрузка продуктов, INSERT заказа, пакетный INSERT элементов
+    и запись заказа в отчет за день. Цены закэшированных продуктов
+    читаются из Redis, и запрос продуктов к БД не выполняется
+    """
+    user = await user_repository.create(
+        test_session, UserCreate(username="buyer", email="buyer@example.com")
+    )
+    address = await address_repository.create(
+        test_session,
+        AddressCreate(street="ул. Тестовая, 1", city="Москва", zip_code="123456", user_id=user.id)
+    )
+    products = [
+        await product_repository.create(
+            test_session, ProductCreate(name=f"Товар {i}", price=100.0, stock_quantity=10)
+        )
+        for i in range(basket_size)
+    ]
+    if cached:
+        await product_repository.cache_products(products)
+    order_data = OrderCreate(
+        user_id=user.id,
+        address_id=address.id,
+        items=[OrderItemCreate(product_id=p.id, quantity=2) for p in products]
+    )
+
+    statements = []
+
+    def count_statement(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine.sync_engine, "before_cursor_execute", count_statement)
+    try:
+        order = await order_repository.create(test_session, order_data)
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", count_statement)
+
+    assert len(statements) == (4 if cached else 5)
+    assert len(order.order_items) == basket_size
+    assert order.total_price == 200.0 * basket_size
+
+    response = OrderResponse.model_validate(order)
+    assert response.status == OrderStatus.PENDING
+    assert all(item.id is not None for item in response.order_items)
@@ -0,0 +1,32 @@
+"""
+Тесты для репозитория ключей идемпотентности сообщений брокера
+"""
+import pytest
+from datetime import datetime, timedelta
+from sqlalchemy import select
+from app.models import ProcessedMessage
+from app.repositories.processed_message_repository import ProcessedMessageRepository
+
+
+@pytest.mark.asyncio
+async def test_record_and_purge(test_session):
+    """
+    Тест записи и очистки ключей
+
+    Проверяет, что:
+    - Ключ записывается один раз в пределах очереди, в другой очереди он независим
+    - Очистка удаляет только ключи старше границы
+    """
+    repository = ProcessedMessageRepository()
+    assert await repository.record(test_session, "order", "m-1")
+    assert not await repository.record(test_session, "order", "m-1")
+    assert await repository.record(test_session, "product", "m-1")
+    await test_session.commit()
+
+    old = await test_session.get(ProcessedMessage, ("order", "m-1"))
+    old.processed_at = datetime.utcnow() - timedelta(days=30)
+    await test_session.commit()
+
+    assert await repository.purge(test_session, datetime.utcnow() - timedelta(days=7)) == 1
+    remaining = (await test_session.execute(select(ProcessedMessage.queue))).scalars().all()
+    assert remaining == ["product"]
@@ -4,6 +4,7 @@
 Проверяются операции CRUD для продуктов
 """
 import pytest
+from app.cache.redis_client import redis_client
 from app.schemas.product_schema import ProductCreate, ProductUpdate
 
 
@@ -97,3 +98,41 @@ async def test_delete_product(test_session, product_repository):
     
     found_product = await product_repository.get_by_id(test_session, product.id)
     assert found_product is None
+
+
+@pytest.mark.asyncio
+async def test_get_products_by_ids(test_session, product_repository):
+    """Тест получения нескольких продуктов по списку ID"""
+    created = [
+        await product_repository.create(
+            test_session,
+            ProductCreate(name=f"Пакетный товар {i}", price=100.0 * (i + 1), stock_quantity=i)
+        )
+        for i in range(3)
+    ]
+    ids = [p.id for p in created]
+
+    products = await product_repository.get_by_ids(test_session, ids + [99999])
+
+    assert set(products) == set(ids)
+    assert products[ids[1]].price == 200.0
+
+
+@pytest.mark.asyncio
+async def test_create_many_products(test_session, product_repository):
+    """Тест пакетного создания продуктов с прогревом кэша"""
+    product_repository.BULK_INSERT_BATCH_SIZE = 4
+    products_data = [
+        ProductCreate(name=f"Импорт {i}", price=10.0 + i, stock_quantity=i)
+        for i in range(10)
+    ]
+
+    products = await product_repository.create_many(test_session, products_data)
+
+    assert len(products) == 10
+    assert len({p.id for p in products}) == 10
+    assert await product_repository.get_total_count(test_session) == 10
+
+    cached = await redis_client.get_many_json(f"product:{p.id}" for p in products)
+    assert len(cached) == 10
+    assert sorted(c["name"] for c in cached.values()) == sorted(p.name for p in products_data)
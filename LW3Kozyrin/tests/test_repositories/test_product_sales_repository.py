@@ -0,0 +1,162 @@
+"""
+Тесты для репозитория свертки дневных продаж продуктов
+
+Проверяются инкрементальное обновление по водяному знаку, пересчет даты и топ продуктов
+"""
+import pytest
+import pytest_asyncio
+from datetime import date, datetime
+from unittest.mock import patch
+from sqlalchemy import select
+from app.models import User, Address, Order, ProductDailySales
+from app.models.order import OrderItem
+from app.models.product import Product
+from app.repositories.product_sales_repository import ProductSalesRepository
+from app.repositories.order_repository import OrderRepository
+
+
+async def create_order(session, customer, created_at, items):
+    """Создать заказ с позициями [(продукт, количество, цена)] на заданное время"""
+    user, address, _ = customer
+    order = Order(user_id=user.id, address_id=address.id, total_price=0.0, created_at=created_at)
+    session.add(order)
+    await session.flush()
+    session.add_all([
+        OrderItem(order_id=order.id, product_id=product.id, quantity=quantity, price_at_purchase=price)
+        for product, quantity, price in items
+    ])
+    await session.commit()
+    return order
+
+
+async def sales(session, sales_date):
+    """Свертка за дату в виде {product_id: (units, revenue)}"""
+    result = await session.execute(
+        select(ProductDailySales).where(ProductDailySales.sales_date == sales_date)
+    )
+    return {row.product_id: (row.units, row.revenue) for row in result.scalars()}
+
+
+@pytest_asyncio.fixture
+async def customer(test_session):
+    """Пользователь, адрес и три продукта"""
+    user = User(username="buyer", email="buyer@example.com")
+    test_session.add(user)
+    await test_session.flush()
+    address = Address(street="ул. Продажная, 1", city="Москва", zip_code="123456", country="Russia", user_id=user.id)
+    products = [Product(name=f"Товар {i}", price=10.0 * i, stock_quantity=100) for i in range(1, 4)]
+    test_session.add(address)
+    test_session.add_all(products)
+    await test_session.commit()
+    return user, address, products
+
+
+@pytest.mark.asyncio
+async def test_apply_new_orders_is_incremental(test_session, customer):
+    """
+    Тест инкрементального обновления свертки
+
+    Проверяет, что:
+    - Позиции группируются по дате заказа и продукту, выручка = цена покупки * количество
+    - Повторный запуск без новых заказов ничего не меняет
+    - Новые заказы прибавляются к существующим строкам
+    """
+    first, second, _ = customer[2]
+    repository = ProductSalesRepository()
+    await create_order(test_session, customer, datetime(2024, 5, 1, 10), [(first, 2, 10.0), (second, 1, 20.0)])
+    await create_order(test_session, customer, datetime(2024, 5, 1, 23, 59), [(first, 3, 12.0)])
+    last = await create_order(test_session, customer, datetime(2024, 5, 2, 0, 0), [(second, 4, 20.0)])
+
+    assert await repository.apply_new_orders(test_session) == (3, last.id)
+    assert await sales(test_session, date(2024, 5, 1)) == {first.id: (5, 56.0), second.id: (1, 20.0)}
+    assert await sales(test_session, date(2024, 5, 2)) == {second.id: (4, 80.0)}
+
+    assert await repository.apply_new_orders(test_session) == (0, last.id)
+    assert await sales(test_session, date(2024, 5, 1)) == {first.id: (5, 56.0), second.id: (1, 20.0)}
+
+    newest = await create_order(test_session, customer, datetime(2024, 5, 1, 12), [(first, 1, 10.0)])
+    assert await repository.apply_new_orders(test_session) == (1, newest.id)
+    assert await sales(test_session, date(2024, 5, 1)) == {first.id: (6, 66.0), second.id: (1, 20.0)}
+
+
+@pytest.mark.asyncio
+async def test_rebuild_for_date_respects_watermark(test_session, customer):
+    """
+    Тест пересчета свертки за дату
+
+    Проверяет, что:
+    - Пересчет исправляет расхождения в строках даты
+    - Заказы после водяного знака не учитываются и не задваиваются следующим обновлением
+    """
+    first, second, _ = customer[2]
+    repository = ProductSalesRepository()
+    day = date(2024, 5, 1)
+    await create_order(test_session, customer, datetime(2024, 5, 1, 10), [(first, 2, 10.0)])
+    await repository.apply_new_orders(test_session)
+
+    test_session.add(ProductDailySales(sales_date=day, product_id=second.id, units=99, revenue=1.0))
+    await test_session.commit()
+    await create_order(test_session, customer, datetime(2024, 5, 1, 11), [(first, 1, 10.0)])
+
+    assert await repository.rebuild_for_date(test_session, day) == 1
+    assert await sales(test_session, day) == {first.id: (2, 20.0)}
+
+    await repository.apply_new_orders(test_session)
+    assert await sales(test_session, day) == {first.id: (3, 30.0)}
+
+
+@pytest.mark.asyncio
+async def test_get_top(test_session, customer):
+    """Тест топа продуктов по количеству и по выручке"""
+    first, second, third = customer[2]
+    repository = ProductSalesRepository()
+    day = date(2024, 5, 1)
+    await create_order(
+        test_session, customer, datetime(2024, 5, 1, 10),
+        [(first, 5, 1.0), (second, 3, 100.0), (third, 1, 50.0)]
+    )
+    await create_order(test_session, customer, datetime(2024, 5, 2, 10), [(third, 100, 1.0)])
+    await repository.apply_new_orders(test_session)
+
+    top = await repository.get_top(test_session, day, limit=2)
+    assert [(row.product_id, row.name, row.units) for row in top] == [
+        (first.id, "Товар 1", 5), (second.id, "Товар 2", 3)
+    ]
+
+    top = await repository.get_top(test_session, day, limit=10, by="revenue")
+    assert [row.product_id for row in top] == [second.id, third.id, first.id]
+
+    with pytest.raises(ValueError):
+        await repository.get_top(test_session, day, by="price")
+
+
+@pytest.mark.asyncio
+async def test_delete_order_subtracts_applied_sales(test_session, customer):
+    """Тест: удаление учтенного заказа уменьшает свертку, пустые строки удаляются"""
+    first, second, _ = customer[2]
+    repository = ProductSalesRepository()
+    day = date(2024, 5, 1)
+    await create_order(test_session, customer, datetime(2024, 5, 1, 10), [(first, 2, 10.0)])
+    order = await create_order(test_session, customer, datetime(2024, 5, 1, 11), [(first, 1, 10.0), (second, 1, 5.0)])
+    await repository.apply_new_orders(test_session)
+
+    assert await OrderRepository().delete(test_session, order.id)
+
+    assert await sales(test_session, day) == {first.id: (2, 20.0)}
+
+
+@pytest.mark.asyncio
+async def test_delete_unapplied_order_skips_watermark_lock(test_session, customer):
+    """Тест: удаление заказа после водяного знака не блокирует водяной знак и не меняет свертку"""
+    first, _, _ = customer[2]
+    repository = ProductSalesRepository()
+    day = date(2024, 5, 1)
+    await create_order(test_session, customer, datetime(2024, 5, 1, 10), [(first, 2, 10.0)])
+    await repository.apply_new_orders(test_session)
+    order = await create_order(test_session, customer, datetime(2024, 5, 1, 11), [(first, 1, 10.0)])
+
+    with patch.object(ProductSalesRepository, "_lock_watermark") as lock:
+        assert await OrderRepository().delete(test_session, order.id)
+    lock.assert_not_called()
+
+    assert await sales(test_session, day) == {first.id: (2, 20.0)}
@@ -0,0 +1,324 @@
+"""
+Тесты для репозитория отчетов
+
+Проверяются пакетные операции и пересчет отчета за дату агрегирующим запросом
+"""
+import pytest
+import pytest_asyncio
+from datetime import date, datetime
+from sqlalchemy import event
+from app.models import User, Address, Order, Report
+from app.models.order import OrderItem
+from app.models.product import Product
+from app.repositories.report_repository import ReportRepository
+from app.cache.redis_client import redis_client
+from unittest.mock import AsyncMock, patch
+from redis.exceptions import ConnectionError as RedisConnectionError
+import json
+from app.schemas.report_schema import ReportCreate
+from app.schemas.order_schema import OrderCreate, OrderItemCreate
+
+
+async def create_order(session, user, address, product, created_at, quantities):
+    """Создать заказ с позициями на заданное время"""
+    order = Order(user_id=user.id, address_id=address.id, total_price=0.0, created_at=created_at)
+    session.add(order)
+    await session.flush()
+    for quantity in quantities:
+        session.add(OrderItem(
+            order_id=order.id, product_id=product.id, quantity=quantity, price_at_purchase=1.0
+        ))
+    await session.flush()
+    return order
+
+
+@pytest_asyncio.fixture
+async def customer(test_session):
+    """Пользователь, адрес и продукт для заказов"""
+    user = User(username="reporter", email="reporter@example.com")
+    test_session.add(user)
+    await test_session.flush()
+    address = Address(street="ул. Отчетная, 1", city="Москва", zip_code="123456", country="Russia", user_id=user.id)
+    product = Product(name="Товар", price=1.0, stock_quantity=100)
+    test_session.add_all([address, product])
+    await test_session.flush()
+    return user, address, product
+
+
+@pytest.mark.asyncio
+async def test_upsert_for_date(test_session, customer):
+    """
+    Тест пересчета отчета за дату
+
+    Проверяет, что:
+    - Для каждого заказа дня создается запись с суммой количеств позиций
+    - Существующая запись заказа обновляется, запись заказа без позиций удаляется
+    - Заказы других дней не попадают в результат
+    """
+    user, address, product = customer
+    day = date(2024, 3, 10)
+    first = await create_order(test_session, user, address, product, datetime(2024, 3, 10, 0, 0), [2, 3])
+    second = await create_order(test_session, user, address, product, datetime(2024, 3, 10, 23, 59), [4])
+    await create_order(test_session, user, address, product, datetime(2024, 3, 11, 0, 0), [7])
+    stale = await create_order(test_session, user, address, product, datetime(2024, 3, 10, 12, 0), [])
+    test_session.add_all([
+        Report(report_at=day, order_id=first.id, count_product=999),
+        Report(report_at=day, order_id=stale.id, count_product=1),
+    ])
+    await test_session.commit()
+
+    repository = ReportRepository()
+    orders_count, created = await repository.upsert_for_date(test_session, day)
+
+    assert (orders_count, created) == (3, 2)
+    reports = await repository.get_by_date(test_session, day)
+    assert sorted((r.order_id, r.count_product) for r in reports) == [(first.id, 5), (second.id, 4)]
+
+
+@pytest.mark.asyncio
+async def test_upsert_for_date_statement_count(test_session, customer):
+    """Тест: число запросов не зависит от количества заказов"""
+    user, address, product = customer
+    for minute in range(20):
+        await create_order(test_session, user, address, product, datetime(2024, 3, 10, 12, minute), [1])
+    await test_session.commit()
+
+    statements = []
+
+    def count_statement(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    sync_engine = test_session.bind.sync_engine
+    event.listen(sync_engine, "before_cursor_execute", count_statement)
+    try:
+        _, created = await ReportRepository().upsert_for_date(test_session, date(2024, 3, 10))
+    finally:
+        event.remove(sync_engine, "before_cursor_execute", count_statement)
+
+    assert created == 20
+    # COUNT заказов, DELETE устаревших записей, INSERT ... SELECT ... ON CONFLICT
+    assert len(statements) == 3
+
+
+@pytest.mark.asyncio
+async def test_upsert_for_date_without_orders(test_session):
+    """Тест пересчета за дату без заказов: отчет не изменяется"""
+    assert await ReportRepository().upsert_for_date(test_session, date(2024, 3, 10)) == (0, 0)
+
+
+@pytest.mark.asyncio
+async def test_upsert_for_date_is_idempotent(test_session, customer):
+    """
+    Тест повторного пересчета
+
+    Проверяет, что:
+    - Повторный пересчет не создает дубликатов и сохраняет ID записей
+    - Изменение заказа отражается в существующей записи
+    """
+    user, address, product = customer
+    day = date(2024, 3, 10)
+    order = await create_order(test_session, user, address, product, datetime(2024, 3, 10, 8, 0), [1])
+    await test_session.commit()
+
+    repository = ReportRepository()
+    await repository.upsert_for_date(test_session, day)
+    (report,) = await repository.get_by_date(test_session, day)
+    report_id = report.id
+
+    test_session.add(OrderItem(order_id=order.id, product_id=product.id, quantity=5, price_at_purchase=1.0))
+    await test_session.commit()
+    await repository.upsert_for_date(test_session, day)
+    await repository.upsert_for_date(test_session, day)
+
+    test_session.expire_all()
+    reports = await repository.get_by_date(test_session, day)
+    assert [(r.id, r.count_product) for r in reports] == [(report_id, 6)]
+
+
+@pytest.mark.asyncio
+async def test_create_many_and_delete_by_date(test_session, customer):
+    """Тест пакетного создания отчетов и удаления за дату одним запросом"""
+    user, address, product = customer
+    orders = [
+        await create_order(test_session, user, address, product, datetime(2024, 3, 10, 8, minute), [1])
+        for minute in range(3)
+    ]
+    await test_session.commit()
+
+    repository = ReportRepository()
+    reports = await repository.create_many(test_session, [
+        ReportCreate(report_at=date(2024, 3, day), order_id=order.id, count_product=1)
+        for order in orders
+        for day in (10, 11)
+    ])
+
+    assert len(reports) == 6
+    assert all(report.id is not None for report in reports)
+    assert await repository.delete_by_date(test_session, date(2024, 3, 10)) == 3
+    assert await repository.get_by_date(test_session, date(2024, 3, 10)) == []
+    assert len(await repository.get_by_date(test_session, date(2024, 3, 11))) == 3
+
+
+@pytest.mark.asyncio
+async def test_order_lifecycle_maintains_report(
+    test_session,
+    order_repository,
+    customer
+):
+    """
+    Тест инкрементального ведения отчета
+
+    Проверяет, что:
+    - Созданный заказ сразу попадает в отчет за день создания
+    - Удаленный заказ удаляется из отчета
+    - Отчет совпадает с агрегатом по заказам (verify_date)
+    """
+    user, address, product = customer
+    await test_session.commit()
+    order = await order_repository.create(test_session, OrderCreate(
+        user_id=user.id,
+        address_id=address.id,
+        items=[
+            OrderItemCreate(product_id=product.id, quantity=2),
+            OrderItemCreate(product_id=product.id, quantity=3),
+        ]
+    ))
+
+    repository = ReportRepository()
+    day = order.created_at.date()
+    reports = await repository.get_by_date(test_session, day)
+    assert [(r.order_id, r.count_product) for r in reports] == [(order.id, 5)]
+    assert await repository.verify_date(test_session, day) is True
+
+    await order_repository.delete(test_session, order.id)
+    assert await repository.get_by_date(test_session, day) == []
+    assert await repository.verify_date(test_session, day) is True
+
+
+@pytest.mark.asyncio
+async def test_verify_date_detects_drift(test_session, customer):
+    """
+    Тест проверки отчета
+
+    Проверяет, что:
+    - Расхождение количества в записи обнаруживается
+    - После пересчета отчет снова актуален
+    """
+    user, address, product = customer
+    day = date(2024, 3, 10)
+    order = await create_order(test_session, user, address, product, datetime(2024, 3, 10, 9, 0), [4])
+    test_session.add(Report(report_at=day, order_id=order.id, count_product=3))
+    await test_session.commit()
+
+    repository = ReportRepository()
+    assert await repository.verify_date(test_session, day) is False
+    await repository.upsert_for_date(test_session, day)
+    assert await repository.verify_date(test_session, day) is True
+
+
+@pytest.mark.asyncio
+async def test_verify_date_checksum_in_bigint(test_session, customer):
+    """Тест: контрольная сумма order_id * count_product считается в BIGINT на обеих сторонах сверки"""
+    user, address, product = customer
+    day = date(2024, 3, 10)
+    order = Order(id=2_000_000_000, user_id=user.id, address_id=address.id, total_price=0.0,
+                  created_at=datetime(2024, 3, 10, 9, 0))
+    test_session.add(order)
+    await test_session.flush()
+    test_session.add(OrderItem(order_id=order.id, product_id=product.id, quantity=50, price_at_purchase=1.0))
+    test_session.add(Report(report_at=day, order_id=order.id, count_product=50))
+    await test_session.commit()
+
+    statements = []
+
+    def capture_statement(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    sync_engine = test_session.bind.sync_engine
+    event.listen(sync_engine, "before_cursor_execute", capture_statement)
+    try:
+        assert await ReportRepository().verify_date(test_session, day) is True
+    finally:
+        event.remove(sync_engine, "before_cursor_execute", capture_statement)
+
+    assert len(statements) == 2
+    assert all(statement.count("AS BIGINT)") == 2 for statement in statements)
+
+
+@pytest.mark.asyncio
+async def test_response_cache_invalidated_on_rebuild(test_session, customer):
+    """
+    Тест кэша ответа за прошедший день
+
+    Проверяет, что:
+    - Тело ответа кэшируется после первого чтения
+    - Пересчет отчета за дату удаляет кэш
+    """
+    user, address, product = customer
+    day = date(2024, 3, 10)
+    repository = ReportRepository()
+    redis = await redis_client.client()
+    await redis.delete(repository.cache_key(day), repository.cache_version_key(day))
+    await create_order(test_session, user, address, product, datetime(2024, 3, 10, 9, 0), [4])
+    await test_session.commit()
+
+    assert json.loads(await repository.get_response_by_date(test_session, day))["reports"] == []
+    assert await redis.get(repository.cache_key(day)) is not None
+
+    await repository.upsert_for_date(test_session, day)
+    assert await redis.get(repository.cache_key(day)) is None
+    body = json.loads(await repository.get_response_by_date(test_session, day))
+    assert [r["count_product"] for r in body] == [4]
+
+
+@pytest.mark.asyncio
+async def test_response_cache_skips_write_after_concurrent_rebuild(test_session):
+    """Тест: ответ, прочитанный до пересчета, не записывается в кэш после инвалидации"""
+    day = date(2024, 3, 11)
+    repository = ReportRepository()
+    redis = await redis_client.client()
+    await redis.delete(repository.cache_key(day), repository.cache_version_key(day))
+
+    original_get_by_date = repository.get_by_date
+
+    async def get_by_date_during_rebuild(session, report_date):
+        reports = await original_get_by_date(session, report_date)
+        # Пересчет завершился, пока запрос читал старые данные
+        await repository.invalidate_cache([report_date])
+        return reports
+
+    with patch.object(repository, "get_by_date", get_by_date_during_rebuild):
+        await repository.get_response_by_date(test_session, day)
+
+    assert await redis.get(repository.cache_key(day)) is None
+
+
+@pytest.mark.asyncio
+async def test_response_built_from_db_when_redis_unavailable(test_session):
+    """Тест: при недоступном Redis ответ за прошедший день собирается из БД"""
+    day = date(2024, 3, 12)
+    repository = ReportRepository()
+    test_session.add(Report(report_at=day, order_id=1, count_product=2))
+    await test_session.commit()
+
+    with patch.object(redis_client, "client", AsyncMock(side_effect=RedisConnectionError("Redis недоступен"))):
+        body = json.loads(await repository.get_response_by_date(test_session, day))
+
+    assert [r["count_product"] for r in body] == [2]
+
+
+@pytest.mark.asyncio
+async def test_create_invalidates_response_cache(test_session):
+    """Тест: создание отчета удаляет закэшированный ответ за его дату"""
+    day = date(2024, 3, 13)
+    repository = ReportRepository()
+    redis = await redis_client.client()
+    await redis.delete(repository.cache_key(day), repository.cache_version_key(day))
+    await repository.get_response_by_date(test_session, day)
+    assert await redis.get(repository.cache_key(day)) is not None
+
+    await repository.create(test_session, ReportCreate(report_at=day, order_id=1, count_product=3))
+
+    assert await redis.get(repository.cache_key(day)) is None
+    body = json.loads(await repository.get_response_by_date(test_session, day))
+    assert [r["count_product"] for r in body] == [3]
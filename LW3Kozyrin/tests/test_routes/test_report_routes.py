@@ -0,0 +1,400 @@
+"""
+Тесты для API endpoints отчетов
+
+Используется TestClient от Litestar; постановка задач TaskIQ заменяется mock
+"""
+import pytest
+import redis.asyncio as redis
+from datetime import date, datetime
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+from litestar import Litestar
+from litestar.testing import AsyncTestClient
+from litestar.di import Provide
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
+from sqlalchemy.pool import StaticPool
+from app.controllers.report_controller import ReportController
+from app.repositories.report_repository import ReportRepository
+from app.repositories.product_sales_repository import ProductSalesRepository
+from app.scheduler import taskiq_app
+from app.controllers import report_controller
+from app.services import report_export
+from sqlalchemy import insert
+import csv
+import gzip
+import io
+from taskiq import TaskiqResult
+from app.models.base import Base
+from app.models import User, Address, Order, Report, Product, ProductDailySales
+from app.cache.redis_client import redis_client
+from app.scheduler.locks import ReportTaskRegistry
+
+
+@pytest.fixture(scope="function")
+async def test_app():
+    """
+    Фикстура для создания тестового приложения Litestar с контроллером отчетов
+    """
+    engine = create_async_engine(
+        "sqlite+aiosqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+        echo=False
+    )
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    async_session_factory = async_sessionmaker(
+        engine,
+        class_=AsyncSession,
+        expire_on_commit=False
+    )
+
+    async def provide_db_session() -> AsyncSession:
+        async with async_session_factory() as session:
+            yield session
+            await session.close()
+
+    def provide_report_repository() -> ReportRepository:
+        return ReportRepository()
+
+    def provide_product_sales_repository() -> ProductSalesRepository:
+        return ProductSalesRepository()
+
+    app = Litestar(
+        route_handlers=[ReportController],
+        dependencies={
+            "db_session": Provide(provide_db_session),
+            "report_repository": Provide(provide_report_repository, sync_to_thread=False),
+            "product_sales_repository": Provide(provide_product_sales_repository, sync_to_thread=False),
+        },
+    )
+    # Фабрика сессий для подготовки данных в тестах
+    app.state.session_factory = async_session_factory
+
+    yield app
+
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_backfill_endpoints(test_app):
+    """
+    Тест запуска пересчета и опроса прогресса
+
+    Проверяет:
+    - POST /report/backfill ставит задачу и возвращает ID пересчета
+    - GET /report/backfill/{id} возвращает прогресс
+    """
+    kiq = AsyncMock()
+    with patch.object(taskiq_app.backfill_reports, "kiq", kiq):
+        async with AsyncTestClient(app=test_app) as client:
+            response = await client.post("/report/backfill?start=2023-01-01&end=2023-01-10")
+            assert response.status_code == 202
+            data = response.json()
+            assert data["total"] == 10
+            kiq.assert_awaited_once_with(backfill_id=data["backfill_id"])
+
+            response = await client.get(f"/report/backfill/{data['backfill_id']}")
+            assert response.status_code == 200
+            progress = response.json()
+            assert (progress["status"], progress["total"], progress["done"]) == ("pending", 10, 0)
+
+
+@pytest.mark.asyncio
+async def test_backfill_failed_kiq_marks_progress_failed(test_app):
+    """Тест: если задачу не удалось поставить, пересчет отмечается как failed, а не висит в pending"""
+    kiq = AsyncMock(side_effect=ConnectionError("брокер недоступен"))
+    with patch.object(taskiq_app.backfill_reports, "kiq", kiq):
+        async with AsyncTestClient(app=test_app) as client:
+            response = await client.post("/report/backfill?start=2023-01-01&end=2023-01-10")
+            assert response.status_code == 500
+            backfill_id = response.json()["backfill_id"]
+
+            response = await client.get(f"/report/backfill/{backfill_id}")
+            progress = response.json()
+            assert progress["status"] == "failed"
+            assert "брокер недоступен" in progress["error"]
+
+
+@pytest.mark.asyncio
+async def test_backfill_rejects_invalid_range(test_app):
+    """Тест: пустой или слишком длинный диапазон отклоняется с 400, неизвестный ID - 404"""
+    async with AsyncTestClient(app=test_app) as client:
+        response = await client.post("/report/backfill?start=2023-02-01&end=2023-01-01")
+        assert response.status_code == 400
+        response = await client.post("/report/backfill?start=2020-01-01&end=2023-01-01")
+        assert response.status_code == 400
+        response = await client.get("/report/backfill/missing")
+        assert response.status_code == 404
+
+
+@pytest.fixture
+async def redis_connection():
+    """
+    Отдельное подключение к Redis для проверок в тесте
+
+    Приложение в AsyncTestClient работает в другом цикле событий, поэтому
+    глобальный redis_client в самом тесте не используется
+    """
+    connection = redis.from_url(redis_client.redis_url)
+    yield connection
+    await connection.aclose()
+
+
+async def add_report(session_factory, report_date, quantity):
+    """Создать заказ и запись отчета за дату"""
+    async with session_factory() as session:
+        user = User(username=f"user{quantity}", email=f"user{quantity}@example.com")
+        session.add(user)
+        await session.flush()
+        address = Address(street="ул. Кэшируемая, 1", city="Москва", zip_code="123456", user_id=user.id)
+        session.add(address)
+        await session.flush()
+        order = Order(user_id=user.id, address_id=address.id)
+        session.add(order)
+        await session.flush()
+        session.add(Report(report_at=report_date, order_id=order.id, count_product=quantity))
+        await session.commit()
+
+
+@pytest.mark.asyncio
+async def test_past_day_report_cached_with_etag(test_app, redis_connection):
+    """
+    Тест кэширования отчета за прошедший день
+
+    Проверяет:
+    - Ответ содержит ETag, повторный запрос с If-None-Match получает 304
+    - Тело ответа кэшируется в Redis и отдается из кэша без обращения к БД
+    """
+    day = date(2022, 6, 1)
+    key = ReportRepository.cache_key(day)
+    await redis_connection.delete(key, ReportRepository.cache_version_key(day))
+    await add_report(test_app.state.session_factory, day, 2)
+
+    async with AsyncTestClient(app=test_app) as client:
+        response = await client.get("/report/", params={"report_date": str(day)})
+        assert response.status_code == 200
+        assert [r["count_product"] for r in response.json()] == [2]
+        etag = response.headers["etag"]
+        assert await redis_connection.get(key) == response.content
+
+        response = await client.get(
+            "/report/", params={"report_date": str(day)}, headers={"If-None-Match": etag}
+        )
+        assert response.status_code == 304
+        assert response.content == b""
+
+        # Запись в БД без пересчета не видна: ответ за прошедший день берется из кэша
+        await add_report(test_app.state.session_factory, day, 3)
+        response = await client.get("/report/", params={"report_date": str(day)})
+        assert response.headers["etag"] == etag
+
+        await redis_connection.delete(key)
+        response = await client.get("/report/", params={"report_date": str(day)})
+        assert response.headers["etag"] != etag
+        assert sorted(r["count_product"] for r in response.json()) == [2, 3]
+
+
+@pytest.mark.asyncio
+async def test_current_day_report_not_cached(test_app, redis_connection):
+    """Тест: отчет за текущий день не кэшируется, но поддерживает ETag (сильный, слабый W/ и *)"""
+    today = datetime.utcnow().date()
+    key = ReportRepository.cache_key(today)
+    await redis_connection.delete(key)
+
+    async with AsyncTestClient(app=test_app) as client:
+        response = await client.get("/report/", params={"report_date": str(today)})
+        assert response.status_code == 200
+        assert response.json()["reports"] == []
+        assert await redis_connection.get(key) is None
+
+        etag = response.headers["etag"]
+        for if_none_match in (etag, f"W/{etag}", f'"other", W/{etag}', "*"):
+            response = await client.get(
+                "/report/",
+                params={"report_date": str(today)},
+                headers={"If-None-Match": if_none_match}
+            )
+            assert response.status_code == 304
+
+        response = await client.get(
+            "/report/", params={"report_date": str(today)}, headers={"If-None-Match": 'W/"other"'}
+        )
+        assert response.status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_generate_deduplicates_scheduled_date(test_app, redis_connection):
+    """
+    Тест дедупликации ручного пересчета
+
+    Проверяет:
+    - Первый запрос ставит задачу в очередь
+    - Повторный запрос за ту же дату возвращает ID уже запланированной задачи
+    """
+    day = date(2023, 8, 1)
+    await redis_connection.delete(ReportTaskRegistry.key(day))
+
+    kicker = MagicMock()
+    kicker.with_task_id.side_effect = lambda task_id: SimpleNamespace(
+        kiq=AsyncMock(return_value=SimpleNamespace(task_id=task_id))
+    )
+    with patch.object(taskiq_app.generate_report_for_date, "kicker", return_value=kicker):
+        async with AsyncTestClient(app=test_app) as client:
+            first = await client.post("/report/generate", params={"report_date": str(day)})
+            second = await client.post("/report/generate", params={"report_date": str(day)})
+
+    assert first.status_code == second.status_code == 202
+    assert first.json()["status"] == "scheduled"
+    assert second.json()["status"] == "already_scheduled"
+    assert second.json()["task_id"] == first.json()["task_id"]
+    assert kicker.with_task_id.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_task_status_endpoint(test_app):
+    """
+    Тест статуса задачи
+
+    Проверяет:
+    - Без wait незавершенная задача сразу возвращается как pending
+    - С wait запрос дожидается результата (long-poll)
+    - Ошибка задачи возвращается со статусом error
+    """
+    result_backend = MagicMock()
+    result_backend.is_result_ready = AsyncMock(side_effect=[False, False, False, True, True])
+    result_backend.get_result = AsyncMock(side_effect=[
+        TaskiqResult(is_err=False, return_value={"status": "success"}, execution_time=0.5),
+        TaskiqResult(is_err=True, return_value=None, execution_time=0.1, error=ValueError("boom")),
+    ])
+
+    with patch.object(taskiq_app.broker, "result_backend", result_backend), \
+            patch.object(report_controller, "TASK_POLL_INTERVAL", 0.01):
+        async with AsyncTestClient(app=test_app) as client:
+            response = await client.get("/report/tasks/task-1")
+            assert response.json() == {"task_id": "task-1", "status": "pending"}
+
+            response = await client.get("/report/tasks/task-1", params={"wait": 5})
+            assert response.json()["status"] == "success"
+            assert response.json()["result"] == {"status": "success"}
+            assert result_backend.is_result_ready.await_count == 4
+
+            response = await client.get("/report/tasks/task-2")
+            assert response.json()["status"] == "error"
+            assert "boom" in response.json()["error"]
+
+            response = await client.get("/report/tasks/task-2", params={"wait": 3600})
+            assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_export_csv_gz_streams_chunks(test_app):
+    """
+    Тест выгрузки отчетов в CSV (gzip)
+
+    Проверяет:
+    - Выгружаются только отчеты из диапазона, в порядке (report_at, id)
+    - Файл из нескольких пачек (членов gzip) читается как один CSV с одним заголовком
+    """
+    async with test_app.state.session_factory() as session:
+        await session.execute(insert(Report), [
+            {"report_at": date(2022, 1, 1 + i % 5), "order_id": i + 1, "count_product": i % 7 + 1}
+            for i in range(2500)
+        ])
+        await session.commit()
+
+    with patch.object(report_export, "EXPORT_CHUNK_SIZE", 400):
+        async with AsyncTestClient(app=test_app) as client:
+            response = await client.get(
+                "/report/export", params={"from": "2022-01-02", "to": "2022-01-04", "format": "csv.gz"}
+            )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/gzip"
+    assert 'filename="reports_2022-01-02_2022-01-04.csv.gz"' in response.headers["content-disposition"]
+    # Каждая пачка - отдельный член gzip
+    assert response.content.count(b"\x1f\x8b\x08") > 1
+
+    rows = list(csv.reader(io.StringIO(gzip.decompress(response.content).decode())))
+    assert rows[0] == ["id", "report_at", "order_id", "count_product"]
+    assert len(rows) - 1 == 1500
+    keys = [(row[1], int(row[0])) for row in rows[1:]]
+    assert keys == sorted(keys)
+    assert {row[1] for row in rows[1:]} == {"2022-01-02", "2022-01-03", "2022-01-04"}
+
+
+@pytest.mark.asyncio
+async def test_export_validation(test_app):
+    """Тест: пустой диапазон и неизвестный формат отклоняются с 400"""
+    async with AsyncTestClient(app=test_app) as client:
+        response = await client.get("/report/export", params={"from": "2022-01-02", "to": "2022-01-01"})
+        assert response.status_code == 400
+        response = await client.get(
+            "/report/export", params={"from": "2022-01-01", "to": "2022-01-02", "format": "xlsx"}
+        )
+        assert response.status_code == 400
+
+        response = await client.get("/report/export", params={"from": "2022-01-01", "to": "2022-01-02"})
+        assert response.status_code == 200
+        assert gzip.decompress(response.content) == b"id,report_at,order_id,count_product\n"
+
+
+@pytest.mark.asyncio
+async def test_export_parquet(test_app):
+    """Тест выгрузки в Parquet (если установлен pyarrow)"""
+    pq = pytest.importorskip("pyarrow.parquet")
+    async with test_app.state.session_factory() as session:
+        await session.execute(insert(Report), [
+            {"report_at": date(2022, 1, 1), "order_id": i + 1, "count_product": 1} for i in range(50)
+        ])
+        await session.commit()
+
+    with patch.object(report_export, "EXPORT_CHUNK_SIZE", 20):
+        async with AsyncTestClient(app=test_app) as client:
+            response = await client.get(
+                "/report/export", params={"from": "2022-01-01", "to": "2022-01-01", "format": "parquet"}
+            )
+
+    table = pq.read_table(io.BytesIO(response.content))
+    assert table.num_rows == 50
+
+
+@pytest.mark.asyncio
+async def test_top_products(test_app):
+    """
+    Тест топа продуктов за дату из свертки
+
+    Проверяет:
+    - Сортировку по units и revenue и ограничение limit
+    - Валидацию поля сортировки и limit
+    """
+    day = date(2024, 6, 1)
+    async with test_app.state.session_factory() as session:
+        products = [Product(name=f"Товар {i}", price=1.0, stock_quantity=0) for i in range(3)]
+        session.add_all(products)
+        await session.flush()
+        session.add_all([
+            ProductDailySales(sales_date=day, product_id=products[0].id, units=10, revenue=10.0),
+            ProductDailySales(sales_date=day, product_id=products[1].id, units=2, revenue=200.0),
+            ProductDailySales(sales_date=day, product_id=products[2].id, units=5, revenue=50.0),
+            ProductDailySales(sales_date=date(2024, 6, 2), product_id=products[1].id, units=100, revenue=1.0),
+        ])
+        await session.commit()
+        ids = [product.id for product in products]
+
+    async with AsyncTestClient(app=test_app) as client:
+        response = await client.get("/report/top-products", params={"date": "2024-06-01", "limit": 2})
+        assert response.status_code == 200
+        body = response.json()
+        assert body["by"] == "units"
+        assert [(p["product_id"], p["units"]) for p in body["products"]] == [(ids[0], 10), (ids[2], 5)]
+        assert body["products"][0]["name"] == "Товар 0"
+
+        response = await client.get("/report/top-products", params={"date": "2024-06-01", "by": "revenue"})
+        assert [p["product_id"] for p in response.json()["products"]] == [ids[1], ids[2], ids[0]]
+
+        response = await client.get("/report/top-products", params={"date": "2024-06-01", "by": "price"})
+        assert response.status_code == 400
+        response = await client.get("/report/top-products", params={"date": "2024-06-01", "limit": 0})
+        assert response.status_code == 400
@@ -267,3 +267,31 @@ async def test_create_user_validation_error(test_app):
         )
         
         assert response.status_code == 400  # Bad Request
+
+
+@pytest.mark.asyncio
+async def test_get_users_by_cursor_endpoint(test_app):
+    """
+    Тест keyset-пагинации пользователей через API
+
+    Проверяет:
+    - Ответ содержит next_cursor, если есть следующая страница
+    - Запрос с after возвращает следующую страницу
+    - Поврежденный курсор возвращает 400
+    """
+    async with AsyncTestClient(app=test_app) as client:
+        for i in range(3):
+            await client.post(
+                "/users",
+                json={"username": f"user{i}", "email": f"user{i}@example.com"}
+            )
+
+        first = (await client.get("/users?count=2")).json()
+        assert first["next_cursor"] is not None
+
+        second = (await client.get(f"/users?count=2&after={first['next_cursor']}")).json()
+        assert [u["username"] for u in second["users"]] == ["user2"]
+        assert second["next_cursor"] is None
+
+        response = await client.get("/users?count=2&after=broken")
+        assert response.status_code == 400
@@ -0,0 +1,109 @@
+"""
+Тесты пересчета отчетов за диапазон дат
+
+Подзадачи вызываются напрямую: постановка следующей подзадачи в очередь
+заменяется mock, сессии БД берутся из тестового движка
+"""
+import pytest
+from datetime import date, datetime
+from unittest.mock import AsyncMock, patch
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from app.models import User, Address, Order
+from app.models.order import OrderItem
+from app.models.product import Product
+from app.repositories.report_repository import ReportRepository
+from app.scheduler import taskiq_app
+from app.scheduler.backfill import BackfillProgress, REPORT_WATERMARKS_KEY
+from app.cache.redis_client import redis_client
+
+DAYS = [date(2023, 5, 1), date(2023, 5, 2), date(2023, 5, 3)]
+
+
+async def fill_orders(session):
+    """По одному заказу с двумя единицами товара на каждый день DAYS"""
+    user = User(username="backfill", email="backfill@example.com")
+    session.add(user)
+    await session.flush()
+    address = Address(street="ул. Архивная, 1", city="Москва", zip_code="123456", user_id=user.id)
+    product = Product(name="Товар", price=1.0, stock_quantity=100)
+    session.add_all([address, product])
+    await session.flush()
+    for day in DAYS:
+        order = Order(user_id=user.id, address_id=address.id, created_at=datetime.combine(day, datetime.min.time()))
+        session.add(order)
+        await session.flush()
+        session.add(OrderItem(order_id=order.id, product_id=product.id, quantity=2, price_at_purchase=1.0))
+    await session.commit()
+
+
+async def run_backfill(engine, backfill_id):
+    """Выполнить подзадачи пересчета, пока даты не закончатся"""
+    session_factory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    kiq = AsyncMock()
+    with patch.object(taskiq_app, "async_session_factory", session_factory), \
+            patch.object(taskiq_app.backfill_report_day, "kiq", kiq):
+        results = []
+        while True:
+            result = await taskiq_app.backfill_report_day(backfill_id)
+            if result["status"] == "idle":
+                return results
+            results.append(result)
+            # Каждая обработанная дата ставит в очередь следующую подзадачу
+            assert kiq.await_count == len(results)
+
+
+@pytest.mark.asyncio
+async def test_backfill_progress_and_skip_unchanged_days(engine, test_session):
+    """
+    Тест пересчета диапазона
+
+    Проверяет, что:
+    - Каждая дата диапазона обрабатывается один раз
+    - Прогресс в Redis доходит до completed
+    - Повторный пересчет пропускает дни, заказы которых не менялись
+    """
+    redis = await redis_client.client()
+    await redis.hdel(REPORT_WATERMARKS_KEY, *(day.isoformat() for day in DAYS))
+    await fill_orders(test_session)
+    progress = BackfillProgress()
+
+    backfill_id = await progress.create(DAYS[0], DAYS[-1])
+    results = await run_backfill(engine, backfill_id)
+
+    assert sorted(r["date"] for r in results) == [str(day) for day in DAYS]
+    assert {r["status"] for r in results} == {"done"}
+    state = await progress.get(backfill_id)
+    assert (state["total"], state["done"], state["skipped"], state["failed"]) == (3, 3, 0, 0)
+    assert state["status"] == "completed"
+    for day in DAYS:
+        reports = await ReportRepository().get_by_date(test_session, day)
+        assert [r.count_product for r in reports] == [2]
+
+    second_id = await progress.create(DAYS[0], DAYS[-1])
+    results = await run_backfill(engine, second_id)
+
+    assert {r["status"] for r in results} == {"skipped"}
+    state = await progress.get(second_id)
+    assert (state["done"], state["skipped"], state["status"]) == (0, 3, "completed")
+
+
+@pytest.mark.asyncio
+async def test_backfill_reports_fans_out_bounded_lanes():
+    """Тест: родительская задача запускает не больше REPORT_BACKFILL_CONCURRENCY цепочек"""
+    progress = BackfillProgress()
+    backfill_id = await progress.create(date(2023, 1, 1), date(2023, 1, 31))
+
+    kiq = AsyncMock()
+    with patch.object(taskiq_app, "REPORT_BACKFILL_CONCURRENCY", 4), \
+            patch.object(taskiq_app.backfill_report_day, "kiq", kiq):
+        result = await taskiq_app.backfill_reports(backfill_id)
+
+    assert result["lanes"] == 4
+    assert kiq.await_count == 4
+    assert (await progress.get(backfill_id))["status"] == "running"
+
+
+@pytest.mark.asyncio
+async def test_backfill_progress_unknown_id():
+    """Тест: прогресс несуществующего пересчета не найден"""
+    assert await BackfillProgress().get("missing") is None
@@ -0,0 +1,61 @@
+"""
+Тесты метрик постановки задач TaskIQ в очередь
+"""
+import pytest
+from litestar import Litestar
+from litestar.testing import AsyncTestClient
+from taskiq import InMemoryBroker
+from app.controllers.metrics_controller import MetricsController
+from app.metrics import LatencyStats, metrics
+from app.scheduler.middlewares import KiqLatencyMiddleware
+
+
+def test_latency_stats_quantiles():
+    """Тест гистограммы задержек: счетчики, корзины и оценка квантилей"""
+    stats = LatencyStats()
+    for ms in [0.5] * 90 + [40] * 9 + [7000]:
+        stats.observe(ms / 1000)
+
+    snapshot = stats.snapshot()
+    assert snapshot["count"] == 100
+    assert snapshot["p50_ms"] == 1
+    assert snapshot["p95_ms"] == 50
+    assert snapshot["max_ms"] == 7000
+    assert snapshot["buckets_ms"]["inf"] == 1
+
+
+@pytest.mark.asyncio
+async def test_kiq_latency_recorded_per_task():
+    """Тест: каждая постановка задачи в очередь учитывается в метрике задачи"""
+    broker = InMemoryBroker().with_middlewares(KiqLatencyMiddleware())
+
+    @broker.task
+    async def sample_task() -> int:
+        return 1
+
+    await broker.startup()
+    try:
+        for _ in range(3):
+            await sample_task.kiq()
+    finally:
+        await broker.shutdown()
+
+    latency = metrics.snapshot()["latency"][f"taskiq.kiq.{sample_task.task_name}"]
+    assert latency["count"] == 3
+    assert latency["errors"] == 0
+
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint():
+    """Тест: GET /metrics возвращает задержки, счетчики и показатели"""
+    metrics.observe("taskiq.kiq.example", 0.002)
+    metrics.register_gauge("example.gauge", lambda: {"items": 1})
+
+    app = Litestar(route_handlers=[MetricsController])
+    async with AsyncTestClient(app=app) as client:
+        response = await client.get("/metrics")
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["latency"]["taskiq.kiq.example"]["count"] == 1
+    assert data["gauges"]["example.gauge"] == {"items": 1}
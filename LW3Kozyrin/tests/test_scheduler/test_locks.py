@@ -0,0 +1,77 @@
+"""
+Тесты блокировки и дедупликации пересчета отчетов
+"""
+import pytest
+from datetime import date
+from types import SimpleNamespace
+from app.scheduler import taskiq_app
+from app.scheduler.locks import ReportDateLock, ReportTaskRegistry
+from app.cache.redis_client import redis_client
+
+DAY = date(2023, 7, 1)
+
+
+@pytest.fixture(autouse=True)
+async def clean_keys():
+    """Удалить блокировку и регистрацию задачи за тестовую дату"""
+    redis = await redis_client.client()
+    await redis.delete(ReportDateLock(DAY).key, ReportTaskRegistry.key(DAY))
+    yield
+
+
+@pytest.mark.asyncio
+async def test_lock_is_exclusive_and_released_by_owner_only():
+    """
+    Тест блокировки даты
+
+    Проверяет, что:
+    - Вторая блокировка той же даты не захватывается
+    - Блокировка, захваченная заново после истечения, не снимается прежним владельцем
+    """
+    first = ReportDateLock(DAY)
+    second = ReportDateLock(DAY)
+    assert await first.acquire() is True
+    assert await second.acquire() is False
+    await first.release()
+    assert await second.acquire() is True
+
+    # first считает, что владеет блокировкой, но она уже принадлежит second
+    first.acquired = True
+    await first.release()
+    redis = await redis_client.client()
+    assert await redis.exists(second.key) == 1
+    await second.release()
+    assert await redis.exists(second.key) == 0
+
+
+@pytest.mark.asyncio
+async def test_registry_returns_scheduled_task_id():
+    """Тест: повторная регистрация даты возвращает ID уже запланированной задачи"""
+    registry = ReportTaskRegistry()
+    assert await registry.claim(DAY, "task-1") is None
+    assert await registry.claim(DAY, "task-2") == "task-1"
+
+    await registry.release(DAY, "task-2")
+    assert await registry.claim(DAY, "task-3") == "task-1"
+
+    await registry.release(DAY, "task-1")
+    assert await registry.claim(DAY, "task-3") is None
+
+
+@pytest.mark.asyncio
+async def test_generate_report_skips_locked_date():
+    """
+    Тест: задача не пересчитывает дату, заблокированную другой задачей,
+    и снимает свою регистрацию
+    """
+    registry = ReportTaskRegistry()
+    await registry.claim(DAY, "task-1")
+    lock = ReportDateLock(DAY)
+    await lock.acquire()
+
+    context = SimpleNamespace(message=SimpleNamespace(task_id="task-1"))
+    result = await taskiq_app.generate_report_for_date(str(DAY), context)
+
+    assert result["status"] == "skipped"
+    assert await registry.claim(DAY, "task-2") is None
+    await lock.release()
@@ -0,0 +1,22 @@
+"""
+Тесты расписания задач планировщика
+"""
+import pytest
+from app.scheduler import taskiq_app
+
+
+@pytest.mark.asyncio
+async def test_scheduler_discovers_labelled_tasks():
+    """Тест: планировщик находит по меткам schedule все периодические задачи"""
+    schedules = []
+    for source in taskiq_app.scheduler.sources:
+        await source.startup()
+        schedules.extend(await source.get_schedules())
+
+    crons = {schedule.task_name.rsplit(":", 1)[-1]: schedule.cron for schedule in schedules}
+    assert crons == {
+        "generate_daily_report": "0 0 * * *",
+        "update_product_sales": "*/5 * * * *",
+        "rebuild_product_sales": "10 0 * * *",
+        "purge_processed_messages": "30 0 * * *",
+    }
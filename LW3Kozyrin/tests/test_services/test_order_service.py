@@ -0,0 +1,182 @@
+"""
+Тесты для сервиса заказов
+
+Проверяется атомарное списание остатков при оформлении заказа,
+в том числе при одновременных заказах одного товара
+"""
+import asyncio
+import pytest
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from app.models.order import Order
+from app.models.product import Product
+from app.repositories.order_repository import OrderRepository
+from app.repositories.product_repository import ProductRepository
+from app.schemas.order_schema import OrderCreate, OrderItemCreate
+from app.schemas.user_schema import UserCreate
+from app.schemas.address_schema import AddressCreate
+from app.schemas.product_schema import ProductCreate
+from app.services.order_service import OrderService
+from app.cache.redis_client import redis_client
+
+
+async def create_customer(session, user_repository, address_repository):
+    """Создать пользователя с адресом"""
+    user = await user_repository.create(session, UserCreate(username="buyer", email="buyer@example.com"))
+    address = await address_repository.create(session, AddressCreate(
+        street="ул. Складская, 1",
+        city="Москва",
+        zip_code="123456",
+        country="Russia",
+        user_id=user.id
+    ))
+    return user, address
+
+
+@pytest.mark.asyncio
+async def test_create_order_reserves_stock(
+    test_session,
+    order_repository,
+    user_repository,
+    address_repository,
+    product_repository
+):
+    """
+    Тест оформления заказа
+
+    Проверяет, что:
+    - Остаток уменьшается на заказанное количество (повторы одного товара суммируются)
+    - Кэш продукта содержит остаток после списания
+    """
+    user, address = await create_customer(test_session, user_repository, address_repository)
+    product = await product_repository.create(
+        test_session, ProductCreate(name="Товар", price=100.0, stock_quantity=10)
+    )
+    service = OrderService(order_repository, product_repository, test_session)
+
+    order = await service.create(OrderCreate(
+        user_id=user.id,
+        address_id=address.id,
+        items=[
+            OrderItemCreate(product_id=product.id, quantity=3),
+            OrderItemCreate(product_id=product.id, quantity=2),
+        ]
+    ))
+
+    assert order.total_price == 500.0
+    stock = await test_session.scalar(select(Product.stock_quantity).where(Product.id == product.id))
+    assert stock == 5
+    cached = await redis_client.get_json(f"product:{product.id}")
+    assert cached["stock_quantity"] == 5
+
+
+@pytest.mark.asyncio
+async def test_create_order_insufficient_stock_rolls_back(
+    test_session,
+    order_repository,
+    user_repository,
+    address_repository,
+    product_repository
+):
+    """
+    Тест заказа при нехватке одного из товаров
+
+    Проверяет, что:
+    - Выбрасывается ValueError
+    - Списание по другим товарам откатывается, заказ не создается
+    """
+    user, address = await create_customer(test_session, user_repository, address_repository)
+    plenty = await product_repository.create(
+        test_session, ProductCreate(name="Много", price=10.0, stock_quantity=10)
+    )
+    scarce = await product_repository.create(
+        test_session, ProductCreate(name="Мало", price=10.0, stock_quantity=1)
+    )
+    plenty_id, scarce_id = plenty.id, scarce.id
+    service = OrderService(order_repository, product_repository, test_session)
+
+    with pytest.raises(ValueError, match="Not enough stock"):
+        await service.create(OrderCreate(
+            user_id=user.id,
+            address_id=address.id,
+            items=[
+                OrderItemCreate(product_id=plenty_id, quantity=4),
+                OrderItemCreate(product_id=scarce_id, quantity=2),
+            ]
+        ))
+
+    stocks = dict((await test_session.execute(select(Product.id, Product.stock_quantity))).all())
+    assert stocks == {plenty_id: 10, scarce_id: 1}
+    assert await test_session.scalar(select(func.count(Order.id))) == 0
+
+
+# Количество одновременных заказов и остаток товара в тестах конкуренции
+CONCURRENT_ORDERS = 500
+CONCURRENT_STOCK = 120
+
+
+async def assert_concurrent_orders_do_not_oversell(engine, user_repository, address_repository):
+    """Оформить CONCURRENT_ORDERS одновременных заказов товара с остатком CONCURRENT_STOCK"""
+    session_factory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    product_repository = ProductRepository()
+    order_repository = OrderRepository()
+
+    async with session_factory() as session:
+        user, address = await create_customer(session, user_repository, address_repository)
+        product = await product_repository.create(
+            session, ProductCreate(name="Хит продаж", price=1.0, stock_quantity=CONCURRENT_STOCK)
+        )
+
+    async def place_order():
+        async with session_factory() as session:
+            service = OrderService(order_repository, product_repository, session)
+            try:
+                await service.create(OrderCreate(
+                    user_id=user.id,
+                    address_id=address.id,
+                    items=[OrderItemCreate(product_id=product.id, quantity=1)]
+                ))
+                return True
+            except ValueError:
+                return False
+
+    results = await asyncio.gather(*(place_order() for _ in range(CONCURRENT_ORDERS)))
+
+    assert results.count(True) == CONCURRENT_STOCK
+    async with session_factory() as session:
+        stock = await session.scalar(select(Product.stock_quantity).where(Product.id == product.id))
+        orders = await session.scalar(select(func.count(Order.id)))
+    assert stock == 0
+    assert orders == CONCURRENT_STOCK
+
+
+@pytest.mark.asyncio
+@pytest.mark.slow
+async def test_concurrent_orders_do_not_oversell(file_engine, user_repository, address_repository):
+    """
+    Тест одновременных заказов одного товара на файловой SQLite
+
+    Проверяет, что:
+    - Успешных заказов ровно столько, сколько единиц было на складе
+    - Остаток не уходит в минус
+
+    SQLite допускает одного писателя: транзакции заказов выполняются по
+    очереди, поэтому тест проверяет списание под нагрузкой, но не
+    конкуренцию за блокировку строки в reserve_stock. Ее проверяет
+    test_concurrent_orders_do_not_oversell_postgres.
+    """
+    await assert_concurrent_orders_do_not_oversell(file_engine, user_repository, address_repository)
+
+
+@pytest.mark.asyncio
+@pytest.mark.slow
+@pytest.mark.postgres
+async def test_concurrent_orders_do_not_oversell_postgres(postgres_engine, user_repository, address_repository):
+    """
+    Тест одновременных заказов одного товара на PostgreSQL
+
+    Транзакции заказов выполняются параллельно и конкурируют за блокировку
+    строки продукта в условном UPDATE reserve_stock. Запускается, если
+    задан TEST_POSTGRES_URL.
+    """
+    await assert_concurrent_orders_do_not_oversell(postgres_engine, user_repository, address_repository)